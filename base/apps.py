@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self) -> None:
+        from base.storage import connect_reference_counting
+
+        connect_reference_counting()
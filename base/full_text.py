@@ -0,0 +1,239 @@
+import html
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.models import QuerySet
+from django.utils.module_loading import import_string
+
+MAX_TERMS = 8
+# Маркеры подсветки, которых не бывает в тексте: фрагмент экранируется целиком, потом они заменяются на <mark>.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    pk: int
+    rank: float
+    highlight: str
+
+
+def parse_terms(query: str) -> list[str]:
+    """Слова запроса без операторов FTS — пользовательский ввод никогда не попадает в синтаксис запроса."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def render_highlight(fragment: str) -> str:
+    return html.escape(fragment).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class FullTextBackend(ABC):
+    """
+    Полнотекстовый индекс по одной текстовой колонке таблицы с целочисленным `id`. Индекс поддерживает
+    сама база (триггеры или функциональный индекс), поэтому его не обходят ни bulk_create, ни каскадные удаления.
+
+    Все слова запроса обязательны и ищутся по префиксу. `name` — короткое имя индекса для объектов в базе.
+    """
+
+    def __init__(self, table: str, column: str, name: str) -> None:
+        self.table = table
+        self.column = column
+        self.name = name
+
+    @abstractmethod
+    def install_sql(self) -> list[str]: ...
+
+    @abstractmethod
+    def uninstall_sql(self) -> list[str]: ...
+
+    def install(self, schema_editor: BaseDatabaseSchemaEditor) -> None:
+        for sql in self.install_sql():
+            schema_editor.execute(sql)
+
+    def uninstall(self, schema_editor: BaseDatabaseSchemaEditor) -> None:
+        for sql in self.uninstall_sql():
+            schema_editor.execute(sql)
+
+    @abstractmethod
+    def match_sql(self, terms: list[str]) -> tuple[str, list[Any]]:
+        """SELECT id всех подходящих строк — для `id__in=RawSQL(...)`."""
+
+    @abstractmethod
+    def rank_sql(self, terms: list[str], pk_column: str) -> tuple[str, list[Any]]:
+        """Скалярный подзапрос с рангом строки `pk_column` — для `annotate(rank=RawSQL(...))`, больше — лучше."""
+
+    @abstractmethod
+    def search(self, terms: list[str], scope: tuple[str, QuerySet], limit: int, offset: int) -> list[SearchHit]:
+        """Страница по убыванию релевантности среди строк, у которых `scope[0]` входит в queryset `scope[1]`."""
+
+    @abstractmethod
+    def count(self, terms: list[str], scope: tuple[str, QuerySet]) -> int: ...
+
+    def _fetch(self, sql: str, params: list[Any]) -> list[tuple]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class SQLiteFTS5Backend(FullTextBackend):
+    """FTS5-таблица с внешним содержимым (текст хранится только в исходной таблице) и триггеры на неё."""
+
+    @property
+    def fts(self) -> str:
+        return f'{self.table}_fts'
+
+    def install_sql(self) -> list[str]:
+        fts, table, column = self.fts, self.table, self.column
+        return [
+            f"""
+            CREATE VIRTUAL TABLE {fts} USING fts5(
+                {column}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+            """,
+            f"""
+            CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END
+            """,
+            f"""
+            CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END
+            """,
+            f"""
+            CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END
+            """,
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+
+    def uninstall_sql(self) -> list[str]:
+        return [
+            f'DROP TRIGGER IF EXISTS {self.fts}_insert',
+            f'DROP TRIGGER IF EXISTS {self.fts}_delete',
+            f'DROP TRIGGER IF EXISTS {self.fts}_update',
+            f'DROP TABLE IF EXISTS {self.fts}',
+        ]
+
+    @staticmethod
+    def to_query(terms: list[str]) -> str:
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def match_sql(self, terms: list[str]) -> tuple[str, list[Any]]:
+        return f'SELECT rowid FROM {self.fts} WHERE {self.fts} MATCH %s', [self.to_query(terms)]
+
+    def rank_sql(self, terms: list[str], pk_column: str) -> tuple[str, list[Any]]:
+        # bm25 в FTS5 тем меньше, чем строка релевантнее, — меняем знак.
+        sql = f'SELECT -bm25({self.fts}) FROM {self.fts} WHERE {self.fts} MATCH %s AND rowid = {pk_column}'
+        return sql, [self.to_query(terms)]
+
+    def _scoped(self, select: str, terms: list[str], scope: tuple[str, QuerySet]) -> tuple[str, list[Any]]:
+        column, queryset = scope
+        scope_sql, scope_params = queryset.query.sql_with_params()
+        sql = (
+            f'SELECT {select} FROM {self.fts} JOIN {self.table} t ON t.id = {self.fts}.rowid '
+            f'WHERE {self.fts} MATCH %s AND t.{column} IN ({scope_sql})'
+        )
+        return sql, [self.to_query(terms), *scope_params]
+
+    def search(self, terms: list[str], scope: tuple[str, QuerySet], limit: int, offset: int) -> list[SearchHit]:
+        select = (
+            f't.id, -bm25({self.fts}) AS rank, '
+            f"snippet({self.fts}, 0, char(2), char(3), '…', {settings.FULL_TEXT_SNIPPET_WORDS})"
+        )
+        sql, params = self._scoped(select, terms, scope)
+        rows = self._fetch(f'{sql} ORDER BY rank DESC, t.id DESC LIMIT %s OFFSET %s', [*params, limit, offset])
+        return [SearchHit(pk, rank, render_highlight(fragment)) for pk, rank, fragment in rows]
+
+    def count(self, terms: list[str], scope: tuple[str, QuerySet]) -> int:
+        sql, params = self._scoped('COUNT(*)', terms, scope)
+        return self._fetch(sql, params)[0][0]
+
+
+class PostgresSearchBackend(FullTextBackend):
+    """Функциональный GIN-индекс по `to_tsvector('simple', ...)`, его обновляет сама база."""
+
+    @property
+    def vector(self) -> str:
+        return f"to_tsvector('simple', t.{self.column})"
+
+    def install_sql(self) -> list[str]:
+        return [
+            f"CREATE INDEX {self.name}_search_idx ON {self.table} USING gin (to_tsvector('simple', {self.column}))",
+        ]
+
+    def uninstall_sql(self) -> list[str]:
+        return [f'DROP INDEX IF EXISTS {self.name}_search_idx']
+
+    @staticmethod
+    def to_query(terms: list[str]) -> str:
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def match_sql(self, terms: list[str]) -> tuple[str, list[Any]]:
+        sql = f"SELECT t.id FROM {self.table} t WHERE {self.vector} @@ to_tsquery('simple', %s)"
+        return sql, [self.to_query(terms)]
+
+    def rank_sql(self, terms: list[str], pk_column: str) -> tuple[str, list[Any]]:
+        sql = f"SELECT ts_rank({self.vector}, to_tsquery('simple', %s)) FROM {self.table} t WHERE t.id = {pk_column}"
+        return sql, [self.to_query(terms)]
+
+    def _scoped(self, select: str, terms: list[str], scope: tuple[str, QuerySet]) -> tuple[str, list[Any]]:
+        column, queryset = scope
+        scope_sql, scope_params = queryset.query.sql_with_params()
+        sql = (
+            f"SELECT {select} FROM {self.table} t, to_tsquery('simple', %s) q "
+            f'WHERE {self.vector} @@ q AND t.{column} IN ({scope_sql})'
+        )
+        return sql, [self.to_query(terms), *scope_params]
+
+    def search(self, terms: list[str], scope: tuple[str, QuerySet], limit: int, offset: int) -> list[SearchHit]:
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={settings.FULL_TEXT_SNIPPET_WORDS}'
+        select = f"t.id, ts_rank({self.vector}, q) AS rank, ts_headline('simple', t.{self.column}, q, %s)"
+        sql, params = self._scoped(select, terms, scope)
+        rows = self._fetch(f'{sql} ORDER BY rank DESC, t.id DESC LIMIT %s OFFSET %s', [options, *params, limit, offset])
+        return [SearchHit(pk, rank, render_highlight(fragment)) for pk, rank, fragment in rows]
+
+    def count(self, terms: list[str], scope: tuple[str, QuerySet]) -> int:
+        sql, params = self._scoped('COUNT(*)', terms, scope)
+        return self._fetch(sql, params)[0][0]
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_full_text_backend(table: str, column: str, name: str, db: BaseDatabaseWrapper = connection) -> FullTextBackend:
+    """Бэкенд из FULL_TEXT_BACKEND (путь к классу) или по типу базы."""
+    if settings.FULL_TEXT_BACKEND:
+        return import_string(settings.FULL_TEXT_BACKEND)(table, column, name)
+    if db.vendor not in BACKENDS:
+        raise ImproperlyConfigured(f'Нет полнотекстового бэкенда для базы {db.vendor}')
+    return BACKENDS[db.vendor](table, column, name)
+
+
+class SearchResults:
+    """Ленивая выдача для Paginator: `count()` и срез — по одному запросу к индексу."""
+
+    def __init__(self, backend: FullTextBackend, terms: list[str], scope: tuple[str, QuerySet]) -> None:
+        self.backend = backend
+        self.terms = terms
+        self.scope = scope
+
+    def count(self) -> int:
+        return self.backend.count(self.terms, self.scope)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item: slice) -> list[SearchHit]:
+        return self.backend.search(self.terms, self.scope, item.stop - item.start, item.start)
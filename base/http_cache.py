@@ -0,0 +1,76 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+from django.conf import settings
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from base.render_cache import render_cache
+
+
+class PrerenderedResponse(Response):
+    """Ответ с готовыми JSON-байтами из кеша. `data` декодируется лениво — сериализатор не запускается."""
+
+    def __init__(self, content: bytes, content_type: str) -> None:
+        self.prerendered = content
+        super().__init__(content_type=content_type)
+
+    @property
+    def data(self) -> Any:
+        return json.loads(self.prerendered)
+
+    @data.setter
+    def data(self, value: Any) -> None:
+        pass
+
+    @property
+    def rendered_content(self) -> bytes:
+        return self.prerendered
+
+
+class ConditionalRetrieveMixin(ABC):
+    """
+    ETag и `304 Not Modified` для retrieve. Вьюсет реализует `get_etag()` так, чтобы ему
+    не нужно было читать сам объект, — тогда совпавший If-None-Match не трогает таблицы с данными.
+
+    С `cache_rendered = True` готовый JSON кешируется по ETag, и повторный retrieve
+    не запускает сериализатор, пока не сменится версия.
+    """
+
+    cache_rendered = False
+
+    @abstractmethod
+    def get_etag(self) -> str | None: ...
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        etag = self.get_etag()
+        if not etag:
+            return super().retrieve(request, *args, **kwargs)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_cache_headers(not_modified, etag)
+
+        if self.cache_rendered and request.accepted_renderer.format == 'json':
+            key = f'render:{request.get_host()}:{request.accepted_media_type}:{etag}'
+            body = render_cache.get_or_render(key, lambda: self.render_retrieve(request, *args, **kwargs))
+            response = PrerenderedResponse(body, content_type=request.accepted_media_type)
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+        return self.add_cache_headers(response, etag)
+
+    def render_retrieve(self, request: Request, *args: Any, **kwargs: Any) -> bytes:
+        response = super().retrieve(request, *args, **kwargs)
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        return response.render().content
+
+    @staticmethod
+    def add_cache_headers(response: HttpResponseBase, etag: str) -> HttpResponseBase:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=settings.CONTENT_CACHE_MAX_AGE, must_revalidate=True)
+        return response
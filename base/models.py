@@ -7,3 +7,20 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Blob(BaseModel):
+    """Файл в хранилище по содержимому (base.storage.ContentAddressedStorage) и число ссылок на него из моделей."""
+
+    name = models.CharField('Путь', max_length=255, primary_key=True)
+    sha256 = models.CharField('SHA-256', max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField('Размер')
+    ref_count = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+        indexes = [models.Index(fields=['ref_count', 'updated_at'], name='blob_unreferenced_idx')]
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,166 @@
+from typing import Any
+
+from django.db.models import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset) для лент, упорядоченных по убыванию `key_field`.
+
+    Страница всегда отдаётся от новых записей к старым. `before` листает историю назад,
+    `after` возвращает записи новее указанной — каждая страница это один диапазонный запрос по индексу.
+    """
+
+    key_field = 'id'
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'limit'
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list[Any]:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_limit(request)
+        self.before = self.get_key(request, self.before_query_param)
+        self.after = self.get_key(request, self.after_query_param)
+
+        if self.before is not None and self.after is not None:
+            message = f'Нельзя передавать {self.before_query_param} и {self.after_query_param} вместе'
+            raise ValidationError({self.after_query_param: message})
+
+        if self.after is not None:
+            queryset = queryset.filter(**{f'{self.key_field}__gt': self.after}).order_by(self.key_field)
+        else:
+            if self.before is not None:
+                queryset = queryset.filter(**{f'{self.key_field}__lt': self.before})
+            queryset = queryset.order_by(f'-{self.key_field}')
+
+        rows = list(queryset[: self.limit + 1])
+        self.has_more = len(rows) > self.limit
+        rows = rows[: self.limit]
+
+        if self.after is not None:
+            rows.reverse()
+
+        self.first_key = getattr(rows[0], self.key_field) if rows else None
+        self.last_key = getattr(rows[-1], self.key_field) if rows else None
+        return rows
+
+    def merge(self, data: list[dict[str, Any]], extra: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Подмешивает в сериализованную страницу записи не из queryset (например, ещё не записанные в базу)
+        с теми же курсорами и лимитом. Вызывать после `paginate_queryset`; ссылки учитывают результат.
+        """
+        key = self.key_field
+        seen = {row[key] for row in data}
+        extra = [
+            row
+            for row in extra
+            if row[key] not in seen
+            and (self.after is None or row[key] > self.after)
+            and (self.before is None or row[key] < self.before)
+        ]
+        if not extra:
+            return data
+
+        rows = sorted([*data, *extra], key=lambda row: row[key], reverse=True)
+        if len(rows) > self.limit:
+            self.has_more = True
+            # При листании вперёд страница — ближайшие к курсору записи, то есть самые старые.
+            rows = rows[-self.limit :] if self.after is not None else rows[: self.limit]
+        self.first_key, self.last_key = rows[0][key], rows[-1][key]
+        return rows
+
+    def get_limit(self, request: Request) -> int:
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'Ожидается целое число'})
+        if limit < 1:
+            raise ValidationError({self.page_size_query_param: 'Значение должно быть больше нуля'})
+        return min(limit, self.max_page_size)
+
+    def get_key(self, request: Request, param: str) -> int | None:
+        value = request.query_params.get(param)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({param: 'Ожидается целое число'})
+
+    def get_next_link(self) -> str | None:
+        # Более старые записи. При листании вперёд (after) они всегда есть — как минимум сам курсор.
+        older_exist = self.after is not None or self.has_more
+        if not older_exist or self.last_key is None:
+            return None
+        url = remove_query_param(self.base_url, self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.last_key)
+
+    def get_previous_link(self) -> str | None:
+        # Более новые записи.
+        newer_exist = self.has_more if self.after is not None else self.before is not None
+        if not newer_exist or self.first_key is None:
+            return None
+        url = remove_query_param(self.base_url, self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.first_key)
+
+    def get_paginated_response(self, data: list[Any]) -> Response:
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict[str, Any]) -> dict[str, Any]:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view: Any) -> list[dict[str, Any]]:
+        return [
+            {
+                'name': self.before_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Вернуть записи с {self.key_field} меньше указанного (листание истории назад)',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.after_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Вернуть записи с {self.key_field} больше указанного (новые записи)',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Размер страницы (не больше {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class DefaultPageNumberPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
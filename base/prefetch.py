@@ -0,0 +1,113 @@
+from functools import cache
+from typing import Any, NamedTuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+
+
+class PrefetchPlan(NamedTuple):
+    select_related: tuple[str, ...]
+    prefetch_related: tuple[str, ...]
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+def _relation_path(model: type[models.Model], source: str) -> tuple[list[str], bool]:
+    """
+    Возвращает ту часть `source`, что проходит по связям модели, и признак того,
+    что на пути есть связь «ко многим» (тогда нужен prefetch_related, а не select_related).
+    """
+    path = []
+    is_many = False
+    for name in source.split('.'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        path.append(name)
+        is_many = is_many or field.many_to_many or field.one_to_many
+        model = field.related_model
+    return path, is_many
+
+
+def _collect(
+    serializer: serializers.Serializer,
+    model: type[models.Model],
+    prefix: list[str],
+    prefix_is_many: bool,
+    select: list[str],
+    prefetch: list[str],
+) -> None:
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        child: Any = None
+        source = field.source
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+        elif isinstance(field, serializers.BaseSerializer):
+            child = field
+        elif isinstance(field, PrimaryKeyRelatedField):
+            # Значение берётся из `<field>_id`, запрос к связанной таблице не нужен.
+            continue
+        elif not isinstance(field, (RelatedField, ManyRelatedField)):
+            if '.' not in source:
+                continue
+            # Обычное поле с source вида `chat.name` — подтягиваем только связь.
+            source = source.rsplit('.', 1)[0]
+
+        path, is_many = _relation_path(model, source)
+        if not path:
+            continue
+
+        lookup_parts = prefix + path
+        lookup_is_many = prefix_is_many or is_many
+        (prefetch if lookup_is_many else select).append('__'.join(lookup_parts))
+
+        if child is not None and isinstance(child, serializers.ModelSerializer):
+            _collect(child, child.Meta.model, lookup_parts, lookup_is_many, select, prefetch)
+
+
+def _dedupe(lookups: list[str]) -> tuple[str, ...]:
+    # `a__b` уже подтягивает `a`, поэтому оставляем только самые длинные пути.
+    unique = dict.fromkeys(lookups)
+    return tuple(lookup for lookup in unique if not any(other.startswith(f'{lookup}__') for other in unique))
+
+
+@cache
+def get_prefetch_plan(serializer_class: type[serializers.ModelSerializer]) -> PrefetchPlan:
+    """Строит набор select_related/prefetch_related по дереву полей сериализатора."""
+    select: list[str] = []
+    prefetch: list[str] = []
+    _collect(serializer_class(), serializer_class.Meta.model, [], False, select, prefetch)
+    return PrefetchPlan(select_related=_dedupe(select), prefetch_related=_dedupe(prefetch))
+
+
+class PrefetchPlanMixin:
+    """
+    Подмешивается к ModelViewSet: queryset автоматически дополняется связями,
+    которые читает сериализатор текущего действия, чтобы список не делал N+1 запросов.
+    """
+
+    prefetch_plan_actions = ('list', 'retrieve', 'update', 'partial_update')
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action not in self.prefetch_plan_actions:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, serializers.ModelSerializer):
+            return queryset
+        return get_prefetch_plan(serializer_class).apply(queryset)
@@ -0,0 +1,62 @@
+import logging
+import time
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Кеш готовых байтов ответа в два уровня: локальный LRU процесса (`caches['local']`) перед общим Redis.
+
+    Ключ должен включать версию данных — тогда инвалидация не нужна, устаревшие записи вытесняются
+    по TTL/LRU. При промахе пересчитывает только один процесс (блокировка через `cache.add`),
+    остальные ждут его результат до `RENDER_CACHE_WAIT` секунд.
+    """
+
+    poll_interval = 0.05
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        local = caches['local']
+        value = local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            value = caches['default'].get(key)
+        except Exception:
+            logger.exception(f'Кеш ответов недоступен, ключ {key}')
+            return render()
+        if value is None:
+            value = self._render_once(key, render)
+
+        local.set(key, value, settings.RENDER_CACHE_LOCAL_TIMEOUT)
+        return value
+
+    def _render_once(self, key: str, render: Callable[[], bytes]) -> bytes:
+        shared = caches['default']
+        lock_key = f'{key}:lock'
+        if shared.add(lock_key, 1, settings.RENDER_CACHE_LOCK_TIMEOUT):
+            try:
+                value = render()
+                shared.set(key, value, settings.RENDER_CACHE_TIMEOUT)
+                return value
+            finally:
+                shared.delete(lock_key)
+
+        deadline = time.monotonic() + settings.RENDER_CACHE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = shared.get(key)
+            if value is not None:
+                return value
+
+        # Владелец блокировки завис или упал — считаем сами, но в кеш не пишем.
+        logger.warning(f'Не дождались пересчёта {key}')
+        return render()
+
+
+render_cache = RenderCache()
@@ -0,0 +1,99 @@
+import codecs
+import datetime
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависимость необязательная
+    orjson = None
+
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _default(obj: Any) -> Any:
+    # datetime, date, UUID и dataclass orjson кодирует сам; остальное — как DRF-овский JSONEncoder.
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    return JSONEncoder().default(obj)
+
+
+def _require_orjson() -> None:
+    if orjson is None:
+        raise ImproperlyConfigured('Для FastJSONRenderer/FastJSONParser нужен пакет orjson')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Вывод совпадает с JSONRenderer для компактного JSON; при отступе,
+    отличном от 2, и на том, что orjson не кодирует (например, int больше 64 бит), — обычный рендер.
+    """
+
+    def __init__(self) -> None:
+        _require_orjson()
+        self.options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data: Any, options: int = 0) -> bytes:
+        content = orjson.dumps(data, default=_default, option=self.options | options)
+        # Как и DRF, экранируем U+2028/U+2029, чтобы JSON оставался подмножеством JavaScript.
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in content:
+                content = content.replace(raw, escaped)
+        return content
+
+    def render(self, data: Any, accepted_media_type: str | None = None, renderer_context: Any = None) -> bytes:
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2) or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return self.dumps(data, orjson.OPT_INDENT_2 if indent == 2 else 0)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+    def iter_render(self, items: Iterable[Any], chunk_size: int = 500) -> Iterator[bytes]:
+        """
+        JSON-массив по частям для StreamingHttpResponse: в памяти не больше `chunk_size` элементов,
+        первый байт уходит сразу.
+        """
+        iterator = iter(items)
+        yield b'['
+        separator = b''
+        while chunk := list(islice(iterator, chunk_size)):
+            yield separator + self.dumps(chunk)[1:-1]
+            separator = b','
+        yield b']'
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def __init__(self) -> None:
+        _require_orjson()
+
+    def parse(self, stream: Any, media_type: str | None = None, parser_context: Any = None) -> Any:
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        try:
+            content = stream.read() if stream is not None else b''
+            if codecs.lookup(encoding).name != 'utf-8':
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}') from exc
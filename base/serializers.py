@@ -1,3 +1,9 @@
+from typing import Any
+
+from django.core.files.storage import Storage
+from drf_spectacular.extensions import OpenApiSerializerFieldExtension
+from drf_spectacular.plumbing import build_basic_type
+from drf_spectacular.types import OpenApiTypes
 from rest_framework import serializers
 
 
@@ -8,3 +14,77 @@ class AllFieldsNotRequiredSerializer(serializers.Serializer):
             if isinstance(field, serializers.CharField):
                 field.allow_blank = True
             field.required = False
+
+
+class SparseFieldsetMixin:
+    """Оставляет в ответе только поля из `?fields=a,b,c`. Неизвестные имена игнорируются."""
+
+    fields_query_param = 'fields'
+
+    def __init__(self, *args, **kwargs):  # noqa
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        requested = request.query_params.get(self.fields_query_param)
+        if not requested:
+            return
+
+        allowed = {name.strip() for name in requested.split(',')}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+
+class ResponsiveImageField(serializers.ImageField):
+    """
+    Картинка с готовыми миниатюрами. На запись — загружаемый файл, как у ImageField, на чтение —
+    `{'url': исходный файл, 'srcset': {'image/webp': 'url 160w, url 320w', ...}}` для `<picture>`.
+
+    Миниатюры берутся из JSON-поля модели `<source>_thumbnails` (`{'source': имя, '<mime>': {'<ширина>': имя}}`)
+    и отдаются, только если построены для текущего файла; до тех пор `srcset` пустой.
+    """
+
+    @property
+    def thumbnails_source(self) -> str:
+        return f'{self.source}_thumbnails'
+
+    def to_representation(self, value: Any) -> dict[str, Any] | None:
+        if not value:
+            return None
+        return self.represent(value.name, getattr(value.instance, self.thumbnails_source, None), value.storage)
+
+    def represent(self, name: str, thumbnails: dict[str, Any] | None, storage: Storage) -> dict[str, Any]:
+        request = self.context.get('request')
+
+        def url(file_name: str) -> str:
+            file_url = storage.url(file_name)
+            return request.build_absolute_uri(file_url) if request is not None else file_url
+
+        srcset = {}
+        if thumbnails and thumbnails.get('source') == name:
+            for mime, variants in thumbnails.items():
+                if isinstance(variants, dict) and variants:
+                    ordered = sorted(variants.items(), key=lambda item: int(item[0]))
+                    srcset[mime] = ', '.join(f'{url(variant)} {width}w' for width, variant in ordered)
+        return {'url': url(name), 'srcset': srcset}
+
+
+class ResponsiveImageFieldExtension(OpenApiSerializerFieldExtension):
+    target_class = ResponsiveImageField
+
+    def map_serializer_field(self, auto_schema: Any, direction: str) -> dict[str, Any]:
+        if direction == 'request':
+            return build_basic_type(OpenApiTypes.BINARY)
+        return {
+            'type': 'object',
+            'nullable': True,
+            'properties': {
+                'url': {'type': 'string', 'format': 'uri'},
+                'srcset': {
+                    'type': 'object',
+                    'additionalProperties': {'type': 'string'},
+                    'description': 'MIME-тип → значение атрибута srcset; пусто, пока миниатюры не готовы',
+                },
+            },
+        }
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import shutil
+from collections import Counter
+from collections.abc import Iterable
+from datetime import timedelta
+from functools import cache
+from typing import Any
+from uuid import uuid4
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import Count, F, FileField, Model, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from base.models import Blob
+
+BLOB_PREFIX = 'blobs'
+DERIVED_PREFIX = 'derived'
+MAX_EXTENSION = 16
+
+
+def blob_name(sha256: str, filename: str) -> str:
+    """`blobs/ab/cd/<sha256><расширение>`: расширение оставляем, чтобы по ссылке отдавался правильный тип."""
+    extension = os.path.splitext(filename)[1].lower()
+    if len(extension) > MAX_EXTENSION:
+        extension = ''
+    return f'{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def derived_name(blob: str, filename: str) -> str:
+    """Имя файла, производного от блоба (например, миниатюры): `derived/ab/cd/<sha256>/<filename>`."""
+    sha256 = os.path.splitext(os.path.basename(blob))[0]
+    return f'{DERIVED_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}/{filename}'
+
+
+def is_blob(name: str | None) -> bool:
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+
+def file_sha256(content: File) -> str:
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище по содержимому: файл сохраняется под именем из своего SHA-256, одинаковые файлы лежат один раз.
+
+    Каждый файл — строка `Blob` со счётчиком ссылок из полей моделей (см. `connect_reference_counting`).
+    `delete` блоб не трогает: файл удаляет только `collect_garbage`, когда ссылок не осталось.
+    Имена вне `blobs/` (например, части загрузок) ведут себя как в обычном FileSystemStorage.
+    """
+
+    def get_available_name(self, name: str, max_length: int | None = None) -> str:
+        # Имя всё равно заменится на хеш, а исходное занятое имя не должно превращаться в другое.
+        return name
+
+    def _save(self, name: str, content: File) -> str:
+        # Хеш, уже посчитанный при загрузке, можно передать атрибутом `sha256`, чтобы не читать файл ещё раз.
+        sha256 = getattr(content, 'sha256', None) or file_sha256(content)
+        name = blob_name(sha256, name)
+        # Свежий updated_at не даёт сборщику мусора удалить блоб, который прямо сейчас сохраняют снова.
+        touched = Blob.objects.filter(name=name).update(updated_at=timezone.now())
+        if not touched or not self.exists(name):
+            self._replace(name, content)
+            Blob.objects.get_or_create(name=name, defaults={'sha256': sha256, 'size': self.size(name)})
+        return name
+
+    def _replace(self, name: str, content: File) -> None:
+        # Во временный файл и переименованием: параллельная запись того же файла не оставит его недописанным.
+        temporary = super()._save(f'{name}.{uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+
+    def save_derived(self, blob: str, filename: str, content: File) -> str:
+        """Сохраняет файл, производный от блоба; он перезаписывается и удаляется сборщиком мусора вместе с блобом."""
+        name = derived_name(blob, filename)
+        self._replace(name, content)
+        return name
+
+    def delete(self, name: str) -> None:
+        if not is_blob(name):
+            super().delete(name)
+
+    def remove_blob(self, name: str) -> None:
+        super().delete(name)
+        shutil.rmtree(self.path(os.path.dirname(derived_name(name, ''))), ignore_errors=True)
+
+
+def blob_storage() -> ContentAddressedStorage:
+    return storages['blobs']
+
+
+def find_blob(sha256: str, filename: str, size: int) -> str | None:
+    """Имя уже сохранённого блоба с этим хешем, расширением и размером или None. Продлевает ему жизнь как `_save`."""
+    name = blob_name(sha256, filename)
+    if Blob.objects.filter(name=name, size=size).update(updated_at=timezone.now()) and blob_storage().exists(name):
+        return name
+    return None
+
+
+def _adjust_references(names: Iterable[str | None], sign: int) -> None:
+    counts = Counter(name for name in names if is_blob(name))
+    by_delta: dict[int, list[str]] = {}
+    for name, count in counts.items():
+        by_delta.setdefault(count, []).append(name)
+    for count, group in by_delta.items():
+        ref_count = F('ref_count') + count if sign > 0 else Greatest(F('ref_count') - count, Value(0))
+        Blob.objects.filter(name__in=group).update(ref_count=ref_count)
+
+
+def add_blob_references(names: Iterable[str | None]) -> None:
+    """Учитывает ссылки, записанные в обход `save()` (bulk_create, update)."""
+    _adjust_references(names, 1)
+
+
+def release_blob_references(names: Iterable[str | None]) -> None:
+    """Снимает ссылки, удалённые в обход `delete()` (`_raw_delete`, update)."""
+    _adjust_references(names, -1)
+
+
+@cache
+def blob_fields() -> dict[type[Model], list[FileField]]:
+    """Модели и их файловые поля, которые хранятся в ContentAddressedStorage."""
+    result = {}
+    for model in apps.get_models():
+        fields = [
+            field
+            for field in model._meta.concrete_fields
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+        ]
+        if fields:
+            result[model] = fields
+    return result
+
+
+def _remember_blobs(sender: type[Model], instance: Model, update_fields: Any = None, **kwargs: Any) -> None:
+    fields = blob_fields()[sender]
+    if update_fields is not None:
+        fields = [field for field in fields if field.name in update_fields]
+    if not fields or instance._state.adding:
+        instance._stored_blobs = {field.attname: None for field in fields}
+        return
+    row = sender._base_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    instance._stored_blobs = row or {field.attname: None for field in fields}
+
+
+def _count_saved_blobs(sender: type[Model], instance: Model, **kwargs: Any) -> None:
+    stored = instance.__dict__.pop('_stored_blobs', {})
+    added, released = [], []
+    for attname, previous in stored.items():
+        current = getattr(instance, attname).name
+        if current != previous:
+            added.append(current)
+            released.append(previous)
+    add_blob_references(added)
+    release_blob_references(released)
+
+
+def _release_deleted_blobs(sender: type[Model], instance: Model, **kwargs: Any) -> None:
+    release_blob_references(getattr(instance, field.attname).name for field in blob_fields()[sender])
+
+
+def connect_reference_counting() -> None:
+    for model in blob_fields():
+        pre_save.connect(_remember_blobs, sender=model, dispatch_uid=f'blobs_remember_{model._meta.label}')
+        post_save.connect(_count_saved_blobs, sender=model, dispatch_uid=f'blobs_count_{model._meta.label}')
+        post_delete.connect(_release_deleted_blobs, sender=model, dispatch_uid=f'blobs_release_{model._meta.label}')
+
+
+def recount_blob_references() -> int:
+    """
+    Пересчитывает ссылки по таблицам и возвращает число блобов, на которые кто-то ссылается.
+    Ссылки, которые держат только архивы чатов, при этом теряются — после пересчёта архивные вложения
+    могут быть собраны, если архив не восстановить до конца грейс-периода.
+    """
+    counts: Counter[str] = Counter()
+    for model, fields in blob_fields().items():
+        for field in fields:
+            rows = (
+                model._base_manager.filter(**{f'{field.attname}__startswith': f'{BLOB_PREFIX}/'})
+                .order_by()
+                .values_list(field.attname)
+                .annotate(references=Count('pk'))
+            )
+            counts.update(dict(rows))
+    by_count: dict[int, list[str]] = {}
+    for name, count in counts.items():
+        by_count.setdefault(count, []).append(name)
+    with transaction.atomic():
+        Blob.objects.exclude(ref_count=0).update(ref_count=0)
+        for count, names in by_count.items():
+            Blob.objects.filter(name__in=names).update(ref_count=count)
+    return len(counts)
+
+
+def collect_garbage(grace: timedelta, dry_run: bool = False) -> tuple[int, int]:
+    """
+    Удаляет блобы без ссылок, не сохранявшиеся дольше `grace`, и файлы в `blobs/` без строки `Blob`
+    (остатки оборванных сохранений) старше `grace`. Возвращает число удалённых файлов и освобождённые байты.
+    """
+    storage = blob_storage()
+    cutoff = timezone.now() - grace
+    files = freed = 0
+    for blob in Blob.objects.filter(ref_count=0, updated_at__lt=cutoff).iterator():
+        if not dry_run:
+            # Условие повторяется в DELETE: блоб, на который только что сослались, уже не подходит.
+            # Файл удаляется до конца транзакции, пока параллельное сохранение ждёт блокировку строки.
+            with transaction.atomic():
+                deleted, _ = Blob.objects.filter(name=blob.name, ref_count=0, updated_at__lt=cutoff).delete()
+                if not deleted:
+                    continue
+                storage.remove_blob(blob.name)
+        files += 1
+        freed += blob.size
+
+    for name, size in _orphan_files(storage, cutoff.timestamp()):
+        if not dry_run:
+            storage.remove_blob(name)
+        files += 1
+        freed += size
+    return files, freed
+
+
+def _orphan_files(storage: ContentAddressedStorage, before: float) -> Iterable[tuple[str, int]]:
+    root = storage.path(BLOB_PREFIX)
+    batch: dict[str, int] = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if stat.st_mtime < before:
+                batch[os.path.relpath(path, storage.location).replace(os.sep, '/')] = stat.st_size
+            if len(batch) >= 1000:
+                yield from _without_rows(batch)
+                batch = {}
+    yield from _without_rows(batch)
+
+
+def _without_rows(files: dict[str, int]) -> Iterable[tuple[str, int]]:
+    known = set(Blob.objects.filter(name__in=files).values_list('name', flat=True))
+    return [(name, size) for name, size in files.items() if name not in known]
@@ -0,0 +1,157 @@
+from collections.abc import Callable
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from base.serializers import ResponsiveImageField
+
+# Для этих полей DRF-овский to_representation на значениях из `.values()` ничего не меняет.
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.SlugField,
+    serializers.URLField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+def _file_url(field: serializers.FileField, model_field: models.FileField) -> Callable[[Any], Any]:
+    request = field.context.get('request')
+    storage = model_field.storage
+
+    def convert(name: Any) -> Any:
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+class ValuesSerializer:
+    """
+    Сборка ответа ModelSerializer из строк `.values()` без создания моделей и полей на каждую строку.
+
+    План (колонка и конвертер для каждого поля) строится один раз на запрос по полям сериализатора,
+    поэтому вывод совпадает с DRF байт в байт. Поддерживаются простые поля, FK через
+    PrimaryKeyRelatedField, списки id (many=True), файлы и картинки с миниатюрами. На остальном — ImproperlyConfigured,
+    и вызывающий код остаётся на обычном сериализаторе.
+    """
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer], context: dict[str, Any]) -> None:
+        serializer = serializer_class(context=context)
+        self.model = serializer_class.Meta.model
+        self.columns: list[tuple[str, str, Callable[[Any], Any] | None]] = []
+        # Поля из нескольких колонок: конвертер получает значения всех колонок, первая — само поле.
+        self.composites: list[tuple[str, tuple[str, ...], Callable[..., Any]]] = []
+        self.id_lists: list[tuple[str, models.QuerySet, str]] = []
+        self.order: list[str] = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            self._compile(name, field)
+
+    def _compile(self, name: str, field: serializers.Field) -> None:
+        if field.source == '*' or '.' in field.source:
+            raise ImproperlyConfigured(f'Поле {name} не поддерживается ValuesSerializer')
+
+        try:
+            model_field = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            if hasattr(self.model, field.source) or field.required or field.default is not serializers.empty:
+                raise ImproperlyConfigured(f'Поле {name} не поддерживается ValuesSerializer') from None
+            # Атрибута нет — DRF молча пропускает необязательное поле (SkipField), повторяем это.
+            return
+
+        if isinstance(field, ManyRelatedField) and isinstance(field.child_relation, PrimaryKeyRelatedField):
+            related = model_field.related_model
+            query_name = model_field.field.name if model_field.auto_created else model_field.related_query_name()
+            self.id_lists.append((name, related._default_manager.all(), query_name))
+        elif isinstance(field, PrimaryKeyRelatedField) and model_field.many_to_one and field.pk_field is None:
+            self.columns.append((name, model_field.attname, None))
+        elif model_field.is_relation:
+            raise ImproperlyConfigured(f'Поле {name} не поддерживается ValuesSerializer')
+        elif isinstance(field, ResponsiveImageField):
+            thumbnails = self.model._meta.get_field(field.thumbnails_source).attname
+            storage = model_field.storage
+            self.composites.append(
+                (name, (model_field.attname, thumbnails), lambda value, extra: field.represent(value, extra, storage))
+            )
+        elif isinstance(field, serializers.FileField):
+            if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                raise ImproperlyConfigured(f'Поле {name} не поддерживается ValuesSerializer')
+            self.columns.append((name, model_field.attname, _file_url(field, model_field)))
+        elif type(field) in IDENTITY_FIELDS:
+            self.columns.append((name, model_field.attname, None))
+        else:
+            self.columns.append((name, model_field.attname, field.to_representation))
+        self.order.append(name)
+
+    def _related_ids(self, owners: QuerySet) -> dict[str, dict[Any, list[Any]]]:
+        # Один запрос на список, как у prefetch_related, но без моделей; владельцы — подзапросом.
+        result: dict[str, dict[Any, list[Any]]] = {}
+        for name, queryset, query_name in self.id_lists:
+            grouped = result[name] = {}
+            for owner, pk in queryset.filter(**{f'{query_name}__in': owners}).values_list(query_name, 'pk'):
+                grouped.setdefault(owner, []).append(pk)
+        return result
+
+    def serialize(self, queryset: QuerySet, pks: list[Any] | None = None) -> list[dict[str, Any]]:
+        """Строки queryset'а; с `pks` — только эти объекты и в этом порядке (страница пагинатора)."""
+        queryset = queryset.prefetch_related(None)
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+
+        pk_name = self.model._meta.pk.attname
+        composite_attnames = (attname for _, attnames, _ in self.composites for attname in attnames)
+        attnames = list(dict.fromkeys([pk_name, *(attname for _, attname, _ in self.columns), *composite_attnames]))
+        rows = list(queryset.values_list(*attnames))
+        if pks is not None:
+            positions = {pk: index for index, pk in enumerate(pks)}
+            rows.sort(key=lambda row: positions[row[0]])
+
+        positions = {attname: index for index, attname in enumerate(attnames)}
+        getters = [(name, positions[attname], convert) for name, attname, convert in self.columns]
+        composites = [
+            (name, [positions[attname] for attname in attnames], convert) for name, attnames, convert in self.composites
+        ]
+        related = self._related_ids(queryset.values('pk')) if self.id_lists else {}
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, position, convert in getters:
+                value = row[position]
+                item[name] = convert(value) if convert is not None and value is not None else value
+            for name, field_positions, convert in composites:
+                value = row[field_positions[0]]
+                item[name] = convert(value, *(row[position] for position in field_positions[1:])) if value else None
+            for name in related:
+                item[name] = related[name].get(row[0], [])
+            data.append({name: item[name] for name in self.order} if related or composites else item)
+        return data
+
+
+class ValuesListMixin:
+    """Подмешивается к ModelViewSet: `list` строится через ValuesSerializer вместо сериализатора DRF."""
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        try:
+            serializer = ValuesSerializer(self.get_serializer_class(), self.get_serializer_context())
+        except ImproperlyConfigured:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer.serialize(queryset))
+        return self.get_paginated_response(serializer.serialize(queryset, pks=[obj.pk for obj in page]))
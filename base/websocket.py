@@ -0,0 +1,57 @@
+from typing import Any
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Аутентификация WebSocket-соединений по access-токену simplejwt.
+
+    Браузер не умеет передавать заголовки при открытии WebSocket, поэтому токен берётся
+    из параметра `?token=` или, если его нет, из заголовка `Authorization: Bearer <token>`.
+    Токен проверяет тот же JWT-класс, что и у API (первый из DEFAULT_AUTHENTICATION_CLASSES), —
+    отозванный для HTTP токен не откроет и сокет.
+    """
+
+    query_param = 'token'
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> Any:
+        scope = dict(scope)
+        scope['user'] = await self.get_user(self.get_raw_token(scope))
+        return await super().__call__(scope, receive, send)
+
+    def get_raw_token(self, scope: dict[str, Any]) -> str | None:
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get(self.query_param):
+            return query[self.query_param][0]
+
+        headers = dict(scope.get('headers', []))
+        authorization = headers.get(b'authorization', b'').decode().split()
+        if len(authorization) == 2 and authorization[0].lower() == 'bearer':
+            return authorization[1]
+        return None
+
+    @staticmethod
+    def get_authentication() -> JWTAuthentication:
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            if issubclass(authentication_class, JWTAuthentication):
+                return authentication_class()
+        return JWTAuthentication()
+
+    @database_sync_to_async
+    def get_user(self, raw_token: str | None) -> Any:
+        if not raw_token:
+            return AnonymousUser()
+
+        authentication = self.get_authentication()
+        try:
+            validated_token = authentication.get_validated_token(raw_token.encode())
+            return authentication.get_user(validated_token)
+        except (InvalidToken, AuthenticationFailed):
+            return AnonymousUser()
@@ -1,9 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+from django.http import HttpRequest
 
 from education_app.models.chat import Chat, ChatParticipant, Message
 from education_app.models.course import Course, Module, Lesson, Question, Answer, Tag
 from education_app.models.users import User
+from base.full_text import parse_terms
+from education_app.services.message_search import get_search_backend
 
 
 @admin.register(Chat)
@@ -24,6 +29,13 @@ class MessageAdmin(admin.ModelAdmin):
     list_filter = ('chat', 'sender')
     search_fields = ('text',)
 
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet, search_term: str) -> tuple[QuerySet, bool]:
+        # Вместо LIKE '%...%' по всей таблице — полнотекстовый индекс.
+        terms = parse_terms(search_term)
+        if not terms:
+            return queryset, False
+        return queryset.filter(id__in=RawSQL(*get_search_backend().match_sql(terms))), False
+
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EducationAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'education_app'
+
+    def ready(self) -> None:
+        from education_app import signals  # noqa: F401
@@ -0,0 +1,66 @@
+from functools import cached_property
+from typing import Any
+
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import Token
+
+from education_app.models.users import User
+from education_app.services.tokens import TOKEN_VERSION_CLAIM, get_token_version
+
+
+class ClaimsUser(TokenUser):
+    """
+    Пользователь из claims access-токена: id, логин, роль, is_staff и курсы на момент выдачи.
+    Проверки прав работают без запроса к БД. Остальные атрибуты (email, courses, ...) берутся
+    из модели, которая загружается при первом обращении.
+    """
+
+    @cached_property
+    def id(self) -> int:
+        return int(super().id)
+
+    @cached_property
+    def pk(self) -> int:
+        return self.id
+
+    @cached_property
+    def role(self) -> str:
+        return self.token.get('role', '')
+
+    @cached_property
+    def course_ids(self) -> list[int]:
+        return self.token.get('courses', [])
+
+    @cached_property
+    def instance(self) -> User:
+        return User.objects.get(pk=self.id)
+
+    def __str__(self) -> str:
+        return self.username
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT без SELECT пользователя на каждый запрос. Вместо этого версия токена сверяется
+    с версией пользователя в Redis: смена роли или деактивация её повышают, и старые токены отклоняются.
+    """
+
+    def get_user(self, validated_token: Token) -> ClaimsUser:
+        user = super().get_user(validated_token)
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != get_token_version(user.id):
+            raise InvalidToken('Токен отозван')
+        return user
+
+
+def get_user_instance(user: Any) -> User:
+    """Модель пользователя для кода, которому нужен именно экземпляр User (ORM, сериализаторы модели)."""
+    return user.instance if isinstance(user, ClaimsUser) else user
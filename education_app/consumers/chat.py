@@ -0,0 +1,38 @@
+from typing import Any
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from education_app.services.chat import ChatService
+from education_app.services.membership import is_chat_member
+
+FORBIDDEN_CLOSE_CODE = 4403
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    group_name: str | None = None
+
+    async def connect(self) -> None:
+        user = self.scope['user']
+        chat_id = self.scope['url_route']['kwargs']['chat_id']
+
+        if not user.is_authenticated or not await self.has_access(user, chat_id):
+            await self.close(code=FORBIDDEN_CLOSE_CODE)
+            return
+
+        self.group_name = ChatService.group_name(chat_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code: int) -> None:
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def chat_message(self, event: dict[str, Any]) -> None:
+        await self.send_json(event['message'])
+
+    @database_sync_to_async
+    def has_access(self, user: Any, chat_id: int) -> bool:
+        if user.is_staff:
+            return True
+        return is_chat_member(chat_id, user.id)
@@ -0,0 +1,56 @@
+from django.db.models import QuerySet
+from django_filters import rest_framework as filters
+
+from base.full_text import parse_terms
+from education_app.models.course import Course
+from education_app.services.catalog_search import filter_by_tags, search_courses
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class CourseCatalogFilter(filters.FilterSet):
+    q = filters.CharFilter(
+        method='filter_search',
+        help_text='Поиск по названию и описанию курса, названиям модулей и уроков; сортирует по релевантности',
+    )
+    tags = NumberInFilter(method='filter_tags', help_text='ID тегов через запятую')
+    tags_mode = filters.ChoiceFilter(
+        choices=[('any', 'Хотя бы один тег'), ('all', 'Все теги')],
+        method='filter_tags_mode',
+        help_text='Как сочетать теги из `tags`: any (по умолчанию) или all',
+    )
+    tag = filters.CharFilter(field_name='tags__title', lookup_expr='iexact', distinct=True, help_text='Название тега')
+    tag_id = filters.NumberFilter(field_name='tags', distinct=True, help_text='ID тега')
+    end_after = filters.IsoDateTimeFilter(field_name='end_datetime', lookup_expr='gte')
+    end_before = filters.IsoDateTimeFilter(field_name='end_datetime', lookup_expr='lte')
+    enrolled = filters.BooleanFilter(
+        method='filter_enrolled',
+        help_text='Только курсы текущего пользователя (false — все, кроме них)',
+    )
+
+    class Meta:
+        model = Course
+        fields = ('q', 'tags', 'tags_mode', 'tag', 'tag_id', 'end_after', 'end_before', 'enrolled')
+
+    def filter_enrolled(self, queryset: QuerySet, name: str, value: bool) -> QuerySet:
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return queryset.none() if value else queryset
+        # С JWT request.user — ClaimsUser без модели, поэтому сравниваем по id.
+        if value:
+            return queryset.filter(users__id=user.id)
+        return queryset.exclude(users__id=user.id)
+
+    def filter_search(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
+        terms = parse_terms(value)
+        return search_courses(queryset, terms) if terms else queryset
+
+    def filter_tags(self, queryset: QuerySet, name: str, value: list[int]) -> QuerySet:
+        match_all = self.form.cleaned_data.get('tags_mode') == 'all'
+        return filter_by_tags(queryset, [int(tag_id) for tag_id in value], match_all)
+
+    def filter_tags_mode(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
+        # Учитывается в filter_tags.
+        return queryset
@@ -0,0 +1,33 @@
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from base.storage import collect_garbage, recount_blob_references
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы хранилища блобов, на которые больше ничего не ссылается.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=settings.BLOB_GC_GRACE_HOURS,
+            help='Не трогать блобы, сохранённые позже этого срока',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать')
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Сначала пересчитать ссылки по таблицам (ссылки из архивов чатов при этом теряются)',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['recount']:
+            referenced = recount_blob_references()
+            self.stdout.write(f'Ссылки пересчитаны, используется блобов: {referenced}.')
+        files, freed = collect_garbage(timedelta(hours=options['grace_hours']), options['dry_run'])
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {files}, {freed} байт.'))
@@ -0,0 +1,66 @@
+import csv
+import sys
+from collections.abc import Iterator
+from contextlib import nullcontext
+from itertools import islice
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from education_app.models.users import User
+from education_app.services.users import enroll
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовая запись на курсы из CSV с колонками `course_id` и `user_id` или `username`. '
+        'Файл читается потоково, пачками по --batch-size строк.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', nargs='?', default='-', help='Путь к CSV или `-` для stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options['path']
+        batch_size = options['batch_size']
+        totals = {'enrolled': 0, 'already_enrolled': 0, 'skipped': 0}
+
+        # stdin не наш — закрываем только файл, который открыли сами.
+        with nullcontext(sys.stdin) if path == '-' else open(path, newline='', encoding='utf-8') as stream:
+            reader = csv.DictReader(stream)
+            fields = set(reader.fieldnames or [])
+            if 'course_id' not in fields or not fields & {'user_id', 'username'}:
+                raise CommandError('Нужны колонки course_id и user_id или username')
+
+            for chunk in self._chunks(reader, batch_size):
+                pairs = self._pairs(chunk)
+                totals['skipped'] += len(chunk) - len(pairs)
+                result = enroll(pairs, batch_size=batch_size)
+                for key, value in result.items():
+                    totals[key] += value
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Записано: {totals["enrolled"]}, уже были записаны: {totals["already_enrolled"]}, '
+                f'пропущено: {totals["skipped"]}.'
+            )
+        )
+
+    @staticmethod
+    def _chunks(reader: csv.DictReader, size: int) -> Iterator[list[dict[str, str]]]:
+        while chunk := list(islice(reader, size)):
+            yield chunk
+
+    @staticmethod
+    def _pairs(rows: list[dict[str, str]]) -> list[tuple[int, int]]:
+        usernames = {row['username'] for row in rows if not row.get('user_id') and row.get('username')}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id')) if usernames else {}
+
+        pairs = []
+        for row in rows:
+            user_id = row.get('user_id') or str(user_ids.get(row.get('username', ''), ''))
+            course_id = row.get('course_id') or ''
+            if user_id.isdigit() and course_id.isdigit():
+                pairs.append((int(user_id), int(course_id)))
+        return pairs
@@ -0,0 +1,31 @@
+import sys
+from typing import Any, BinaryIO
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from education_app.services.export import EXPORTS, FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка записей на курсы, участников чатов или истории сообщений в NDJSON/CSV. '
+        'Строки читаются серверным курсором, память не растёт с объёмом.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--owner-id', type=int, help='id курса (enrollments) или чата (participants, messages)')
+        parser.add_argument('--output', default='-', help='Путь к файлу или `-` для stdout')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options['output']
+        stream: BinaryIO = sys.stdout.buffer if path == '-' else open(path, 'wb')  # noqa: SIM115
+        try:
+            for chunk in iter_export(options['name'], options['format'], options['owner_id']):
+                stream.write(chunk)
+        finally:
+            if path == '-':
+                stream.flush()
+            else:
+                stream.close()
@@ -0,0 +1,20 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from education_app.services.thumbnails import regenerate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит недостающие и устаревшие миниатюры аватарок курсов, модулей и уроков. '
+        'Готовые пропускаются, поэтому прерванный запуск можно просто повторить.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--workers', type=int, default=4, help='Сколько пачек резать параллельно')
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        generated = regenerate_thumbnails(options['workers'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Миниатюры построены для {generated} объектов.'))
@@ -0,0 +1,36 @@
+import sys
+from typing import Any, TextIO
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from education_app.services.user_import import import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовое создание пользователей из CSV (с заголовком) или JSONL. '
+        'Пароли хешируются в --workers процессах, строки сохраняются пачками по --batch-size.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', nargs='?', default='-', help='Путь к файлу или `-` для stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--workers', type=int)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith('.jsonl') else 'csv')
+
+        stream: TextIO = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')  # noqa: SIM115
+        with stream:
+            result = import_users(read_rows(stream, fmt), batch_size=options['batch_size'], workers=options['workers'])
+
+        for error in result['errors']:
+            self.stderr.write(f'Строка {error["row"]}: {error["errors"]}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано: {result["created"]}, записей на курсы: {result["enrolled"]}, '
+                f'ошибок: {len(result["errors"])}.'
+            )
+        )
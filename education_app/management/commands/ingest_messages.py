@@ -0,0 +1,46 @@
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from education_app.services.message_buffer import consumer_name, get_message_buffer
+
+
+class Command(BaseCommand):
+    help = 'Пишет в базу сообщения из буфера (MESSAGE_WRITE_BEHIND=1) пачками по размеру и времени.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int, default=settings.MESSAGE_BUFFER_BATCH_SIZE)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.MESSAGE_BUFFER_FLUSH_INTERVAL,
+            help='Сколько секунд копить пачку, прежде чем записать неполную',
+        )
+        parser.add_argument('--once', action='store_true', help='Разобрать накопленное и выйти')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        buffer = get_message_buffer()
+        buffer.ensure_group()
+        consumer = consumer_name()
+        interval = 0 if options['once'] else options['interval']
+        processed = 0
+
+        while True:
+            try:
+                flushed = buffer.flush(consumer, options['batch_size'], interval)
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                # Пачка осталась неподтверждённой, её заберёт следующий проход через MESSAGE_BUFFER_CLAIM_IDLE.
+                if options['once']:
+                    raise
+                self.stderr.write(self.style.ERROR('Не удалось записать пачку, повтор через секунду.'))
+                time.sleep(1)
+                continue
+            processed += flushed
+            if options['once'] and not flushed:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано записей буфера: {processed}.'))
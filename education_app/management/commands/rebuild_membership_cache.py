@@ -0,0 +1,16 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from education_app.services.membership import rebuild_membership_cache
+
+
+class Command(BaseCommand):
+    help = 'Заполняет кеш участников всех чатов (множества в Redis) — после сброса или холодного старта Redis.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        chats = rebuild_membership_cache(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Состав загружен для {chats} чатов.'))
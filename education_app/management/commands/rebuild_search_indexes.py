@@ -0,0 +1,24 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from education_app.models.course import Course
+from education_app.services import catalog_search, message_search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздаёт полнотекстовые индексы сообщений и каталога курсов '
+        '(после пересборки таблицы на SQLite или смены бэкенда) и поисковый текст курсов.'
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        backends = [message_search.get_search_backend(), catalog_search.get_search_backend()]
+        with connection.schema_editor() as schema_editor:
+            for backend in backends:
+                backend.uninstall(schema_editor)
+                backend.install(schema_editor)
+
+        catalog_search.refresh_search_documents(Course.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Индексы пересозданы: {type(backends[0]).__name__}.'))
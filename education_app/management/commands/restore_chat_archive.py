@@ -0,0 +1,33 @@
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from education_app.services.archive import restore_chat_archive
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает сообщения чата из архива *.jsonl.gz, созданного очисткой с архивированием.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', type=Path, help='Путь к архиву')
+        parser.add_argument('--chat-id', type=int, help='Восстановить в другой чат (по умолчанию — исходный)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: Path = options['path']
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+
+        try:
+            stats = restore_chat_archive(path, chat_id=options['chat_id'], batch_size=options['batch_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Чат {stats["chat_id"]}: восстановлено сообщений {stats["rows"]}, вложений {stats["attachments"]}; '
+                f'уже были {stats["existing"]}, пропущено (нет отправителя) {stats["skipped"]}, '
+                f'нет файлов {stats["missing_files"]}.'
+            )
+        )
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Chat = apps.get_model('education_app', 'Chat')
+    ChatParticipant = apps.get_model('education_app', 'ChatParticipant')
+    Message = apps.get_model('education_app', 'Message')
+
+    messages = Message.objects.filter(chat=OuterRef('pk')).order_by().values('chat')
+    Chat.objects.update(
+        message_count=Coalesce(Subquery(messages.annotate(total=Count('id')).values('total')), 0),
+        last_message_id=Subquery(messages.annotate(last=Max('id')).values('last')),
+    )
+
+    # Существующая история считается прочитанной, чтобы не показывать всем тысячи непрочитанных.
+    chats = Chat.objects.filter(pk=OuterRef('chat_id'))
+    ChatParticipant.objects.update(
+        read_count=Subquery(chats.values('message_count')),
+        last_read_message_id=Subquery(chats.values('last_message_id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0003_message_chat_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='education_app.message', verbose_name='Последнее сообщение'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество сообщений'),
+        ),
+        migrations.AddField(
+            model_name='chatparticipant',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='education_app.message', verbose_name='Последнее прочитанное сообщение'),
+        ),
+        migrations.AddField(
+            model_name='chatparticipant',
+            name='read_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Прочитано сообщений'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
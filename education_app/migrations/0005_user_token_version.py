@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0004_chat_unread_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия токенов'),
+        ),
+    ]
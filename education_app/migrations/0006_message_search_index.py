@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:10
+
+from django.db import migrations
+
+# DDL зафиксирован здесь, а не берётся из base.full_text: миграция не должна меняться вместе с кодом приложения.
+INSTALL_SQL = {
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE education_app_message_fts USING fts5(
+            text, content='education_app_message', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER education_app_message_fts_insert AFTER INSERT ON education_app_message BEGIN
+            INSERT INTO education_app_message_fts(rowid, text) VALUES (new.id, new.text);
+        END
+        """,
+        """
+        CREATE TRIGGER education_app_message_fts_delete AFTER DELETE ON education_app_message BEGIN
+            INSERT INTO education_app_message_fts(education_app_message_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+        """,
+        """
+        CREATE TRIGGER education_app_message_fts_update AFTER UPDATE OF text ON education_app_message BEGIN
+            INSERT INTO education_app_message_fts(education_app_message_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO education_app_message_fts(rowid, text) VALUES (new.id, new.text);
+        END
+        """,
+        "INSERT INTO education_app_message_fts(education_app_message_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "CREATE INDEX message_text_search_idx ON education_app_message USING gin (to_tsvector('simple', text))",
+    ],
+}
+
+UNINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS education_app_message_fts_insert',
+        'DROP TRIGGER IF EXISTS education_app_message_fts_delete',
+        'DROP TRIGGER IF EXISTS education_app_message_fts_update',
+        'DROP TABLE IF EXISTS education_app_message_fts',
+    ],
+    'postgresql': ['DROP INDEX IF EXISTS message_text_search_idx'],
+}
+
+
+# На SQLite пересборка таблицы сообщений (AlterField и т. п.) удаляет триггеры индекса — после таких миграций,
+# как и на других базах или со своим FULL_TEXT_BACKEND, индекс ставится командой `rebuild_search_indexes`.
+def install(apps, schema_editor):
+    for sql in INSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    for sql in UNINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0005_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:00
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# DDL и сборка поискового текста зафиксированы здесь, а не берутся из кода приложения:
+# миграция не должна меняться вместе с ним.
+INSTALL_SQL = {
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE education_app_course_fts USING fts5(
+            search_document, content='education_app_course', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER education_app_course_fts_insert AFTER INSERT ON education_app_course BEGIN
+            INSERT INTO education_app_course_fts(rowid, search_document) VALUES (new.id, new.search_document);
+        END
+        """,
+        """
+        CREATE TRIGGER education_app_course_fts_delete AFTER DELETE ON education_app_course BEGIN
+            INSERT INTO education_app_course_fts(education_app_course_fts, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+        END
+        """,
+        """
+        CREATE TRIGGER education_app_course_fts_update AFTER UPDATE OF search_document ON education_app_course BEGIN
+            INSERT INTO education_app_course_fts(education_app_course_fts, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+            INSERT INTO education_app_course_fts(rowid, search_document) VALUES (new.id, new.search_document);
+        END
+        """,
+        "INSERT INTO education_app_course_fts(education_app_course_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        """
+        CREATE INDEX course_document_search_idx ON education_app_course
+        USING gin (to_tsvector('simple', search_document))
+        """,
+    ],
+}
+
+UNINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS education_app_course_fts_insert',
+        'DROP TRIGGER IF EXISTS education_app_course_fts_delete',
+        'DROP TRIGGER IF EXISTS education_app_course_fts_update',
+        'DROP TABLE IF EXISTS education_app_course_fts',
+    ],
+    'postgresql': ['DROP INDEX IF EXISTS course_document_search_idx'],
+}
+
+
+def build_search_document(title, description, titles):
+    return '\n'.join([title, description or '', *titles])
+
+
+def backfill_search_documents(apps, schema_editor):
+    Course = apps.get_model('education_app', 'Course')
+    Module = apps.get_model('education_app', 'Module')
+    Lesson = apps.get_model('education_app', 'Lesson')
+
+    titles = defaultdict(list)
+    for course_id, title in Module.objects.order_by('order', 'id').values_list('course_id', 'title'):
+        titles[course_id].append(title)
+    for course_id, title in Lesson.objects.order_by('id').values_list('module__course_id', 'title'):
+        titles[course_id].append(title)
+
+    courses = [
+        Course(id=course_id, search_document=build_search_document(title, description, titles[course_id]))
+        for course_id, title, description in Course.objects.values_list('id', 'title', 'description')
+    ]
+    Course.objects.bulk_update(courses, ['search_document'], batch_size=500)
+
+
+# На других базах и со своим FULL_TEXT_BACKEND индекс ставится командой `rebuild_search_indexes`.
+def install(apps, schema_editor):
+    for sql in INSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    for sql in UNINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0006_message_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(install, uninstall),
+        # Фильтр по тегам и фасеты идут от тега к курсам; уникальный индекс (course_id, tag_id) покрывает обратное.
+        migrations.RunSQL(
+            'CREATE INDEX course_tags_tag_course_idx ON education_app_course_tags (tag_id, course_id)',
+            'DROP INDEX course_tags_tag_course_idx',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:15
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0007_course_catalog_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageUpload',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='Загружено байт')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('file', models.FileField(blank=True, upload_to='chat_files/', verbose_name='Файл')),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='education_app.chat', verbose_name='Чат')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Загрузка вложения',
+                'verbose_name_plural': 'Загрузки вложений',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+import base.storage
+from django.db import migrations, models
+
+# Хранилище не влияет на схему; операции только для состояния, иначе SQLite пересоздал бы таблицы
+# курсов и вложений вместе с триггерами полнотекстового индекса.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_blob'),
+        ('education_app', '0008_message_upload'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='course',
+                    name='avatar',
+                    field=models.ImageField(blank=True, null=True, storage=base.storage.blob_storage, upload_to='course_avatars/'),
+                ),
+                migrations.AlterField(
+                    model_name='lesson',
+                    name='avatar',
+                    field=models.ImageField(blank=True, null=True, storage=base.storage.blob_storage, upload_to='lesson_avatars/'),
+                ),
+                migrations.AlterField(
+                    model_name='messageattachment',
+                    name='file',
+                    field=models.FileField(blank=True, null=True, storage=base.storage.blob_storage, upload_to='chat_files/', verbose_name='Файл (включая изображения)'),
+                ),
+                migrations.AlterField(
+                    model_name='messageupload',
+                    name='file',
+                    field=models.FileField(blank=True, storage=base.storage.blob_storage, upload_to='chat_files/', verbose_name='Файл'),
+                ),
+                migrations.AlterField(
+                    model_name='module',
+                    name='avatar',
+                    field=models.ImageField(blank=True, null=True, storage=base.storage.blob_storage, upload_to='module_avatars/'),
+                ),
+            ],
+        ),
+    ]
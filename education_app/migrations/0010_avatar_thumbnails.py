@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education_app', '0009_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Миниатюры аватарки'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Миниатюры аватарки'),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Миниатюры аватарки'),
+        ),
+    ]
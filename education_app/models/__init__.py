@@ -1,6 +1,6 @@
 from .users import User
 from .course import Course
-from .chat import Chat, ChatParticipant, Message, MessageAttachment
+from .chat import Chat, ChatParticipant, Message, MessageAttachment, MessageUpload
 
 __all__ = [
     "User",
@@ -9,4 +9,5 @@ __all__ = [
     "ChatParticipant",
     "Message",
     "MessageAttachment",
+    "MessageUpload",
 ]
@@ -1,12 +1,24 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 
 from base.models import BaseModel
+from base.storage import blob_storage
 
 
 class Chat(BaseModel):
     name = models.CharField(max_length=255, blank=True, verbose_name='Название')
     is_group = models.BooleanField('Групповой чат', default=False)
+    last_message = models.ForeignKey(
+        'education_app.Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Последнее сообщение',
+    )
+    message_count = models.PositiveIntegerField('Количество сообщений', default=0)
 
     def __str__(self) -> str:
         return self.name or f'{"Группа" if self.is_group else "Приватная"} Чат #{self.id}'
@@ -25,6 +37,15 @@ class ChatParticipant(models.Model):
     )
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='participants', verbose_name='Чат')
     joined_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата присоединения')
+    last_read_message = models.ForeignKey(
+        'education_app.Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Последнее прочитанное сообщение',
+    )
+    read_count = models.PositiveIntegerField('Прочитано сообщений', default=0)
 
     class Meta:
         unique_together = ('user', 'chat')
@@ -52,6 +73,7 @@ class Message(BaseModel):
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
         ordering = ['-id']
+        indexes = [models.Index(fields=['chat', 'id'], name='message_chat_id_idx')]
 
 
 class MessageAttachment(models.Model):
@@ -61,7 +83,9 @@ class MessageAttachment(models.Model):
         on_delete=models.CASCADE,
         related_name='attachments',
     )
-    file = models.FileField('Файл (включая изображения)', upload_to='chat_files/', blank=True, null=True)
+    file = models.FileField(
+        'Файл (включая изображения)', upload_to='chat_files/', storage=blob_storage, blank=True, null=True
+    )
 
     class Meta:
         verbose_name = 'Вложение к сообщению'
@@ -69,3 +93,29 @@ class MessageAttachment(models.Model):
 
     def __str__(self) -> str:
         return f'Вложение: {self.message.id}'
+
+
+class MessageUpload(BaseModel):
+    """
+    Загрузка вложения по частям. Пока она идёт, байты дописываются в `chat_files/partial/<id>.part`,
+    `offset` — сколько из них подтверждено клиенту. Готовый файл переносится в `file` и при отправке
+    сообщения становится вложением, а сама загрузка удаляется.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name='Пользователь'
+    )
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='uploads', verbose_name='Чат')
+    filename = models.CharField('Имя файла', max_length=255)
+    size = models.PositiveBigIntegerField('Размер')
+    offset = models.PositiveBigIntegerField('Загружено байт', default=0)
+    sha256 = models.CharField('SHA-256', max_length=64, blank=True)
+    file = models.FileField('Файл', upload_to='chat_files/', storage=blob_storage, blank=True)
+
+    class Meta:
+        verbose_name = 'Загрузка вложения'
+        verbose_name_plural = 'Загрузки вложений'
+
+    def __str__(self) -> str:
+        return f'{self.filename}: {self.offset}/{self.size}'
@@ -6,6 +6,7 @@ from django.utils import timezone
 from education_app.models.chat import Chat
 from education_app.consts import TaskType
 from base.models import BaseModel
+from base.storage import blob_storage
 
 
 class Tag(models.Model):
@@ -23,10 +24,14 @@ class Course(BaseModel):
     title = models.CharField(max_length=50, verbose_name='Название курса')
     description = models.TextField(verbose_name='Описание курса', null=True)
     tags = models.ManyToManyField(Tag, related_name='courses', blank=True)
-    avatar = models.ImageField(upload_to='course_avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='course_avatars/', storage=blob_storage, blank=True, null=True)
+    # Миниатюры аватарки, которые режет задача generate_avatar_thumbnails (см. services/thumbnails.py).
+    avatar_thumbnails = models.JSONField('Миниатюры аватарки', null=True, blank=True, editable=False)
     duration_days = models.PositiveIntegerField(verbose_name='Длительность курса (в днях)', default=30)
     end_datetime = models.DateTimeField(null=True, blank=True, verbose_name='Дата и время окончания курса')
     chat = models.OneToOneField(Chat, on_delete=models.SET_NULL, null=True, blank=True, related_name='course')
+    # Название, описание и названия модулей и уроков одним текстом — по нему строится полнотекстовый индекс.
+    search_document = models.TextField(default='', blank=True, editable=False)
 
     def __str__(self) -> str:
         return self.title
@@ -44,7 +49,8 @@ class Course(BaseModel):
 
 class Module(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
-    avatar = models.ImageField(upload_to='module_avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='module_avatars/', storage=blob_storage, blank=True, null=True)
+    avatar_thumbnails = models.JSONField('Миниатюры аватарки', null=True, blank=True, editable=False)
     title = models.CharField(max_length=50, verbose_name='Название модуля')
     content = models.TextField(verbose_name='Содержимое модуля')
     order = models.PositiveIntegerField(default=0, null=True)
@@ -60,7 +66,8 @@ class Module(models.Model):
 
 class Lesson(models.Model):
     module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='lessons')
-    avatar = models.ImageField(upload_to='lesson_avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='lesson_avatars/', storage=blob_storage, blank=True, null=True)
+    avatar_thumbnails = models.JSONField('Миниатюры аватарки', null=True, blank=True, editable=False)
     title = models.CharField(max_length=50, verbose_name='Название урока')
     content = models.TextField(verbose_name='Содержимое урока')
     questions = models.ManyToManyField('education_app.Question', related_name='questions', blank=True)
@@ -9,6 +9,7 @@ class User(AbstractUser):
     courses = models.ManyToManyField('education_app.Course', related_name='users', blank=True)
 
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.STUDENT, verbose_name='Роль')
+    token_version = models.PositiveIntegerField(default=0, verbose_name='Версия токенов')
 
     def __str__(self) -> str:
         return self.username
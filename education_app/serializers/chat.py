@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
 
-from education_app.models.chat import Chat, ChatParticipant, Message
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageAttachment, MessageUpload
 
 User = get_user_model()
 
@@ -31,6 +34,93 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'sender', 'created_at')
 
 
+class MessageAttachmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MessageAttachment
+        fields = ('id', 'file')
+
+
+class ChatMessageSerializer(MessageSerializer):
+    """Сообщение в ленте чата: с вложениями; при отправке — id завершённых загрузок."""
+
+    attachments = MessageAttachmentSerializer(many=True, read_only=True)
+    uploads = serializers.ListField(
+        child=serializers.UUIDField(),
+        write_only=True,
+        required=False,
+        max_length=10,
+        help_text='id завершённых загрузок',
+    )
+
+    class Meta(MessageSerializer.Meta):
+        fields = ('id', 'sender', 'text', 'created_at', 'attachments', 'uploads')
+
+
+class MessageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MessageUpload
+        fields = ('id', 'filename', 'size', 'offset', 'sha256', 'created_at')
+        read_only_fields = ('id', 'offset', 'created_at')
+        extra_kwargs = {
+            'sha256': {
+                'required': False,
+                'help_text': (
+                    'SHA-256 файла (hex). Если такой файл уже есть в этом чате или среди ваших файлов, '
+                    'загрузка сразу завершена: offset = size'
+                ),
+            }
+        }
+
+    def validate_filename(self, value: str) -> str:
+        try:
+            return get_valid_filename(value.replace('\\', '/').rsplit('/', 1)[-1])
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError('Недопустимое имя файла')
+
+    def validate_size(self, value: int) -> int:
+        if not 0 < value <= settings.CHAT_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Размер должен быть от 1 до {settings.CHAT_UPLOAD_MAX_SIZE} байт')
+        return value
+
+    def validate_sha256(self, value: str) -> str:
+        value = value.lower()
+        if value and (len(value) != 64 or value.strip('0123456789abcdef')):
+            raise serializers.ValidationError('Ожидается SHA-256 в шестнадцатеричном виде')
+        return value
+
+
+class MessageSearchSerializer(MessageSerializer):
+    chat_id = serializers.IntegerField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    highlight = serializers.CharField(read_only=True, help_text='Фрагмент: HTML экранирован, совпадения в <mark>')
+
+    class Meta(MessageSerializer.Meta):
+        fields = ('id', 'chat_id', 'sender', 'text', 'created_at', 'rank', 'highlight')
+
+
+class MessageSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(help_text='Слова для поиска, все обязательны, ищутся по префиксу')
+    chat_id = serializers.IntegerField(required=False, help_text='Искать только в этом чате')
+
+
+class InboxChatSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='chat.id', read_only=True)
+    name = serializers.CharField(source='chat.name', read_only=True)
+    is_group = serializers.BooleanField(source='chat.is_group', read_only=True)
+    last_message = MessageSerializer(source='chat.last_message', read_only=True, allow_null=True)
+    message_count = serializers.IntegerField(source='chat.message_count', read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_read_message_id = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = ChatParticipant
+        fields = ('id', 'name', 'is_group', 'last_message', 'message_count', 'unread_count', 'last_read_message_id')
+
+
+class MarkReadSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(required=False, help_text='По умолчанию — последнее сообщение чата')
+
+
 class ChatSerializer(serializers.ModelSerializer):
     participants = ChatParticipantSerializer(many=True, read_only=True)
     messages = MessageSerializer(many=True, read_only=True)
@@ -40,6 +130,14 @@ class ChatSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'is_group', 'created_at', 'participants', 'messages')
 
 
+class ChatDetailSerializer(serializers.ModelSerializer):
+    participants = ChatParticipantSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Chat
+        fields = ('id', 'name', 'is_group', 'created_at', 'participants')
+
+
 class ChatUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -52,3 +150,13 @@ class CreateChatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chat
         fields = ('id', 'name', 'is_group', 'user_ids')
+
+
+class UpdateParticipantsSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs: dict) -> dict:
+        if set(attrs['add']) & set(attrs['remove']):
+            raise serializers.ValidationError('Один и тот же пользователь не может быть в add и remove')
+        return attrs
@@ -2,6 +2,7 @@ import typing
 
 from rest_framework import serializers
 
+from base.serializers import ResponsiveImageField, SparseFieldsetMixin
 from education_app.models.course import Course, Module, Lesson, Question, Answer, Tag
 from education_app.services.course import CourseService
 
@@ -13,6 +14,11 @@ class UpdateCourseUsersSerializer(serializers.Serializer):
     )
 
 
+class BulkEnrollSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    course_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
 class AnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answer
@@ -40,17 +46,17 @@ class QuestionShortSerializer(serializers.ModelSerializer):
 
 class LessonSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = ResponsiveImageField(required=False, allow_null=True)
 
     class Meta:
         model = Lesson
-        fields = '__all__'
+        exclude = ['avatar_thumbnails']
         read_only_fields = ['id']
 
 
 class LessonShortSerializer(serializers.ModelSerializer):
     # question_ids = serializers.PrimaryKeyRelatedField(many=True, read_only=True, source='questions')
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = ResponsiveImageField(required=False, allow_null=True)
 
     class Meta:
         model = Lesson
@@ -60,7 +66,7 @@ class LessonShortSerializer(serializers.ModelSerializer):
 
 class ModuleSerializer(serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = ResponsiveImageField(required=False, allow_null=True)
 
     class Meta:
         model = Module
@@ -69,7 +75,7 @@ class ModuleSerializer(serializers.ModelSerializer):
 
 
 class ModuleShortSerializer(serializers.ModelSerializer):
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = ResponsiveImageField(required=False, allow_null=True)
     lesson_ids = serializers.PrimaryKeyRelatedField(many=True, read_only=True, source='lessons')
 
     class Meta:
@@ -85,11 +91,40 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class TagFacetSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='tag_id')
+    title = serializers.CharField(source='tag__title')
+    count = serializers.IntegerField(help_text='Сколько курсов выдачи с этим тегом')
+
+
+class CourseCatalogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    tags = TagSerializer(many=True, read_only=True)
+    avatar = ResponsiveImageField(read_only=True)
+    modules_count = serializers.IntegerField(read_only=True)
+    lessons_count = serializers.IntegerField(read_only=True)
+    users_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = [
+            'id',
+            'title',
+            'tags',
+            'avatar',
+            'end_datetime',
+            'duration_days',
+            'modules_count',
+            'lessons_count',
+            'users_count',
+        ]
+        read_only_fields = fields
+
+
 class CourseSerializer(serializers.ModelSerializer):
     modules = ModuleSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     users = serializers.StringRelatedField(many=True, read_only=True)
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = ResponsiveImageField(required=False, allow_null=True)
 
     class Meta:
         model = Course
@@ -1,11 +1,17 @@
 import typing
 from typing import Any, Dict
 
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
 
 from education_app.models.course import Course
 from education_app.models.users import User
+from education_app.services.profile_cache import get_profile_summary
+from education_app.services.tokens import add_user_claims
 from education_app.services.users import create_user, set_courses_and_chats, update_user
 
 
@@ -56,17 +62,53 @@ class UserSerializer(serializers.ModelSerializer):
         return update_user(instance, validated_data)
 
 
+class UserImportSerializer(serializers.ModelSerializer):
+    """
+    Строка массового импорта. Уникальность логина проверяется импортёром одним запросом на пачку,
+    поэтому валидатор уникальности из модели здесь отключён.
+    """
+
+    password = serializers.CharField(write_only=True, required=True)
+    course_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+    class Meta:
+        model = User
+        fields = ('username', 'email', 'first_name', 'last_name', 'phone', 'password', 'course_ids')
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator()]},
+            'email': {'required': True},
+            'first_name': {'required': True},
+            'last_name': {'required': True},
+        }
+
+
+class UserImportFileSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text='CSV с заголовком или JSONL, по пользователю на строку')
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user: User) -> Token:
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         data: Dict[str, Any] = super().validate(attrs)
 
         user: User = self.user
 
-        data['user'] = {
-            'id': user.id,
-            'username': user.username,
-            'role': user.role,
-            'courses': list(user.courses.values_list('id', flat=True)),
-        }
+        data['user'] = get_profile_summary(user)
 
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Новый access-токен получает актуальные claims, поэтому после смены роли достаточно обновить токен."""
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(id=refresh.payload.get(api_settings.USER_ID_CLAIM), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        return {'access': str(add_user_claims(refresh.access_token, user))}
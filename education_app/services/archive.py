@@ -0,0 +1,153 @@
+import gzip
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageAttachment
+from education_app.models.users import User
+from education_app.services.chat import ChatService
+
+ARCHIVE_FORMAT_VERSION = 1
+
+
+def archive_path(chat_id: int) -> Path:
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+    return Path(settings.CHAT_ARCHIVE_ROOT) / f'chat_{chat_id}_{stamp}.jsonl.gz'
+
+
+def _message_batches(chat_id: int, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    last_id = 0
+    while True:
+        batch = list(
+            Message.objects.filter(chat_id=chat_id, id__gt=last_id)
+            .order_by('id')
+            .values('id', 'sender_id', 'text', 'created_at', 'updated_at')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]['id']
+
+
+def archive_and_purge_chat(chat: Chat, batch_size: int, path: Path | None = None) -> dict[str, Any]:
+    """
+    Выгружает сообщения чата в gzip JSONL и удаляет их пачками.
+
+    Первая строка — заголовок чата, дальше по строке на сообщение с путями вложений
+    относительно MEDIA_ROOT (сами файлы не трогаются). Пачка удаляется только после того,
+    как записана в архив, поэтому в памяти одновременно не больше `batch_size` сообщений.
+    """
+    path = path or archive_path(chat.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stats = {'path': str(path), 'rows': 0, 'attachments': 0}
+
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        header = {
+            'version': ARCHIVE_FORMAT_VERSION,
+            'chat': {'id': chat.id, 'name': chat.name, 'is_group': chat.is_group},
+        }
+        archive.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+        Chat.objects.filter(id=chat.id).update(last_message=None, message_count=0)
+        ChatParticipant.objects.filter(chat_id=chat.id).update(last_read_message=None, read_count=0)
+
+        for batch in _message_batches(chat.id, batch_size):
+            ids = [row['id'] for row in batch]
+            files: dict[int, list[str]] = {}
+            attachments = MessageAttachment.objects.filter(message_id__in=ids).values_list('message_id', 'file')
+            for message_id, name in attachments:
+                files.setdefault(message_id, []).append(name)
+
+            for row in batch:
+                row['created_at'] = row['created_at'].isoformat()
+                row['updated_at'] = row['updated_at'].isoformat()
+                row['attachments'] = files.get(row['id'], [])
+                archive.write(json.dumps(row, ensure_ascii=False) + '\n')
+            archive.flush()
+
+            # Ссылки на блобы вложений не снимаются: их держит архив, иначе сборщик мусора удалил бы файлы.
+            stats['attachments'] += MessageAttachment.objects.filter(message_id__in=ids)._raw_delete(
+                MessageAttachment.objects.db
+            )
+            stats['rows'] += Message.objects.filter(id__in=ids)._raw_delete(Message.objects.db)
+
+    return stats
+
+
+def _read_archive(path: Path) -> Iterator[dict[str, Any]]:
+    """Построчно читает архив: первым отдаётся заголовок, затем сообщения."""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        header = json.loads(archive.readline())
+        if header.get('version') != ARCHIVE_FORMAT_VERSION:
+            raise ValueError(f'Неподдерживаемая версия архива: {header.get("version")}')
+        yield header
+
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _restore_batch(chat: Chat, batch: list[dict[str, Any]], stats: dict[str, Any]) -> None:
+    existing_ids = set(Message.objects.filter(id__in=[row['id'] for row in batch]).values_list('id', flat=True))
+    batch = [row for row in batch if row['id'] not in existing_ids]
+    stats['existing'] += len(existing_ids)
+
+    sender_ids = {row['sender_id'] for row in batch}
+    existing_senders = set(User.objects.filter(id__in=sender_ids).values_list('id', flat=True))
+    restorable = [row for row in batch if row['sender_id'] in existing_senders]
+    stats['skipped'] += len(batch) - len(restorable)
+    if not restorable:
+        return
+
+    messages = [Message(id=row['id'], chat=chat, sender_id=row['sender_id'], text=row['text']) for row in restorable]
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        # auto_now_add/auto_now перезаписывают даты при вставке — возвращаем исходные.
+        for message, row in zip(messages, restorable, strict=True):
+            message.created_at = parse_datetime(row['created_at'])
+            message.updated_at = parse_datetime(row['updated_at'])
+        Message.objects.bulk_update(messages, ['created_at', 'updated_at'])
+
+        attachments = [
+            MessageAttachment(message_id=row['id'], file=name) for row in restorable for name in row['attachments']
+        ]
+        # Ссылки на блобы перешли от архива обратно к вложениям, счётчики не меняются.
+        MessageAttachment.objects.bulk_create(attachments)
+
+    stats['rows'] += len(restorable)
+    stats['attachments'] += len(attachments)
+    stats['missing_files'] += sum(1 for attachment in attachments if not default_storage.exists(attachment.file.name))
+
+
+def restore_chat_archive(path: Path, chat_id: int | None = None, batch_size: int = 1000) -> dict[str, Any]:
+    """
+    Возвращает сообщения из архива в чат с исходными id. Уже существующие сообщения не трогаются,
+    поэтому повторный запуск ничего не дублирует. Сообщения удалённых пользователей пропускаются.
+    """
+    rows = _read_archive(path)
+    header = next(rows)
+    chat_id = chat_id or header['chat']['id']
+    chat, _ = Chat.objects.get_or_create(
+        id=chat_id,
+        defaults={'name': header['chat']['name'], 'is_group': header['chat']['is_group']},
+    )
+
+    stats = {'chat_id': chat.id, 'rows': 0, 'attachments': 0, 'existing': 0, 'skipped': 0, 'missing_files': 0}
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _restore_batch(chat, batch, stats)
+            batch = []
+    if batch:
+        _restore_batch(chat, batch, stats)
+
+    ChatService.recount_messages(chat.id)
+    return stats
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models import Count, QuerySet
+from django.db.models.expressions import RawSQL
+
+from base.full_text import FullTextBackend, get_full_text_backend
+from education_app.models.course import Course, Lesson, Module
+
+
+def get_search_backend(db: BaseDatabaseWrapper = connection) -> FullTextBackend:
+    """Полнотекстовый индекс по `Course.search_document`."""
+    return get_full_text_backend('education_app_course', 'search_document', 'course_document', db)
+
+
+def build_search_document(title: str, description: str | None, titles: Iterable[str]) -> str:
+    return '\n'.join([title, description or '', *titles])
+
+
+def refresh_search_documents(course_ids: Iterable[int | None]) -> None:
+    """
+    Пересобирает поисковый текст курсов: название, описание, названия модулей и уроков.
+    Пишет через bulk_update — сигналы сохранения курса не срабатывают повторно.
+    """
+    ids = {course_id for course_id in course_ids if course_id}
+    if not ids:
+        return
+
+    titles: dict[int, list[str]] = defaultdict(list)
+    for course_id, title in (
+        Module.objects.filter(course_id__in=ids).order_by('order', 'id').values_list('course_id', 'title')
+    ):
+        titles[course_id].append(title)
+    for course_id, title in (
+        Lesson.objects.filter(module__course_id__in=ids).order_by('id').values_list('module__course_id', 'title')
+    ):
+        titles[course_id].append(title)
+
+    courses = [
+        Course(id=course_id, search_document=build_search_document(title, description, titles[course_id]))
+        for course_id, title, description in Course.objects.filter(id__in=ids).values_list('id', 'title', 'description')
+    ]
+    Course.objects.bulk_update(courses, ['search_document'])
+
+
+def search_courses(queryset: QuerySet, terms: list[str]) -> QuerySet:
+    """Курсы, где встречаются все слова (по префиксу), по убыванию релевантности."""
+    backend = get_search_backend()
+    pk_column = f'{Course._meta.db_table}.{Course._meta.pk.column}'
+    return (
+        queryset.filter(id__in=RawSQL(*backend.match_sql(terms)))
+        .annotate(search_rank=RawSQL(*backend.rank_sql(terms, pk_column)))
+        .order_by('-search_rank', '-created_at')
+    )
+
+
+def filter_by_tags(queryset: QuerySet, tag_ids: list[int], match_all: bool) -> QuerySet:
+    """Курсы хотя бы с одним из тегов или (`match_all`) со всеми сразу. Подзапросы по связке без join и distinct."""
+    links = Course.tags.through.objects.filter(tag_id__in=tag_ids).values('course_id')
+    if match_all:
+        links = links.annotate(matched=Count('tag_id')).filter(matched=len(set(tag_ids))).values('course_id')
+    return queryset.filter(id__in=links)
+
+
+def tag_facets(courses: QuerySet) -> list[dict[str, Any]]:
+    """Сколько курсов из выборки у каждого тега — один GROUP BY по связке курс–тег."""
+    return list(
+        Course.tags.through.objects.filter(course_id__in=courses.values('pk'))
+        .values('tag_id', 'tag__title')
+        .annotate(count=Count('course_id'))
+        .order_by('-count', 'tag__title')
+        .values('tag_id', 'tag__title', 'count')
+    )
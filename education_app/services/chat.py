@@ -1,23 +1,155 @@
-from education_app.models.chat import Chat, ChatParticipant
+import logging
+from collections import defaultdict
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework.exceptions import ValidationError
+
+from education_app.models.chat import Chat, ChatParticipant, Message
+from education_app.services.membership import invalidate_chat_members
+
+logger = logging.getLogger('chat')
+
+User = get_user_model()
 
 
 class ChatService:
+    @staticmethod
+    def group_name(chat_id: int) -> str:
+        return f'chat_{chat_id}'
+
+    @staticmethod
+    def broadcast_message(chat_id: int, payload: dict[str, Any]) -> None:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        try:
+            async_to_sync(channel_layer.group_send)(
+                ChatService.group_name(chat_id),
+                {'type': 'chat.message', 'message': payload},
+            )
+        except Exception:
+            # Сообщение уже сохранено, клиенты доберут его через историю (?after=).
+            logger.exception(f'Не удалось разослать сообщение в чат {chat_id}.')
+
+    @staticmethod
+    def register_message(message: Message) -> None:
+        """Обновляет счётчики чата и курсор отправителя. Вызывать в транзакции сохранения сообщения."""
+        Chat.objects.filter(id=message.chat_id).update(
+            message_count=F('message_count') + 1,
+            last_message_id=Greatest(Coalesce('last_message_id', Value(0)), Value(message.id)),
+        )
+        ChatParticipant.objects.filter(chat_id=message.chat_id, user_id=message.sender_id).update(
+            read_count=Subquery(Chat.objects.filter(id=OuterRef('chat_id')).values('message_count')),
+            last_read_message_id=Greatest(Coalesce('last_read_message_id', Value(0)), Value(message.id)),
+        )
+
+    @staticmethod
+    def register_messages(messages: list[Message]) -> None:
+        """Как `register_message` для пачки: по UPDATE на чат и на пару чат—отправитель, а не на сообщение."""
+        chats: dict[int, list[int]] = defaultdict(list)
+        senders: dict[tuple[int, int], int] = {}
+        for message in messages:
+            chats[message.chat_id].append(message.id)
+            key = (message.chat_id, message.sender_id)
+            senders[key] = max(senders.get(key, 0), message.id)
+
+        for chat_id, ids in chats.items():
+            Chat.objects.filter(id=chat_id).update(
+                message_count=F('message_count') + len(ids),
+                last_message_id=Greatest(Coalesce('last_message_id', Value(0)), Value(max(ids))),
+            )
+        for (chat_id, sender_id), last_id in senders.items():
+            ChatParticipant.objects.filter(chat_id=chat_id, user_id=sender_id).update(
+                read_count=Subquery(Chat.objects.filter(id=OuterRef('chat_id')).values('message_count')),
+                last_read_message_id=Greatest(Coalesce('last_read_message_id', Value(0)), Value(last_id)),
+            )
+
+    @staticmethod
+    def recount_messages(chat_id: int) -> None:
+        totals = Message.objects.filter(chat_id=chat_id).aggregate(total=Count('id'), last=Max('id'))
+        Chat.objects.filter(id=chat_id).update(message_count=totals['total'], last_message_id=totals['last'])
+
+    @staticmethod
+    def mark_read(participant: ChatParticipant, message_id: int | None = None) -> ChatParticipant:
+        chat = participant.chat
+        last_read_id = participant.last_read_message_id or 0
+
+        if message_id is None or (chat.last_message_id is not None and message_id >= chat.last_message_id):
+            if chat.last_message_id is None or last_read_id >= chat.last_message_id:
+                return participant
+            participant.last_read_message_id = chat.last_message_id
+            participant.read_count = chat.message_count
+        else:
+            # Курсор — внешний ключ: чужой или несуществующий id дал бы 500 или сдвинул бы курсор по другому чату.
+            # Id не меньше последнего просто означает «всё прочитано» — так и для сообщений, ещё лежащих в буфере.
+            if not Message.objects.filter(chat_id=chat.id, id=message_id).exists():
+                raise ValidationError({'message_id': 'Сообщение не найдено в этом чате'})
+            if message_id <= last_read_id:
+                return participant
+            participant.last_read_message_id = message_id
+            participant.read_count = Message.objects.filter(chat_id=chat.id, id__lte=message_id).count()
+
+        participant.save(update_fields=['last_read_message', 'read_count'])
+        return participant
+
     @staticmethod
     def create_chat(name: str, is_group: bool, user_ids: list[int]) -> Chat:
         chat = Chat.objects.create(name=name, is_group=is_group)
 
         participants = [ChatParticipant(chat=chat, user_id=user_id) for user_id in user_ids]
         ChatParticipant.objects.bulk_create(participants)
+        invalidate_chat_members([chat.id])
 
         return chat
 
     @staticmethod
-    def update_chat(instance: Chat, name: str, is_group: bool, user_ids: list[int]) -> Chat:
-        instance.name = name
-        instance.is_group = is_group
-        instance.save()
+    def update_chat(instance: Chat, name: str, is_group: bool, user_ids: list[int] | None) -> Chat:
+        with transaction.atomic():
+            instance.name = name
+            instance.is_group = is_group
+            instance.save(update_fields=['name', 'is_group', 'updated_at'])
 
-        ChatParticipant.objects.filter(chat=instance).delete()
-        ChatParticipant.objects.bulk_create([ChatParticipant(chat=instance, user_id=uid) for uid in user_ids])
+            if user_ids is not None:
+                ChatService.set_participants(instance.id, user_ids)
 
         return instance
+
+    @staticmethod
+    def add_participants(chat_id: int, user_ids: list[int]) -> int:
+        """Добавляет недостающих участников одним INSERT. Несуществующие пользователи игнорируются."""
+        new_ids = list(
+            User.objects.filter(id__in=user_ids)
+            .exclude(chat_participations__chat_id=chat_id)
+            .values_list('id', flat=True)
+        )
+        ChatParticipant.objects.bulk_create(
+            [ChatParticipant(chat_id=chat_id, user_id=user_id) for user_id in new_ids],
+            ignore_conflicts=True,
+        )
+        invalidate_chat_members([chat_id])
+        return len(new_ids)
+
+    @staticmethod
+    def remove_participants(chat_id: int, user_ids: list[int]) -> int:
+        removed, _ = ChatParticipant.objects.filter(chat_id=chat_id, user_id__in=user_ids).delete()
+        invalidate_chat_members([chat_id])
+        return removed
+
+    @staticmethod
+    def set_participants(chat_id: int, user_ids: list[int]) -> tuple[int, int]:
+        """
+        Приводит состав чата к `user_ids`, не трогая тех, кто уже состоит в чате:
+        их `joined_at` и курсор прочтения сохраняются.
+        """
+        with transaction.atomic():
+            removed, _ = ChatParticipant.objects.filter(chat_id=chat_id).exclude(user_id__in=user_ids).delete()
+            added = ChatService.add_participants(chat_id, user_ids)
+            invalidate_chat_members([chat_id])
+        return added, removed
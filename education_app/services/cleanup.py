@@ -0,0 +1,169 @@
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from base.storage import release_blob_references
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageAttachment
+from education_app.models.course import Course
+from education_app.models.users import User
+from education_app.services.archive import archive_and_purge_chat
+from education_app.services.content_version import bump_content_versions
+from education_app.services.membership import invalidate_chat_members
+from education_app.services.profile_cache import invalidate_profiles
+
+
+class CleanupReport(dict):
+    """Статистика очистки по фазам: `{'phase': {'rows': int, 'seconds': float}}`."""
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[dict[str, Any]]:
+        stats: dict[str, Any] = {'rows': 0}
+        started = time.monotonic()
+        try:
+            yield stats
+        finally:
+            stats['seconds'] = round(time.monotonic() - started, 3)
+            self[name] = stats
+
+    @property
+    def total_rows(self) -> int:
+        return sum(stats['rows'] for name, stats in self.items() if name != 'courses')
+
+
+def expired_courses(now: datetime | None = None) -> QuerySet:
+    """
+    Курсы, у которых `end_datetime < now - duration_days`.
+
+    Переносимо умножить интервал на колонку нельзя (SQLite), поэтому условие собирается
+    по различным значениям `duration_days` — их единицы, а каждое даёт диапазон по `end_datetime`.
+    """
+    now = now or timezone.now()
+    durations = Course.objects.order_by().values_list('duration_days', flat=True).distinct()
+
+    condition = Q(pk__in=[])
+    for days in durations:
+        condition |= Q(duration_days=days, end_datetime__lt=now - timedelta(days=days))
+    return Course.objects.filter(condition)
+
+
+def delete_in_batches(
+    queryset: QuerySet,
+    batch_size: int,
+    before_delete: Callable[[list[int]], None] | None = None,
+) -> int:
+    """
+    Удаляет строки пачками по первичному ключу прямым DELETE, без загрузки объектов и сигналов.
+    Каскады не отрабатывают — зависимые строки нужно удалить раньше (или в `before_delete`).
+    """
+    model = queryset.model
+    ids_query = queryset.order_by('pk').values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        ids = list(ids_query[:batch_size])
+        if not ids:
+            return deleted
+        if before_delete:
+            before_delete(ids)
+        deleted += model.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+
+
+def _chunks(values: list[Any], size: int) -> Iterator[list[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def purge_enrollments(course_ids: list[int], report: CleanupReport, batch_size: int, dry_run: bool = False) -> None:
+    enrollments = User.courses.through.objects
+    with report.phase('enrollments') as stats:
+        for chunk in _chunks(course_ids, batch_size):
+            queryset = enrollments.filter(course_id__in=chunk)
+            if dry_run:
+                stats['rows'] += queryset.count()
+                continue
+            user_ids = set(queryset.values_list('user_id', flat=True).distinct())
+            stats['rows'] += delete_in_batches(queryset, batch_size)
+            invalidate_profiles(user_ids)
+            bump_content_versions(chunk)
+
+
+def purge_chats(
+    chat_ids: list[int],
+    report: CleanupReport,
+    batch_size: int,
+    dry_run: bool = False,
+    archive: bool = False,
+) -> None:
+    with report.phase('chat_participants') as stats:
+        for chunk in _chunks(chat_ids, batch_size):
+            queryset = ChatParticipant.objects.filter(chat_id__in=chunk)
+            if dry_run:
+                stats['rows'] += queryset.count()
+                continue
+            stats['rows'] += delete_in_batches(queryset, batch_size)
+            invalidate_chat_members(chunk)
+
+    if dry_run:
+        with report.phase('messages') as stats:
+            stats['attachments'] = 0
+            for chunk in _chunks(chat_ids, batch_size):
+                stats['rows'] += Message.objects.filter(chat_id__in=chunk).count()
+                stats['attachments'] += MessageAttachment.objects.filter(message__chat_id__in=chunk).count()
+        return
+
+    if archive:
+        with report.phase('messages') as stats:
+            stats.update(attachments=0, archives=[])
+            for chat in Chat.objects.filter(id__in=chat_ids).iterator():
+                result = archive_and_purge_chat(chat, batch_size)
+                stats['rows'] += result['rows']
+                stats['attachments'] += result['attachments']
+                stats['archives'].append(result['path'])
+        return
+
+    with report.phase('messages') as stats:
+        stats['attachments'] = 0
+
+        def delete_attachments(message_ids: list[int]) -> None:
+            attachments = MessageAttachment.objects.filter(message_id__in=message_ids)
+            release_blob_references(attachments.values_list('file', flat=True))
+            stats['attachments'] += attachments._raw_delete(MessageAttachment.objects.db)
+
+        for chunk in _chunks(chat_ids, batch_size):
+            Chat.objects.filter(id__in=chunk).update(last_message=None, message_count=0)
+            stats['rows'] += delete_in_batches(
+                Message.objects.filter(chat_id__in=chunk), batch_size, before_delete=delete_attachments
+            )
+
+
+def clean_expired_courses(
+    course_ids: list[int] | None = None,
+    batch_size: int | None = None,
+    dry_run: bool = False,
+    archive: bool | None = None,
+) -> CleanupReport:
+    """
+    Отписывает слушателей от завершённых курсов и очищает их чаты.
+    Повторный запуск ничего не удаляет; при `dry_run=True` только считает строки,
+    при `archive=True` сообщения перед удалением выгружаются в CHAT_ARCHIVE_ROOT.
+    """
+    batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+    archive = settings.CLEANUP_ARCHIVE_MESSAGES if archive is None else archive
+    report = CleanupReport()
+
+    with report.phase('courses') as stats:
+        courses = expired_courses()
+        if course_ids is not None:
+            courses = courses.filter(id__in=course_ids)
+        rows = list(courses.values_list('id', 'chat_id'))
+        stats['rows'] = len(rows)
+
+    purge_enrollments([course_id for course_id, _ in rows], report, batch_size, dry_run)
+    purge_chats([chat_id for _, chat_id in rows if chat_id], report, batch_size, dry_run, archive)
+
+    return report
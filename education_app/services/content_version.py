@@ -0,0 +1,77 @@
+import logging
+import uuid
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from education_app.models.course import Course, Lesson, Module
+
+logger = logging.getLogger('course')
+
+VERSION_KEY = 'content:version:course:{}'
+OWNER_KEY = 'content:owner:{}:{}'
+
+
+def get_content_version(course_id: int) -> str | None:
+    """
+    Версия содержимого курса. Значение случайное, а не счётчик: если Redis потеряет ключ,
+    новая версия не совпадёт ни с одним выданным ETag. None — кеш недоступен.
+    """
+    key = VERSION_KEY.format(course_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(key)
+    except Exception:
+        logger.exception(f'Кеш версий содержимого недоступен, курс {course_id}')
+        return None
+    return version
+
+
+def bump_content_versions(course_ids: Iterable[int | None]) -> None:
+    """Сбрасывает версии курсов сразу и ещё раз после коммита, чтобы не закешировать данные до коммита."""
+    keys = [VERSION_KEY.format(course_id) for course_id in set(course_ids) if course_id]
+    if not keys:
+        return
+
+    def delete() -> None:
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            logger.exception(f'Не удалось сбросить версии содержимого {len(keys)} курсов')
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def get_owner_course_id(model: type[Module] | type[Lesson] | type[Course], pk: int) -> int | None:
+    """Курс, которому принадлежит модуль или урок. Кешируется, чтобы проверка ETag не ходила в БД."""
+    if model is Course:
+        return pk
+
+    key = OWNER_KEY.format(model._meta.model_name, pk)
+    try:
+        course_id = cache.get(key)
+    except Exception:
+        course_id = None
+    if course_id is not None:
+        return course_id
+
+    lookup = 'course_id' if model is Module else 'module__course_id'
+    course_id = model.objects.filter(pk=pk).values_list(lookup, flat=True).first()
+    if course_id is not None:
+        try:
+            cache.set(key, course_id, settings.CONTENT_OWNER_CACHE_TIMEOUT)
+        except Exception:
+            logger.exception(f'Не удалось сохранить владельца {key}')
+    return course_id
+
+
+def forget_owners(model: type[Module] | type[Lesson], pks: Iterable[int]) -> None:
+    try:
+        cache.delete_many([OWNER_KEY.format(model._meta.model_name, pk) for pk in pks])
+    except Exception:
+        logger.exception(f'Не удалось сбросить владельцев {model._meta.model_name}')
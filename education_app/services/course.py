@@ -1,15 +1,33 @@
 import typing
 
 from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from education_app.models.chat import Chat, ChatParticipant
-from education_app.models.course import Course
+from education_app.models.course import Course, Lesson, Module
+from education_app.services.membership import invalidate_chat_members
+from education_app.services.profile_cache import invalidate_profiles
 
 User = get_user_model()
 
 
+def _count_subquery(queryset: QuerySet, group_by: str) -> Coalesce:
+    counts = queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 class CourseService:
+    @staticmethod
+    def annotate_catalog_counts(queryset: QuerySet) -> QuerySet:
+        # Коррелированные подзапросы вместо Count по join'ам: модули × уроки × слушатели не перемножаются.
+        return queryset.annotate(
+            modules_count=_count_subquery(Module.objects.filter(course=OuterRef('pk')), 'course'),
+            lessons_count=_count_subquery(Lesson.objects.filter(module__course=OuterRef('pk')), 'module__course'),
+            users_count=_count_subquery(User.courses.through.objects.filter(course=OuterRef('pk')), 'course'),
+        )
+
     @staticmethod
     def save_course(course: Course) -> None:
         if not course.end_datetime:
@@ -30,12 +48,15 @@ class CourseService:
         if users:
             course.users.set(users)
             ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in users])
+            invalidate_profiles(user.id for user in users)
+            invalidate_chat_members([chat.id])
 
         return course
 
     @staticmethod
     def update_course_users(course: Course, user_ids: list[int]) -> None:
         users = User.objects.filter(id__in=user_ids)
+        previous_ids = set(course.users.values_list('id', flat=True))
         course.users.set(users)
 
         chat = course.chat
@@ -46,8 +67,10 @@ class CourseService:
             new_ids = set(users.values_list('id', flat=True)) - existing_ids
 
             ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user_id=user_id) for user_id in new_ids])
+            invalidate_chat_members([chat.id])
 
         course.save()
+        invalidate_profiles(previous_ids | set(users.values_list('id', flat=True)))
 
 
 class UserService:
@@ -56,3 +79,4 @@ class UserService:
         courses = Course.objects.filter(id__in=course_ids)
         user.courses.set(courses)
         user.save()
+        invalidate_profiles([user.id])
@@ -0,0 +1,165 @@
+import csv
+import datetime
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from education_app.models.chat import ChatParticipant, Message
+from education_app.models.users import User
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+@dataclass(frozen=True)
+class Export:
+    """Что выгружать: колонки (имена в выгрузке и пути для `.values_list`), фильтр по владельцу и порядок."""
+
+    model: type[Model]
+    columns: tuple[tuple[str, str], ...]
+    owner_field: str
+    ordering: tuple[str, ...]
+
+    def queryset(self, owner_id: int | None = None) -> QuerySet:
+        queryset = self.model._default_manager.all()
+        if owner_id is not None:
+            queryset = queryset.filter(**{self.owner_field: owner_id})
+        return queryset.order_by(*self.ordering).values_list(*(path for _, path in self.columns))
+
+    @property
+    def header(self) -> list[str]:
+        return [name for name, _ in self.columns]
+
+
+EXPORTS = {
+    'enrollments': Export(
+        model=User.courses.through,
+        columns=(
+            ('course_id', 'course_id'),
+            ('course_title', 'course__title'),
+            ('user_id', 'user_id'),
+            ('username', 'user__username'),
+            ('email', 'user__email'),
+            ('role', 'user__role'),
+        ),
+        owner_field='course_id',
+        ordering=('course_id', 'user_id'),
+    ),
+    'participants': Export(
+        model=ChatParticipant,
+        columns=(
+            ('chat_id', 'chat_id'),
+            ('user_id', 'user_id'),
+            ('username', 'user__username'),
+            ('joined_at', 'joined_at'),
+            ('last_read_message_id', 'last_read_message_id'),
+        ),
+        owner_field='chat_id',
+        ordering=('chat_id', 'id'),
+    ),
+    'messages': Export(
+        model=Message,
+        columns=(
+            ('id', 'id'),
+            ('chat_id', 'chat_id'),
+            ('sender_id', 'sender_id'),
+            ('sender_username', 'sender__username'),
+            ('text', 'text'),
+            ('created_at', 'created_at'),
+        ),
+        owner_field='chat_id',
+        ordering=('chat_id', 'id'),
+    ),
+}
+
+
+class _Line:
+    """Файлоподобный приёмник для csv.writer: `write` просто возвращает строку."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+# С этих символов таблицы (Excel, LibreOffice) начинают формулу — такой текст экранируем апострофом.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _encode(rows: Iterable[tuple], header: list[str], fmt: str) -> Iterator[str]:
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(header, row, strict=True))) + '\n'
+
+
+def _buffered(lines: Iterator[str], flush_bytes: int) -> Iterator[bytes]:
+    # Первая строка уходит сразу, дальше — кусками по ~flush_bytes, чтобы не писать в сокет на каждую строку.
+    first = next(lines, None)
+    if first is None:
+        return
+    yield first.encode()
+
+    buffer: list[bytes] = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= flush_bytes:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_export(name: str, fmt: str = 'ndjson', owner_id: int | None = None) -> Iterator[bytes]:
+    """
+    Выгрузка `name` (ключ EXPORTS) в NDJSON или CSV по частям. Строки читаются серверным курсором
+    (`.iterator(chunk_size=EXPORT_CHUNK_SIZE)`) в виде кортежей, без моделей и сериализаторов,
+    поэтому память не зависит от числа строк. `owner_id` — id курса или чата.
+    """
+    export = EXPORTS[name]
+    rows = export.queryset(owner_id).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    return _buffered(_encode(rows, export.header, fmt), settings.EXPORT_FLUSH_BYTES)
+
+
+def export_response(request: Request, name: str, owner_param: str) -> StreamingHttpResponse:
+    """Потоковый ответ для API: формат — `?output=ndjson|csv`, владелец — `?<owner_param>=<id>`."""
+    fmt = request.query_params.get('output', 'ndjson')
+    if fmt not in FORMATS:
+        raise ValidationError({'output': f'Допустимые значения: {", ".join(FORMATS)}'})
+
+    owner_id = request.query_params.get(owner_param)
+    if owner_id is not None and not owner_id.isdigit():
+        raise ValidationError({owner_param: 'Ожидается целое число'})
+
+    response = StreamingHttpResponse(
+        iter_export(name, fmt, int(owner_id) if owner_id else None), content_type=FORMATS[fmt]
+    )
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{name}_{stamp}.{fmt}"'
+    # Иначе nginx копит весь ответ в буфере, и первый байт до клиента не доходит.
+    response['X-Accel-Buffering'] = 'no'
+    return response
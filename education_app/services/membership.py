@@ -0,0 +1,207 @@
+import logging
+import re
+from collections.abc import Iterable
+from functools import cache
+from itertools import groupby
+from uuid import uuid4
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from education_app.models.chat import ChatParticipant
+
+logger = logging.getLogger(__name__)
+
+MEMBERS_KEY = 'chat:members:{}'
+# Поколение состава: меняется при каждом сбросе. Состав, прочитанный из базы до сброса, в кеш уже не попадёт.
+GENERATION_KEY = 'chat:members:generation:{}'
+LOCAL_VERSION_KEY = 'chat:members:local:{}'
+LOCAL_MEMBER_KEY = 'chat:member:{}:{}:{}'
+# Метка «состав загружен» внутри множества: отличает пустой чат от отсутствующего ключа.
+LOADED = '-'
+
+
+# Состав пишется, только если поколение не сменилось с чтения (ARGV[1], '' — ключа не было).
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+-- Частями: unpack большого состава упёрся бы в предел стека Lua.
+for i = 3, #ARGV, 1000 do
+    redis.call('SADD', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RedisSets:
+    """Состав чата — множество Redis, проверка участника — SISMEMBER."""
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.cache = caches['default']
+        self.client = client
+        self._fill = client.register_script(FILL_SCRIPT)
+
+    def _keys(self, chat_id: int) -> tuple[str, str]:
+        # Ключи с префиксом и версией кеша 'default' — их сбрасывает и `cache.clear()`.
+        return (
+            self.cache.make_and_validate_key(MEMBERS_KEY.format(chat_id)),
+            self.cache.make_and_validate_key(GENERATION_KEY.format(chat_id)),
+        )
+
+    def generation(self, chat_id: int) -> str:
+        value = self.client.get(self._keys(chat_id)[1]) or ''
+        return value.decode() if isinstance(value, bytes) else value
+
+    def contains(self, chat_id: int, user_id: int) -> bool | None:
+        key, _ = self._keys(chat_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sismember(key, LOADED)
+        pipe.sismember(key, user_id)
+        loaded, member = pipe.execute()
+        return bool(member) if loaded else None
+
+    def fill(self, chat_id: int, user_ids: Iterable[int], generation: str | None = None) -> bool:
+        """Записывает состав; с `generation` — только если состав с тех пор не сбрасывали. True — записан."""
+        key, generation_key = self._keys(chat_id)
+        if generation is None:
+            pipe = self.client.pipeline()
+            pipe.delete(key)
+            pipe.sadd(key, LOADED, *user_ids)
+            pipe.expire(key, settings.MEMBERSHIP_CACHE_TIMEOUT)
+            pipe.execute()
+            return True
+        args = [generation, settings.MEMBERSHIP_CACHE_TIMEOUT, LOADED, *user_ids]
+        return bool(self._fill(keys=[key, generation_key], args=args))
+
+    def invalidate(self, chat_ids: set[int]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for chat_id in chat_ids:
+            key, generation_key = self._keys(chat_id)
+            pipe.set(generation_key, uuid4().hex, ex=settings.MEMBERSHIP_CACHE_TIMEOUT)
+            pipe.delete(key)
+        pipe.execute()
+
+
+class CachedSets:
+    """
+    Для кешей без множеств (LocMem в тестах и разработке): frozenset целиком в значении.
+    Поколение сверяется без атомарности — такие кеши и так живут в одном процессе.
+    """
+
+    def generation(self, chat_id: int) -> str:
+        return caches['default'].get(GENERATION_KEY.format(chat_id), '')
+
+    def contains(self, chat_id: int, user_id: int) -> bool | None:
+        members = caches['default'].get(MEMBERS_KEY.format(chat_id))
+        return None if members is None else user_id in members
+
+    def fill(self, chat_id: int, user_ids: Iterable[int], generation: str | None = None) -> bool:
+        if generation is not None and self.generation(chat_id) != generation:
+            return False
+        caches['default'].set(MEMBERS_KEY.format(chat_id), frozenset(user_ids), settings.MEMBERSHIP_CACHE_TIMEOUT)
+        return True
+
+    def invalidate(self, chat_ids: set[int]) -> None:
+        timeout = settings.MEMBERSHIP_CACHE_TIMEOUT
+        caches['default'].set_many({GENERATION_KEY.format(chat_id): uuid4().hex for chat_id in chat_ids}, timeout)
+        caches['default'].delete_many([MEMBERS_KEY.format(chat_id) for chat_id in chat_ids])
+
+
+@cache
+def _redis(url: str) -> redis.Redis:
+    return redis.Redis.from_url(url, socket_connect_timeout=1)
+
+
+def _store() -> RedisSets | CachedSets:
+    if not isinstance(caches['default'], RedisCache):
+        return CachedSets()
+    # Свой клиент к основному (пишущему) серверу кеша: RedisCache не отдаёт клиента наружу.
+    location = settings.CACHES['default']['LOCATION']
+    primary = location[0] if isinstance(location, list | tuple) else re.split('[;,]', location)[0]
+    return RedisSets(_redis(primary))
+
+
+def _load(chat_id: int) -> set[int]:
+    return set(ChatParticipant.objects.filter(chat_id=chat_id).values_list('user_id', flat=True))
+
+
+def _local_key(chat_id: int, user_id: int) -> str:
+    # Версия чата в ключе: сброс состава в этом процессе — это новая версия, а не перебор ключей участников.
+    local = caches['membership']
+    version_key = LOCAL_VERSION_KEY.format(chat_id)
+    version = local.get(version_key)
+    if version is None:
+        version = uuid4().hex
+        local.set(version_key, version, None)
+    return LOCAL_MEMBER_KEY.format(chat_id, version, user_id)
+
+
+def is_chat_member(chat_id: int, user_id: int) -> bool:
+    """
+    Состоит ли пользователь в чате — без join'ов: локальный LRU процесса, затем множество в Redis,
+    при холодном ключе — один запрос участников чата. Несуществующий чат — пустой состав.
+    """
+    local = caches['membership']
+    local_key = _local_key(chat_id, user_id)
+    member = local.get(local_key)
+    if member is not None:
+        return member
+
+    store = _store()
+    try:
+        member = store.contains(chat_id, user_id)
+        generation = store.generation(chat_id) if member is None else ''
+    except Exception:
+        logger.exception(f'Кеш участников чатов недоступен, чат {chat_id}')
+        return ChatParticipant.objects.filter(chat_id=chat_id, user_id=user_id).exists()
+
+    if member is None:
+        # Поколение читается до базы: если состав сбросят, пока мы его читаем, устаревший список не запишется.
+        members = _load(chat_id)
+        member = user_id in members
+        try:
+            store.fill(chat_id, members, generation)
+        except Exception:
+            logger.exception(f'Не удалось сохранить состав чата {chat_id}')
+
+    local.set(local_key, member, settings.MEMBERSHIP_LOCAL_TIMEOUT)
+    return member
+
+
+def invalidate_chat_members(chat_ids: Iterable[int | None]) -> None:
+    """
+    Сбрасывает закешированный состав чатов. Вызывается везде, где меняются участники.
+    Как и профили, ключи удаляются сразу и ещё раз после коммита, и каждый раз меняется поколение состава:
+    читатель, загрузивший состав из базы до коммита, не вернёт его в кеш. Локальные LRU других процессов
+    отстают не дольше MEMBERSHIP_LOCAL_TIMEOUT.
+    """
+    chat_ids = {chat_id for chat_id in chat_ids if chat_id}
+    if not chat_ids:
+        return
+
+    def delete() -> None:
+        caches['membership'].delete_many([LOCAL_VERSION_KEY.format(chat_id) for chat_id in chat_ids])
+        try:
+            _store().invalidate(chat_ids)
+        except Exception:
+            logger.exception(f'Не удалось сбросить состав {len(chat_ids)} чатов')
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def rebuild_membership_cache(chunk_size: int = 5000) -> int:
+    """Заполняет множества всех чатов с участниками одним проходом по таблице — для холодного старта."""
+    store = _store()
+    rows = ChatParticipant.objects.order_by('chat_id').values_list('chat_id', 'user_id').iterator(chunk_size)
+    chats = 0
+    for chat_id, members in groupby(rows, key=lambda row: row[0]):
+        store.fill(chat_id, [user_id for _, user_id in members])
+        chats += 1
+    return chats
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from functools import cache
+from typing import Any
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from education_app.models.chat import Chat, Message
+from education_app.models.users import User
+from education_app.serializers.chat import UserSerializer
+from education_app.services.chat import ChatService
+
+logger = logging.getLogger('chat')
+
+STREAM_KEY = 'chat:messages:stream'
+GROUP = 'message-writers'
+COUNTER_KEY = 'chat:messages:last_id'
+CEILING_KEY = 'chat:messages:id_ceiling'
+PENDING_KEY = 'chat:messages:pending:{}'
+
+# id, поток и список ожидающих меняются одним скриптом: порядок записей в потоке совпадает с порядком id.
+# nil — зарезервированные в базе id кончились.
+APPEND_SCRIPT = """
+local id = tonumber(redis.call('GET', KEYS[1]) or '0') + 1
+if id > tonumber(redis.call('GET', KEYS[2]) or '0') then
+    return false
+end
+redis.call('SET', KEYS[1], id)
+redis.call('XADD', KEYS[3], '*', 'id', id, 'chat_id', ARGV[1], 'payload', ARGV[2])
+redis.call('HSET', KEYS[4], id, ARGV[2])
+return id
+"""
+
+# Новый диапазон ARGV[1]..ARGV[2]; если другой процесс уже зарезервировал диапазон выше — ничего не делаем.
+# Остаток прежнего диапазона при этом пропускается: новый всегда выше.
+EXTEND_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') < tonumber(ARGV[2]) then
+    local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+    redis.call('SET', KEYS[1], math.max(last, tonumber(ARGV[1]) - 1))
+    redis.call('SET', KEYS[2], ARGV[2])
+end
+"""
+
+
+def reserve_message_ids(count: int) -> tuple[int, int]:
+    """
+    Резервирует `count` id сообщений подряд: сдвигает последовательность таблицы, и автоинкремент
+    (обычные INSERT из админки, импорта и т. п.) эти id уже не выдаст. Возвращает первый и последний id.
+    """
+    table = Message._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # UPDATE первым берёт блокировку записи, дальше до коммита последовательность никто не двигает.
+            cursor.execute(
+                f'UPDATE sqlite_sequence SET seq = max(seq, (SELECT COALESCE(MAX(id), 0) FROM {table})) + %s '
+                'WHERE name = %s',
+                [count, table],
+            )
+            cursor.execute(
+                f'INSERT INTO sqlite_sequence (name, seq) SELECT %s, COALESCE(MAX(id), 0) + %s FROM {table} '
+                'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, count, table],
+            )
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        elif connection.vendor == 'postgresql':
+            # Блокировка несовместима с INSERT: пока сдвигаем последовательность, nextval никто не вызовет.
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+                [table, table, count],
+            )
+        else:
+            raise ImproperlyConfigured(f'Буфер сообщений не поддерживает базу {connection.vendor}')
+        last = cursor.fetchone()[0]
+    return last - count + 1, last
+
+
+def write_messages(entries: list[dict[str, Any]]) -> int:
+    """
+    Записывает пачку сообщений из буфера одним INSERT и обновляет счётчики чатов.
+    Идемпотентна: уже записанные id пропускаются, поэтому пачку можно повторить после падения воркера.
+    Сообщения удалённых чатов и пользователей отбрасываются. Возвращает число записанных сообщений.
+    """
+    with transaction.atomic():
+        existing = set(Message.objects.filter(id__in=[entry['id'] for entry in entries]).values_list('id', flat=True))
+        entries = [entry for entry in entries if entry['id'] not in existing]
+        chat_ids = set(Chat.objects.filter(id__in={entry['chat_id'] for entry in entries}).values_list('id', flat=True))
+        user_ids = set(
+            User.objects.filter(id__in={entry['sender_id'] for entry in entries}).values_list('id', flat=True)
+        )
+
+        messages = []
+        for entry in entries:
+            if entry['chat_id'] not in chat_ids or entry['sender_id'] not in user_ids:
+                logger.warning(f'Сообщение {entry["id"]} отброшено: чат или отправитель удалены.')
+                continue
+            messages.append(
+                Message(
+                    id=entry['id'],
+                    chat_id=entry['chat_id'],
+                    sender_id=entry['sender_id'],
+                    text=entry['text'],
+                    created_at=entry['created_at'],
+                    updated_at=entry['created_at'],
+                )
+            )
+        if not messages:
+            return 0
+
+        # raw: bulk_create затёр бы назначенное при приёме время (auto_now_add), а INSERT нужен с готовыми id.
+        fields = [
+            Message._meta.get_field(name) for name in ('id', 'chat', 'sender', 'text', 'created_at', 'updated_at')
+        ]
+        batch_size = connection.ops.bulk_batch_size(fields, messages)
+        for start in range(0, len(messages), batch_size):
+            Message.objects._insert(messages[start : start + batch_size], fields=fields, raw=True)
+        ChatService.register_messages(messages)
+    return len(messages)
+
+
+class MessageBuffer:
+    """
+    Поток Redis перед таблицей сообщений. API кладёт сообщение с уже назначенными id и временем
+    (`append`) и сразу отвечает; `flush` забирает пачку через группу потребителей и пишет её `write_messages`.
+
+    Запись подтверждается (XACK) только после коммита, поэтому при падении воркера она остаётся
+    в списке ожидающих группы и её забирает следующий `flush` (XAUTOCLAIM). Пока сообщение не в базе,
+    его видно в `pending` — из него лента чата дочитывает свежие сообщения.
+    """
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.client = client
+        self._append = client.register_script(APPEND_SCRIPT)
+        self._extend = client.register_script(EXTEND_SCRIPT)
+
+    def append(self, chat_id: int, user: Any, text: str) -> dict[str, Any]:
+        """Ставит сообщение в очередь и возвращает его так же, как ChatMessageSerializer (без вложений)."""
+        payload = {
+            'sender': UserSerializer(user).data,
+            'text': text,
+            'created_at': serializers.DateTimeField().to_representation(timezone.now()),
+            'attachments': [],
+        }
+        data = json.dumps(payload, ensure_ascii=False)
+        keys = [COUNTER_KEY, CEILING_KEY, STREAM_KEY, PENDING_KEY.format(chat_id)]
+        while (message_id := self._append(keys=keys, args=[chat_id, data])) is None:
+            first, last = reserve_message_ids(settings.MESSAGE_BUFFER_ID_BLOCK)
+            self._extend(keys=[COUNTER_KEY, CEILING_KEY], args=[first, last])
+        return {'id': int(message_id), **payload}
+
+    def skip_reserved_ids(self) -> None:
+        """Бросает остаток зарезервированного диапазона: следующие id будут выше всех уже вставленных в базу."""
+        # Без Redis новый диапазон всё равно не сохранить — не резервируем его в базе впустую.
+        self.client.ping()
+        first, last = reserve_message_ids(settings.MESSAGE_BUFFER_ID_BLOCK)
+        self._extend(keys=[COUNTER_KEY, CEILING_KEY], args=[first, last])
+
+    def pending(self, chat_id: int) -> list[dict[str, Any]]:
+        """Принятые, но ещё не записанные сообщения чата, от новых к старым."""
+        rows = self.client.hgetall(PENDING_KEY.format(chat_id))
+        messages = [{'id': int(message_id), **json.loads(data)} for message_id, data in rows.items()]
+        return sorted(messages, key=lambda message: message['id'], reverse=True)
+
+    def ensure_group(self) -> None:
+        try:
+            self.client.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+        except redis.ResponseError as exc:
+            if 'BUSYGROUP' not in str(exc):
+                raise
+
+    def _claim(self, consumer: str, count: int) -> list[tuple[str, dict]]:
+        # Записи, которые взял и не подтвердил упавший (или зависший) воркер. Redis 6.2 отвечает
+        # [курсор, записи], с 7.0 добавляет третьим элементом удалённые id, а удалённые записи
+        # в 6.2 приходят как (None, None). Подтверждённые записи удаляются после XACK, так что их не бывает.
+        idle = int(settings.MESSAGE_BUFFER_CLAIM_IDLE * 1000)
+        response = self.client.xautoclaim(STREAM_KEY, GROUP, consumer, idle, '0-0', count=count)
+        return [entry for entry in response[1] if entry[0] is not None]
+
+    def _collect(self, consumer: str, count: int, interval: float) -> list[tuple[str, dict]]:
+        # Копим пачку, пока она не наберёт `count` записей или не пройдёт `interval` секунд; 0 — без ожидания.
+        entries: list[tuple[str, dict]] = []
+        deadline = time.monotonic() + interval
+        while len(entries) < count:
+            block = int((deadline - time.monotonic()) * 1000)
+            response = self.client.xreadgroup(
+                GROUP, consumer, {STREAM_KEY: '>'}, count=count - len(entries), block=block if block > 0 else None
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+            if block <= 0:
+                break
+        return entries
+
+    def flush(self, consumer: str, batch_size: int | None = None, interval: float | None = None) -> int:
+        """Одна пачка: сначала брошенные записи, иначе новые. Возвращает число обработанных записей потока."""
+        batch_size = batch_size or settings.MESSAGE_BUFFER_BATCH_SIZE
+        interval = settings.MESSAGE_BUFFER_FLUSH_INTERVAL if interval is None else interval
+
+        entries = self._claim(consumer, batch_size) or self._collect(consumer, batch_size, interval)
+        if not entries:
+            return 0
+
+        rows = []
+        for _, fields in entries:
+            payload = json.loads(fields['payload'])
+            rows.append(
+                {
+                    'id': int(fields['id']),
+                    'chat_id': int(fields['chat_id']),
+                    'sender_id': payload['sender']['id'],
+                    'text': payload['text'],
+                    'created_at': parse_datetime(payload['created_at']),
+                }
+            )
+        written = write_messages(rows)
+        logger.info(f'Из буфера записано сообщений: {written} из {len(rows)}.')
+
+        pipe = self.client.pipeline()
+        entry_ids = [entry_id for entry_id, _ in entries]
+        pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        for row in rows:
+            pipe.hdel(PENDING_KEY.format(row['chat_id']), row['id'])
+        pipe.execute()
+        return len(entries)
+
+
+@cache
+def _client(url: str) -> redis.Redis:
+    return redis.Redis.from_url(url, decode_responses=True, socket_connect_timeout=1)
+
+
+def get_message_buffer() -> MessageBuffer:
+    return MessageBuffer(_client(settings.MESSAGE_BUFFER_URL))
+
+
+def consumer_name() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+# В базу писали напрямую, а сменить диапазон id в Redis не удалось: его сменит следующий приём в буфер.
+_stale_ids = threading.Event()
+
+
+def buffer_message(chat_id: int, user: Any, text: str) -> dict[str, Any] | None:
+    """Сообщение в буфер; None — Redis недоступен, и сообщение нужно сохранить сразу в базу."""
+    try:
+        buffer = get_message_buffer()
+        if _stale_ids.is_set():
+            buffer.skip_reserved_ids()
+            _stale_ids.clear()
+        return buffer.append(chat_id, user, text)
+    except redis.RedisError:
+        logger.exception(f'Буфер сообщений недоступен, чат {chat_id}: запись напрямую.')
+        _stale_ids.set()
+        return None
+
+
+def skip_reserved_ids() -> None:
+    """
+    Вызывается после прямой записи сообщения в базу (с вложениями или без Redis). Такое сообщение получает id
+    выше остатка диапазона буфера, и без смены диапазона следующие сообщения из буфера были бы старше его по id —
+    клиенты, дочитывающие ленту с `after=`, их бы пропустили. Если Redis недоступен, диапазон сменится
+    при следующем приёме в буфер.
+    """
+    if _stale_ids.is_set():
+        return
+    try:
+        get_message_buffer().skip_reserved_ids()
+    except redis.RedisError:
+        logger.exception('Буфер сообщений недоступен: диапазон id сменится при следующем приёме.')
+        _stale_ids.set()
+
+
+def pending_messages(chat_id: int) -> list[dict[str, Any]]:
+    try:
+        return get_message_buffer().pending(chat_id)
+    except redis.RedisError:
+        logger.exception(f'Буфер сообщений недоступен, чат {chat_id}: лента только из базы.')
+        return []
+
+
+def drain_message_buffer(max_batches: int = 100) -> int:
+    """
+    Разбирает всё, что накопилось в буфере (не больше `max_batches` пачек), не дожидаясь новых сообщений.
+    Возвращает число обработанных записей.
+    """
+    buffer = get_message_buffer()
+    buffer.ensure_group()
+    consumer = consumer_name()
+    processed = 0
+    for _ in range(max_batches):
+        flushed = buffer.flush(consumer, interval=0)
+        if not flushed:
+            break
+        processed += flushed
+    return processed
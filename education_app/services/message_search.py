@@ -0,0 +1,15 @@
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models import QuerySet
+
+from base.full_text import FullTextBackend, SearchResults, get_full_text_backend
+
+
+def get_search_backend(db: BaseDatabaseWrapper = connection) -> FullTextBackend:
+    """Полнотекстовый индекс по тексту сообщений."""
+    return get_full_text_backend('education_app_message', 'text', 'message_text', db)
+
+
+def search_messages(terms: list[str], chat_ids: QuerySet) -> SearchResults:
+    """Выдача по сообщениям в чатах из `chat_ids` (queryset с одной колонкой id чата)."""
+    return SearchResults(get_search_backend(), terms, ('chat_id', chat_ids))
@@ -0,0 +1,83 @@
+import logging
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from education_app.models.users import User
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = 'profile:summary:{}'
+ME_KEY = 'profile:me:{}'
+STATS_KEY = 'profile:stats:{}'
+
+
+def _count(outcome: str) -> None:
+    key = STATS_KEY.format(outcome)
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def _cached(key: str, build: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """Читает профиль из кеша, при промахе собирает и кладёт обратно. Недоступный Redis не ломает ответ."""
+    try:
+        value = cache.get(key)
+        _count('hits' if value is not None else 'misses')
+    except Exception:
+        logger.exception(f'Кеш профилей недоступен, ключ {key}')
+        return build()
+
+    if value is None:
+        value = build()
+        try:
+            cache.set(key, value, settings.PROFILE_CACHE_TIMEOUT)
+        except Exception:
+            logger.exception(f'Не удалось сохранить {key} в кеш профилей')
+    return value
+
+
+def build_profile_summary(user: User) -> dict[str, Any]:
+    return {
+        'id': user.id,
+        'username': user.username,
+        'role': user.role,
+        'courses': list(user.courses.values_list('id', flat=True)),
+    }
+
+
+def get_profile_summary(user: User) -> dict[str, Any]:
+    """Краткий профиль для ответа логина: id, логин, роль и id курсов."""
+    return _cached(SUMMARY_KEY.format(user.id), lambda: build_profile_summary(user))
+
+
+def get_me_payload(user: User, build: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """Ответ `/api/users/me/`; инвалидируется вместе с кратким профилем."""
+    return _cached(ME_KEY.format(user.id), lambda: dict(build()))
+
+
+def invalidate_profiles(user_ids: Iterable[int]) -> None:
+    """
+    Сбрасывает закешированные профили. Вызывается везде, где меняются курсы пользователя или он сам.
+    Ключи удаляются сразу и ещё раз после коммита: иначе конкурентный запрос успеет
+    положить в кеш данные, прочитанные до коммита.
+    """
+    keys = [key.format(user_id) for user_id in set(user_ids) for key in (SUMMARY_KEY, ME_KEY)]
+    if not keys:
+        return
+
+    def delete() -> None:
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            logger.exception(f'Не удалось сбросить кеш профилей для {len(keys) // 2} пользователей')
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def profile_cache_stats() -> dict[str, int]:
+    stats = cache.get_many([STATS_KEY.format('hits'), STATS_KEY.format('misses')])
+    return {outcome: stats.get(STATS_KEY.format(outcome), 0) for outcome in ('hits', 'misses')}
@@ -0,0 +1,153 @@
+import io
+import logging
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Model
+from PIL import ExifTags, Image, ImageOps
+
+from base.storage import BLOB_PREFIX, blob_storage, derived_name, is_blob
+from education_app.models.course import Course, Lesson, Module
+from education_app.services.content_version import bump_content_versions, get_owner_course_id
+
+logger = logging.getLogger('course')
+
+AVATAR_MODELS = (Course, Module, Lesson)
+WEBP = 'image/webp'
+# Формат Pillow и расширение. Запасной вариант для браузеров без WebP — JPEG, с прозрачностью — PNG.
+FORMATS = {WEBP: ('WEBP', 'webp'), 'image/jpeg': ('JPEG', 'jpg'), 'image/png': ('PNG', 'png')}
+ROTATED = {5, 6, 7, 8}
+
+
+def needs_thumbnails(name: str | None, thumbnails: dict[str, Any] | None) -> bool:
+    """Аватарка лежит в хранилище блобов, а миниатюр нет или они построены для другого файла или других ширин."""
+    if not is_blob(name):
+        return False
+    return (
+        not thumbnails
+        or thumbnails.get('source') != name
+        or thumbnails.get('widths') != settings.AVATAR_THUMBNAIL_WIDTHS
+    )
+
+
+def _target_widths(width: int) -> list[int]:
+    configured = sorted(settings.AVATAR_THUMBNAIL_WIDTHS)
+    widths = [target for target in configured if target < width]
+    # Больше исходной не увеличиваем, но саму картинку в пределах набора тоже отдаём пережатой.
+    if width <= configured[-1]:
+        widths.append(width)
+    return widths
+
+
+def build_thumbnails(source: str) -> dict[str, Any]:
+    """
+    Режет блоб `source` по ширинам AVATAR_THUMBNAIL_WIDTHS в WebP и запасном формате.
+    Возвращает `{'source': ..., 'widths': [...], '<mime>': {'<ширина>': имя}}`. Имена зависят только
+    от содержимого, поэтому одинаковые аватарки режутся один раз, а уже готовые миниатюры не пересобираются.
+    """
+    storage = blob_storage()
+    quality = settings.AVATAR_THUMBNAIL_QUALITY
+    thumbnails: dict[str, Any] = {'source': source, 'widths': settings.AVATAR_THUMBNAIL_WIDTHS}
+
+    with storage.open(source, 'rb') as file, Image.open(file) as original:
+        transparent = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+        fallback = 'image/png' if transparent else 'image/jpeg'
+        width, height = original.size
+        if original.getexif().get(ExifTags.Base.Orientation) in ROTATED:
+            width, height = height, width
+
+        widths = _target_widths(width)
+        for mime in (WEBP, fallback):
+            extension = FORMATS[mime][1]
+            thumbnails[mime] = {str(target): derived_name(source, f'{target}.{extension}') for target in widths}
+        if all(storage.exists(name) for mime in (WEBP, fallback) for name in thumbnails[mime].values()):
+            return thumbnails
+
+        # JPEG сразу декодируется в уменьшенном масштабе (не меньше самой большой миниатюры) — в разы быстрее.
+        original.draft(original.mode, (widths[-1], widths[-1]))
+        image = ImageOps.exif_transpose(original).convert('RGBA' if transparent else 'RGB')
+        # От большей миниатюры к меньшей: каждая режется из предыдущей, а не из исходника.
+        for target in reversed(widths):
+            if target != image.width:
+                size = (target, max(1, round(image.height * target / image.width)))
+                image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for mime in (WEBP, fallback):
+                pillow_format, extension = FORMATS[mime]
+                buffer = io.BytesIO()
+                image.save(buffer, pillow_format, quality=quality, method=4)
+                storage.save_derived(source, f'{target}.{extension}', ContentFile(buffer.getvalue()))
+    return thumbnails
+
+
+def generate_thumbnails(model: type[Model], pk: int) -> bool:
+    """Строит миниатюры аватарки объекта, если они устарели. True — сохранены новые."""
+    row = model._base_manager.filter(pk=pk).values_list('avatar', 'avatar_thumbnails').first()
+    if row is None or not needs_thumbnails(*row):
+        return False
+
+    source = row[0]
+    try:
+        thumbnails = build_thumbnails(source)
+    except (OSError, Image.DecompressionBombError):
+        # Битую картинку запоминаем без миниатюр, чтобы не резать её снова; отдаётся исходный файл.
+        logger.exception(f'Не удалось построить миниатюры {source} ({model._meta.label} {pk})')
+        thumbnails = {'source': source, 'widths': settings.AVATAR_THUMBNAIL_WIDTHS}
+
+    # Аватарку могли сменить, пока резали миниатюры, — тогда результат уже не нужен.
+    if not model._base_manager.filter(pk=pk, avatar=source).update(avatar_thumbnails=thumbnails):
+        return False
+    bump_content_versions([get_owner_course_id(model, pk)])
+    return True
+
+
+def stale_avatars(chunk_size: int) -> Iterator[tuple[type[Model], list[int]]]:
+    """Пачки id объектов, которым нужны миниатюры. Постранично по id, без долгого курсора."""
+    for model in AVATAR_MODELS:
+        queryset = model._base_manager.filter(avatar__startswith=f'{BLOB_PREFIX}/').order_by('pk')
+        last = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last).values_list('pk', 'avatar', 'avatar_thumbnails')[:chunk_size])
+            if not rows:
+                break
+            last = rows[-1][0]
+            pks = [pk for pk, name, thumbnails in rows if needs_thumbnails(name, thumbnails)]
+            if pks:
+                yield model, pks
+
+
+def _generate_many(model: type[Model], pks: list[int]) -> int:
+    return sum(generate_thumbnails(model, pk) for pk in pks)
+
+
+def _generate_in_thread(model: type[Model], pks: list[int]) -> int:
+    try:
+        return _generate_many(model, pks)
+    finally:
+        connection.close()
+
+
+def regenerate_thumbnails(workers: int = 1, chunk_size: int = 100) -> int:
+    """
+    Строит недостающие и устаревшие миниатюры всех аватарок и возвращает число обновлённых объектов.
+    Готовые пропускаются, поэтому прерванный запуск продолжается следующим. Pillow отпускает GIL
+    при декодировании, масштабировании и сжатии, поэтому пачки в `workers` потоках идут параллельно.
+    """
+    chunks = stale_avatars(chunk_size)
+    if workers <= 1:
+        return sum(_generate_many(model, pks) for model, pks in chunks)
+
+    generated = 0
+    pending: set[Future] = set()
+    with ThreadPoolExecutor(workers) as executor:
+        for model, pks in chunks:
+            pending.add(executor.submit(_generate_in_thread, model, pks))
+            # Очередь ограничена, чтобы не держать в памяти id всех объектов сразу.
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                generated += sum(future.result() for future in done)
+        generated += sum(future.result() for future in wait(pending).done)
+    return generated
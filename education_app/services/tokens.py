@@ -0,0 +1,74 @@
+import logging
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.tokens import Token
+
+from education_app.models.users import User
+from education_app.services.profile_cache import get_profile_summary
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION_CLAIM = 'ver'
+TOKEN_VERSION_KEY = 'auth:token_version:{}'
+
+# Поля, изменение которых делает выданные токены недействительными: они зашиты в claims
+# или влияют на права, которые проверяются по claims без запроса к БД.
+REVOKING_FIELDS = ('role', 'is_staff', 'is_superuser', 'is_active', 'username')
+
+
+def add_user_claims(token: Token, user: User) -> Token:
+    """Кладёт в токен всё, что нужно проверкам прав без запроса пользователя из БД."""
+    summary = get_profile_summary(user)
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['courses'] = summary['courses']
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+
+def get_token_version(user_id: int) -> int | None:
+    """
+    Текущая версия токенов пользователя: из кеша, при промахе — из БД.
+    None — пользователя нет или он деактивирован.
+    """
+    key = TOKEN_VERSION_KEY.format(user_id)
+    try:
+        version = cache.get(key)
+    except Exception:
+        logger.exception(f'Кеш версий токенов недоступен, пользователь {user_id}')
+        version = None
+    if version is not None:
+        return version
+
+    version = User.objects.filter(id=user_id, is_active=True).values_list('token_version', flat=True).first()
+    if version is not None:
+        try:
+            cache.set(key, version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+        except Exception:
+            logger.exception(f'Не удалось сохранить версию токенов пользователя {user_id}')
+    return version
+
+
+def revoke_tokens(user_ids: Iterable[int]) -> None:
+    """Отзывает все выданные access-токены пользователей: следующий запрос получит 401 и обновит токен."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    User.objects.filter(id__in=user_ids).update(token_version=F('token_version') + 1)
+    keys = [TOKEN_VERSION_KEY.format(user_id) for user_id in user_ids]
+
+    def delete() -> None:
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            logger.exception(f'Не удалось сбросить версии токенов для {len(keys)} пользователей')
+
+    delete()
+    transaction.on_commit(delete)
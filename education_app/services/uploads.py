@@ -0,0 +1,236 @@
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import Any, BinaryIO
+from uuid import UUID
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from base.storage import add_blob_references, find_blob
+from education_app.models.chat import Message, MessageAttachment, MessageUpload
+
+logger = logging.getLogger('chat')
+
+PARTIAL_NAME = 'chat_files/partial/{}.part'
+LOCAL_HASHERS = 256
+
+# Хеш всего файла считается по мере записи частей. Состояние hashlib нельзя сохранить в базе,
+# поэтому оно живёт в памяти процесса; если следующую часть принял другой процесс, хеш досчитывается
+# чтением файла при завершении.
+_hashers: OrderedDict[UUID, tuple[int, Any]] = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class UploadOffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Смещение не совпадает с загруженным'
+    default_code = 'upload_offset_conflict'
+
+    def __init__(self, offset: int) -> None:
+        super().__init__({'offset': offset, 'detail': self.default_detail})
+        self.offset = offset
+
+
+class _PartialFile(File):
+    """Дописанный файл загрузки: FileSystemStorage переносит его на место, а не копирует."""
+
+    def __init__(self, path: str, sha256: str) -> None:
+        super().__init__(None, path)
+        self.sha256 = sha256
+
+    def temporary_file_path(self) -> str:
+        return self.name
+
+
+def _storage() -> Storage:
+    return MessageAttachment._meta.get_field('file').storage
+
+
+def partial_path(upload: MessageUpload) -> str:
+    # Дописывать в файл по смещению умеет только хранилище с локальными путями (FileSystemStorage).
+    return _storage().path(PARTIAL_NAME.format(upload.id))
+
+
+def _take_hasher(upload_id: UUID, offset: int) -> Any:
+    with _hashers_lock:
+        entry = _hashers.pop(upload_id, None)
+    return entry[1] if entry and entry[0] == offset else None
+
+
+def _put_hasher(upload_id: UUID, offset: int, hasher: Any) -> None:
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, hasher)
+        while len(_hashers) > LOCAL_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _file_digest(path: str) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+def _can_reuse_blob(user_id: int, chat_id: int, name: str) -> bool:
+    """
+    Знание хеша не доказывает, что у клиента есть файл. Поэтому без загрузки отдаём только то, к чему у него
+    уже есть доступ: вложения этого чата, его собственные вложения и загрузки.
+    """
+    attachments = MessageAttachment.objects.filter(file=name)
+    return (
+        attachments.filter(message__chat_id=chat_id).exists()
+        or attachments.filter(message__sender_id=user_id).exists()
+        or MessageUpload.objects.filter(user_id=user_id, file=name).exists()
+    )
+
+
+def create_upload(user_id: int, chat_id: int, filename: str, size: int, sha256: str = '') -> MessageUpload:
+    """
+    `sha256` — необязательный хеш всего файла от клиента. Если такой файл уже хранится и доступен отправителю
+    (см. `_can_reuse_blob`), загрузка сразу ссылается на него и считается завершённой; иначе файл загружается
+    как обычно, а хеш проверяется при завершении.
+    """
+    upload = MessageUpload(user_id=user_id, chat_id=chat_id, filename=filename, size=size, sha256=sha256)
+    existing = find_blob(sha256, filename, size) if sha256 else None
+    if existing and _can_reuse_blob(user_id, chat_id, existing):
+        upload.offset = size
+        upload.file.name = existing
+        upload.save()
+        return upload
+
+    upload.save()
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    _put_hasher(upload.id, 0, hashlib.sha256())
+    return upload
+
+
+def write_chunk(
+    upload: MessageUpload, offset: int, stream: BinaryIO, length: int, checksum: bytes | None = None
+) -> int:
+    """
+    Пишет часть `length` байт из `stream` с позиции `offset` прямо в файл загрузки, блоками
+    CHAT_UPLOAD_BLOCK_SIZE — память не зависит ни от размера части, ни от размера файла.
+
+    `offset` должен совпадать с подтверждённым (иначе 409 с текущим смещением, с него клиент и продолжает).
+    Новое смещение подтверждается только после fsync; оборванная часть просто перезаписывается следующей.
+    `checksum` — необязательный SHA-256 части от клиента. Возвращает новое смещение.
+    """
+    if upload.file:
+        raise ValidationError({'detail': 'Загрузка уже завершена'})
+    if offset != upload.offset:
+        raise UploadOffsetConflict(upload.offset)
+    if offset + length > upload.size:
+        raise ValidationError({'detail': f'Часть выходит за объявленный размер файла ({upload.size} байт)'})
+
+    whole = _take_hasher(upload.id, offset)
+    chunk = hashlib.sha256()
+    with open(partial_path(upload), 'r+b') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadOffsetConflict(upload.offset)
+        # Пока ждали блокировку, часть мог дописать параллельный запрос.
+        current = MessageUpload.objects.filter(id=upload.id).values_list('offset', flat=True).get()
+        if current != offset:
+            raise UploadOffsetConflict(current)
+
+        file.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(settings.CHAT_UPLOAD_BLOCK_SIZE, remaining))
+            if not block:
+                raise ValidationError({'detail': 'Тело запроса короче Content-Length'})
+            file.write(block)
+            chunk.update(block)
+            if whole is not None:
+                whole.update(block)
+            remaining -= len(block)
+
+        if checksum is not None and checksum != chunk.digest():
+            raise ValidationError({'detail': 'Контрольная сумма части не совпадает'})
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+
+        upload.offset = offset + length
+        MessageUpload.objects.filter(id=upload.id).update(offset=upload.offset, updated_at=timezone.now())
+
+    if whole is not None:
+        _put_hasher(upload.id, upload.offset, whole)
+    return upload.offset
+
+
+def complete_upload(upload: MessageUpload) -> MessageUpload:
+    """
+    Переносит загруженный файл в хранилище блобов (одинаковый файл там уже может быть — тогда часть просто
+    удаляется) и фиксирует его SHA-256. Повторный вызов ничего не делает.
+    """
+    if upload.file:
+        return upload
+    if upload.offset != upload.size:
+        raise ValidationError({'detail': f'Загружено {upload.offset} из {upload.size} байт'})
+
+    path = partial_path(upload)
+    hasher = _take_hasher(upload.id, upload.offset)
+    sha256 = hasher.hexdigest() if hasher is not None else _file_digest(path)
+    if upload.sha256 and upload.sha256 != sha256:
+        raise ValidationError({'detail': 'SHA-256 файла не совпадает с объявленным при создании загрузки'})
+    upload.sha256 = sha256
+    storage = _storage()
+    upload.file.name = storage.save(f'chat_files/{upload.filename}', _PartialFile(path, sha256))
+    upload.save(update_fields=['sha256', 'file', 'updated_at'])
+    storage.delete(PARTIAL_NAME.format(upload.id))
+    return upload
+
+
+def attach_uploads(message: Message, upload_ids: Iterable[UUID]) -> list[MessageAttachment]:
+    """Делает завершённые загрузки отправителя в этом чате вложениями сообщения. Вызывать в транзакции."""
+    upload_ids = set(upload_ids)
+    uploads = MessageUpload.objects.filter(
+        id__in=upload_ids, user_id=message.sender_id, chat_id=message.chat_id
+    ).exclude(file='')
+    names = list(uploads.values_list('file', flat=True))
+    # Удаление и проверка количества — защита от того, что одну загрузку прикрепят два запроса сразу.
+    deleted, _ = uploads.delete()
+    if deleted != len(upload_ids) or len(names) != len(upload_ids):
+        raise ValidationError({'uploads': 'Загрузка не найдена, не завершена или уже прикреплена'})
+    # Удалённые загрузки отпустили ссылки на блобы сигналом, bulk_create сигналов не шлёт — ссылки вложений явно.
+    attachments = MessageAttachment.objects.bulk_create(
+        [MessageAttachment(message=message, file=name) for name in names]
+    )
+    add_blob_references(names)
+    return attachments
+
+
+def delete_upload(upload: MessageUpload) -> None:
+    storage = _storage()
+    for name in (PARTIAL_NAME.format(upload.id), upload.file.name):
+        if name:
+            storage.delete(name)
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    upload.delete()
+
+
+def purge_stale_uploads() -> int:
+    """Удаляет брошенные загрузки — незавершённые или не прикреплённые за CHAT_UPLOAD_EXPIRE_HOURS."""
+    expired = timezone.now() - timedelta(hours=settings.CHAT_UPLOAD_EXPIRE_HOURS)
+    purged = 0
+    for upload in MessageUpload.objects.filter(updated_at__lt=expired).iterator():
+        try:
+            delete_upload(upload)
+        except OSError:
+            logger.exception(f'Не удалось удалить файлы загрузки {upload.id}')
+            continue
+        purged += 1
+    return purged
@@ -0,0 +1,135 @@
+import csv
+import json
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, TextIO
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from education_app.models.users import User
+from education_app.serializers.users import UserImportSerializer
+from education_app.services.users import enroll
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Any]:
+    """
+    Потоково читает CSV или JSONL. В CSV `course_ids` перечисляются через `;`, `,` или пробел.
+    Битая строка JSONL отдаётся как есть — сериализатор вернёт по ней ошибку, не прерывая импорт.
+    """
+    if fmt == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield line
+        return
+
+    for row in csv.DictReader(stream):
+        course_ids = row.get('course_ids')
+        if course_ids is not None:
+            row['course_ids'] = [value for value in re.split(r'[;,\s]+', course_ids) if value]
+        yield row
+
+
+class UserImporter:
+    """
+    Импорт пользователей пачками: валидация без запросов на строку, хеширование паролей
+    в пуле процессов, bulk_create и запись на курсы одним вызовом `enroll` на пачку.
+    Ошибочные строки попадают в `errors` и не прерывают импорт.
+    """
+
+    def __init__(self, batch_size: int | None = None, workers: int | None = None) -> None:
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.workers = workers or settings.USER_IMPORT_WORKERS
+        self.created = 0
+        self.enrolled = 0
+        self.errors: list[dict[str, Any]] = []
+        self._seen_usernames: set[str] = set()
+
+    def run(self, rows: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        numbered = enumerate(rows, start=1)
+        if self.workers == 1:
+            while chunk := list(islice(numbered, self.batch_size)):
+                self._import_chunk(chunk, None)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as pool:
+                while chunk := list(islice(numbered, self.batch_size)):
+                    self._import_chunk(chunk, pool)
+        return {'created': self.created, 'enrolled': self.enrolled, 'errors': self.errors}
+
+    def _validate(self, chunk: list[tuple[int, dict[str, Any]]]) -> list[tuple[int, dict[str, Any]]]:
+        valid = []
+        for number, row in chunk:
+            serializer = UserImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.errors.append({'row': number, 'errors': serializer.errors})
+                continue
+            username = serializer.validated_data['username']
+            if username in self._seen_usernames:
+                self.errors.append({'row': number, 'errors': {'username': ['Повторяется в файле']}})
+                continue
+            self._seen_usernames.add(username)
+            valid.append((number, serializer.validated_data))
+
+        taken = set(
+            User.objects.filter(username__in=[data['username'] for _, data in valid]).values_list('username', flat=True)
+        )
+        for number, data in valid:
+            if data['username'] in taken:
+                self.errors.append({'row': number, 'errors': {'username': ['Пользователь уже существует']}})
+        return [(number, data) for number, data in valid if data['username'] not in taken]
+
+    def _hash_passwords(self, passwords: list[str], pool: Executor | None) -> Iterable[str]:
+        # PBKDF2 занимает почти всё время импорта и отпускает GIL лишь частично — отсюда процессы.
+        if pool is None:
+            return map(make_password, passwords)
+        return pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (self.workers * 4)))
+
+    def _import_chunk(self, chunk: list[tuple[int, dict[str, Any]]], pool: Executor | None) -> None:
+        valid = self._validate(chunk)
+        if not valid:
+            return
+
+        passwords = [data.pop('password') for _, data in valid]
+        course_ids = [data.pop('course_ids', []) for _, data in valid]
+        hashes = self._hash_passwords(passwords, pool)
+        users = [User(password=hashed, **data) for (_, data), hashed in zip(valid, hashes, strict=True)]
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+        except IntegrityError:
+            # Кто-то успел занять логин между проверкой и вставкой — сохраняем по одному.
+            users = self._save_one_by_one(valid, users)
+
+        self.created += sum(1 for user in users if user.pk)
+        pairs = [
+            (user.pk, course_id) for user, ids in zip(users, course_ids, strict=True) if user.pk for course_id in ids
+        ]
+        if pairs:
+            self.enrolled += enroll(pairs)['enrolled']
+
+    def _save_one_by_one(self, valid: list[tuple[int, dict[str, Any]]], users: list[User]) -> list[User]:
+        for (number, _), user in zip(valid, users, strict=True):
+            try:
+                with transaction.atomic():
+                    user.save()
+            except IntegrityError as exc:
+                user.pk = None
+                self.errors.append({'row': number, 'errors': {'non_field_errors': [str(exc)]}})
+        return users
+
+
+def import_users(
+    rows: Iterable[dict[str, Any]],
+    batch_size: int | None = None,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    return UserImporter(batch_size=batch_size, workers=workers).run(rows)
@@ -1,20 +1,72 @@
+from collections.abc import Iterable
+
+from django.db import transaction
+
 from education_app.models.chat import ChatParticipant
 from education_app.models.course import Course
 from education_app.models.users import User
+from education_app.services.content_version import bump_content_versions
+from education_app.services.membership import invalidate_chat_members
+from education_app.services.profile_cache import invalidate_profiles
 
 
 def set_courses_and_chats(user: User, courses: list[Course]) -> None:
     user.courses.set(courses)
-    for course in courses:
-        if course.chat:
-            ChatParticipant.objects.get_or_create(chat=course.chat, user=user)
+    ChatParticipant.objects.bulk_create(
+        [ChatParticipant(chat_id=course.chat_id, user=user) for course in courses if course.chat_id],
+        ignore_conflicts=True,
+    )
+    invalidate_profiles([user.id])
+    invalidate_chat_members(course.chat_id for course in courses)
+
+
+def enroll(pairs: Iterable[tuple[int, int]], batch_size: int = 1000) -> dict[str, int]:
+    """
+    Записывает пользователей на курсы по парам `(user_id, course_id)` и добавляет их в чаты курсов.
+    Число запросов не зависит от количества пар; уже существующие записи и неизвестные id пропускаются.
+    """
+    pairs = set(pairs)
+    user_ids = {user_id for user_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+
+    known_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    course_chats = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'chat_id'))
+    valid = {pair for pair in pairs if pair[0] in known_users and pair[1] in course_chats}
+
+    enrollment = User.courses.through
+    with transaction.atomic():
+        existing = set(
+            enrollment.objects.filter(user_id__in=known_users, course_id__in=course_chats).values_list(
+                'user_id', 'course_id'
+            )
+        )
+        new = valid - existing
+        enrollment.objects.bulk_create(
+            [enrollment(user_id=user_id, course_id=course_id) for user_id, course_id in new],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        ChatParticipant.objects.bulk_create(
+            [
+                ChatParticipant(user_id=user_id, chat_id=course_chats[course_id])
+                for user_id, course_id in valid
+                if course_chats[course_id]
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        invalidate_profiles(user_id for user_id, _ in new)
+        bump_content_versions(course_id for _, course_id in new)
+        invalidate_chat_members(course_chats[course_id] for _, course_id in valid)
+
+    return {'enrolled': len(new), 'already_enrolled': len(valid) - len(new), 'skipped': len(pairs) - len(valid)}
 
 
 def create_user(validated_data: dict) -> User:
     courses = validated_data.pop('courses', [])
     password = validated_data.pop('password')
 
-    user = User.objects.create(**validated_data)
+    user = User(**validated_data)
     user.set_password(password)
     user.save()
 
@@ -38,5 +90,7 @@ def update_user(instance: User, validated_data: dict) -> User:
 
     if courses is not None:
         set_courses_and_chats(instance, courses)
+    else:
+        invalidate_profiles([instance.id])
 
     return instance
@@ -0,0 +1,197 @@
+from collections.abc import Iterable
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from education_app.models.chat import ChatParticipant
+from education_app.models.course import Answer, Course, Lesson, Module, Question, Tag
+from education_app.models.users import User
+from education_app.services.catalog_search import refresh_search_documents
+from education_app.services.content_version import bump_content_versions, forget_owners
+from education_app.services.membership import invalidate_chat_members
+from education_app.services.profile_cache import invalidate_profiles
+from education_app.services.thumbnails import needs_thumbnails
+from education_app.services.tokens import REVOKING_FIELDS, revoke_tokens
+from education_app.tasks import generate_avatar_thumbnails
+
+# Версии содержимого курсов сбрасываются по сигналам, чтобы их не обошли ни админка, ни API, ни сервисы.
+# bulk_create и _raw_delete сигналов не шлют — такие места сбрасывают версии сами.
+# Здесь же пересобирается поисковый текст курса (названия курса, модулей и уроков)
+# и ставится в очередь нарезка миниатюр новой аватарки.
+# Кеш составов чатов сбрасывается по сигналам участников — в том числе при правке из админки.
+# Токены пользователя отзываются по сигналам при смене полей из их claims — из админки, API или shell.
+# Закешированный `/me` (поля пользователя и названия его курсов) сбрасывается здесь же.
+
+
+def _courses_with_questions(question_ids: Iterable[int]) -> Iterable[int]:
+    return Course.objects.filter(modules__lessons__questions__in=question_ids).values_list('id', flat=True).distinct()
+
+
+def _courses_of_lessons(lesson_ids: Iterable[int]) -> Iterable[int]:
+    return Lesson.objects.filter(id__in=lesson_ids).values_list('module__course_id', flat=True)
+
+
+@receiver(pre_save, sender=Module)
+@receiver(pre_save, sender=Lesson)
+def remember_previous_owner(sender: type[Model], instance: Module | Lesson, **kwargs: Any) -> None:
+    # Модуль или урок могут перенести в другой курс — прежний курс тоже изменился.
+    if instance._state.adding:
+        return
+    field = 'course_id' if sender is Module else 'module__course_id'
+    instance._previous_course_id = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Course)
+def remember_previous_title(sender: type[Model], instance: Course, **kwargs: Any) -> None:
+    if not instance._state.adding:
+        instance._previous_title = sender.objects.filter(pk=instance.pk).values_list('title', flat=True).first()
+
+
+@receiver(pre_delete, sender=Course)
+def remember_course_users(sender: type[Model], instance: Course, **kwargs: Any) -> None:
+    # Связи со слушателями удаляются каскадом без m2m_changed — запоминаем их до удаления.
+    instance._user_ids = list(instance.users.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender: type[Model], instance: Course, **kwargs: Any) -> None:
+    bump_content_versions([instance.id])
+    if kwargs['signal'] is post_save:
+        refresh_search_documents([instance.id])
+        if getattr(instance, '_previous_title', instance.title) != instance.title:
+            invalidate_profiles(instance.users.values_list('id', flat=True))
+    else:
+        invalidate_profiles(getattr(instance, '_user_ids', []))
+
+
+@receiver([post_save, post_delete], sender=Module)
+def module_changed(sender: type[Model], instance: Module, **kwargs: Any) -> None:
+    previous = getattr(instance, '_previous_course_id', None)
+    bump_content_versions([instance.course_id, previous])
+    refresh_search_documents([instance.course_id, previous])
+    forget_owners(Module, [instance.pk])
+    if previous and previous != instance.course_id:
+        forget_owners(Lesson, instance.lessons.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender: type[Model], instance: Lesson, **kwargs: Any) -> None:
+    course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+    bump_content_versions([course_id, getattr(instance, '_previous_course_id', None)])
+    refresh_search_documents([course_id, getattr(instance, '_previous_course_id', None)])
+    forget_owners(Lesson, [instance.pk])
+
+
+@receiver(pre_save, sender=ChatParticipant)
+def remember_previous_chat(sender: type[Model], instance: ChatParticipant, **kwargs: Any) -> None:
+    # Участника могут перенести в другой чат — прежний состав тоже изменился.
+    update_fields = kwargs.get('update_fields')
+    if instance._state.adding or (update_fields is not None and 'chat' not in update_fields):
+        return
+    instance._previous_chat_id = sender.objects.filter(pk=instance.pk).values_list('chat_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=ChatParticipant)
+def participant_changed(sender: type[Model], instance: ChatParticipant, **kwargs: Any) -> None:
+    # Отметка о прочтении сохраняет только курсор — состав не меняется.
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'chat', 'user'} & set(update_fields):
+        return
+    invalidate_chat_members([instance.chat_id, getattr(instance, '_previous_chat_id', None)])
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_user(sender: type[Model], instance: User, **kwargs: Any) -> None:
+    update_fields = kwargs.get('update_fields')
+    fields = [field for field in REVOKING_FIELDS if update_fields is None or field in update_fields]
+    if instance._state.adding or not fields:
+        instance._changed_fields = set()
+        return
+    stored = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._changed_fields = {field for field, value in stored.items() if value != getattr(instance, field)}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender: type[Model], instance: User, **kwargs: Any) -> None:
+    changed = instance.__dict__.pop('_changed_fields', set())
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        invalidate_profiles([instance.id])
+    if 'username' in changed:
+        # Логин виден в списке слушателей курса.
+        bump_content_versions(instance.courses.values_list('id', flat=True))
+    if changed & set(REVOKING_FIELDS):
+        revoke_tokens([instance.id])
+        # Иначе следующий save() этого же экземпляра вернул бы в базу прежнюю версию токенов.
+        instance.refresh_from_db(fields=['token_version'])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender: type[Model], instance: User, **kwargs: Any) -> None:
+    revoke_tokens([instance.id])
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Lesson)
+def avatar_saved(sender: type[Model], instance: Course | Module | Lesson, **kwargs: Any) -> None:
+    # До готовности миниатюр отдаётся исходный файл; недоступный брокер не должен ронять сохранение.
+    if needs_thumbnails(instance.avatar.name, instance.avatar_thumbnails):
+        label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(lambda: generate_avatar_thumbnails.delay(label, pk), robust=True)
+
+
+@receiver(post_save, sender=Question)
+@receiver(pre_delete, sender=Question)
+def question_changed(sender: type[Model], instance: Question, **kwargs: Any) -> None:
+    bump_content_versions(_courses_with_questions([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender: type[Model], instance: Answer, **kwargs: Any) -> None:
+    bump_content_versions(_courses_with_questions([instance.question_id]))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender: type[Model], instance: Tag, **kwargs: Any) -> None:
+    bump_content_versions(instance.courses.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+@receiver(m2m_changed, sender=Lesson.questions.through)
+@receiver(m2m_changed, sender=User.courses.through)
+def relation_changed(
+    sender: type[Model],
+    instance: Model,
+    action: str,
+    model: type[Model],
+    pk_set: set[int] | None,
+    **kwargs: Any,
+) -> None:
+    # clear() приходит без pk_set, поэтому ловим его до удаления связей.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if sender is User.courses.through:
+        # Названия курсов входят в закешированный `/me` слушателей.
+        if isinstance(instance, User):
+            invalidate_profiles([instance.id])
+        else:
+            invalidate_profiles(pk_set if pk_set is not None else instance.users.values_list('id', flat=True))
+
+    if isinstance(instance, Course):
+        bump_content_versions([instance.id])
+    elif isinstance(instance, Lesson):
+        bump_content_versions(_courses_of_lessons([instance.pk]))
+    elif pk_set is None and isinstance(instance, Question):
+        bump_content_versions(_courses_with_questions([instance.pk]))
+    elif pk_set is None:
+        bump_content_versions(instance.courses.values_list('id', flat=True))
+    elif model is Lesson:
+        bump_content_versions(_courses_of_lessons(pk_set))
+    else:
+        bump_content_versions(pk_set)
@@ -2,47 +2,75 @@ import logging
 from datetime import timedelta
 
 from celery import shared_task
+from django.apps import apps
 from django.utils import timezone
 
-from education_app.models.chat import ChatParticipant, Message
 from education_app.models.course import Course
+from education_app.services.cleanup import clean_expired_courses
+from education_app.services.message_buffer import drain_message_buffer
+from education_app.services.thumbnails import generate_thumbnails
+from education_app.services.uploads import purge_stale_uploads
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
-def clean_all_expired_courses() -> None:
-    now = timezone.now()
-
-    courses = Course.objects.all()
-
-    for course in courses:
-        threshold = now - timedelta(days=course.duration_days)
-
-        if course.end_datetime and course.end_datetime < threshold:
-            clean_expired_enrollments.delay(course.id)
+def clean_all_expired_courses(
+    batch_size: int | None = None,
+    dry_run: bool = False,
+    archive: bool | None = None,
+) -> dict:
+    report = clean_expired_courses(batch_size=batch_size, dry_run=dry_run, archive=archive)
+    verb = 'будет удалено' if dry_run else 'удалено'
+    logger.info(f'Очистка завершённых курсов: курсов {report["courses"]["rows"]}, {verb} строк {report.total_rows}.')
+    for phase, stats in report.items():
+        logger.info(f'  {phase}: {stats}')
+    return report
 
 
 @shared_task
-def clean_expired_enrollments(course_id: int) -> None:
+def clean_expired_enrollments(
+    course_id: int,
+    batch_size: int | None = None,
+    dry_run: bool = False,
+    archive: bool | None = None,
+) -> dict | None:
     try:
         course = Course.objects.get(id=course_id)
     except Course.DoesNotExist:
         logger.exception(f'Курс с ID {course_id} не найден.')
-        return
+        return None
 
     if course.end_datetime < timezone.now() - timedelta(days=course.duration_days):
-        chat = getattr(course, 'chat', None)
-        if chat:
-            ChatParticipant.objects.filter(chat=chat).delete()
-            Message.objects.filter(chat=chat).delete()
+        report = clean_expired_courses(course_ids=[course.id], batch_size=batch_size, dry_run=dry_run, archive=archive)
+        if dry_run:
+            logger.info(f'Курс {course.title}: будет удалено {dict(report)}.')
+        else:
+            logger.info(f'Курс {course.title} очищен от слушателей, участников и сообщений: {dict(report)}.')
+        return report
+
+    logger.info(f'Курс {course.title} ещё не завершён.')
+    return None
+
+
+@shared_task
+def flush_message_buffer(max_batches: int = 100) -> int:
+    """Дописывает в базу накопленные в буфере сообщения. Страховка к `ingest_messages`, например по расписанию."""
+    processed = drain_message_buffer(max_batches)
+    logger.info(f'Буфер сообщений: обработано записей {processed}.')
+    return processed
+
+
+@shared_task
+def purge_abandoned_uploads() -> int:
+    purged = purge_stale_uploads()
+    logger.info(f'Удалено брошенных загрузок вложений: {purged}.')
+    return purged
 
-        if hasattr(course, 'students'):
-            course.students.clear()
 
-        logger.info(f'Курс {course.title} очищен от участников и сообщений.')
-    else:
-        logger.info(f'Курс {course.title} ещё не завершён.')
+@shared_task
+def generate_avatar_thumbnails(model_label: str, pk: int) -> bool:
+    return generate_thumbnails(apps.get_model(model_label), pk)
 
 
 def schedule_cleanup(course_id: int) -> None:
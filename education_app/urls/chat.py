@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from education_app.views.chat import ChatViewSet, MessageCreateView
+from education_app.views.chat import ChatViewSet, MessageListCreateView, MessageUploadViewSet
 
 router = DefaultRouter()
 router.register('', ChatViewSet, basename='chat')
@@ -9,8 +9,23 @@ router.register('', ChatViewSet, basename='chat')
 urlpatterns = [
     path(
         '<int:chat_id>/messages/',
-        MessageCreateView.as_view(),
-        name='message-create',
+        MessageListCreateView.as_view(),
+        name='chat-messages',
+    ),
+    path(
+        '<int:chat_id>/uploads/',
+        MessageUploadViewSet.as_view({'post': 'create'}),
+        name='chat-uploads',
+    ),
+    path(
+        '<int:chat_id>/uploads/<uuid:upload_id>/',
+        MessageUploadViewSet.as_view({'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'}),
+        name='chat-upload-detail',
+    ),
+    path(
+        '<int:chat_id>/uploads/<uuid:upload_id>/complete/',
+        MessageUploadViewSet.as_view({'post': 'complete'}),
+        name='chat-upload-complete',
     ),
 ]
 
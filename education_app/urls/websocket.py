@@ -0,0 +1,7 @@
+from django.urls import path
+
+from education_app.consumers.chat import ChatConsumer
+
+websocket_urlpatterns = [
+    path('ws/chat/<int:chat_id>/', ChatConsumer.as_asgi()),
+]
@@ -1,8 +1,13 @@
+import base64
 from typing import Any
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet
-from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.db import transaction
+from django.db.models import F, Prefetch, QuerySet
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiExample, OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import generics, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ValidationError
@@ -12,36 +17,93 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import BaseSerializer
 
-from education_app.models.chat import Chat, ChatParticipant
+from base.full_text import parse_terms
+from base.pagination import DefaultPageNumberPagination, KeysetPagination
+from education_app.authentication import get_user_instance
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageUpload
 from education_app.serializers.chat import (
+    ChatDetailSerializer,
+    ChatMessageSerializer,
     ChatParticipantSerializer,
-    ChatSerializer,
     CreateChatSerializer,
-    MessageSerializer,
+    InboxChatSerializer,
+    MarkReadSerializer,
+    MessageSearchQuerySerializer,
+    MessageSearchSerializer,
+    MessageUploadSerializer,
+    UpdateParticipantsSerializer,
 )
 from education_app.services.chat import ChatService
+from education_app.services.export import export_response
+from education_app.services.membership import invalidate_chat_members, is_chat_member
+from education_app.services.message_buffer import buffer_message, pending_messages, skip_reserved_ids
+from education_app.services.message_search import search_messages
+from education_app.services.uploads import (
+    UploadOffsetConflict,
+    attach_uploads,
+    complete_upload,
+    create_upload,
+    delete_upload,
+    write_chunk,
+)
 
 User = get_user_model()
 
+EXPORT_OUTPUT_PARAMETER = OpenApiParameter(
+    name='output', type=str, enum=['ndjson', 'csv'], location=OpenApiParameter.QUERY, description='Формат выгрузки'
+)
+EXPORT_CHAT_PARAMETER = OpenApiParameter(
+    name='chat_id', type=int, location=OpenApiParameter.QUERY, description='Только этот чат'
+)
+
 
 class ChatViewSet(viewsets.ModelViewSet):
-    queryset = Chat.objects.all().prefetch_related('participants', 'messages')
+    queryset = Chat.objects.all().prefetch_related(
+        Prefetch('participants', queryset=ChatParticipant.objects.select_related('user'))
+    )
 
     def get_permissions(self) -> list[BasePermission]:
-        if self.action in ['create', 'add_participant', 'remove_participant']:
+        # Изменение чата (в том числе состава через `user_ids`) — только для администраторов, как и `participants`.
+        if self.action in [
+            'create',
+            'update',
+            'partial_update',
+            'participants',
+            'add_participant',
+            'remove_participant',
+            'export_participants',
+            'export_messages',
+        ]:
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
     def get_serializer_class(self) -> type[BaseSerializer]:
-        if self.action == 'create':
+        if self.action in ['create', 'update', 'partial_update']:
             return CreateChatSerializer
-        return ChatSerializer
+        if self.action == 'inbox':
+            return InboxChatSerializer
+        if self.action == 'read':
+            return MarkReadSerializer
+        if self.action == 'participants':
+            return UpdateParticipantsSerializer
+        return ChatDetailSerializer
 
     def get_queryset(self) -> QuerySet:
         user = self.request.user
         if user.is_staff:
-            return Chat.objects.all().prefetch_related('participants', 'messages')
-        return Chat.objects.filter(participants__user=user).prefetch_related('participants', 'messages')
+            return self.queryset.all()
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if pk is not None:
+            # Для одного чата доступ проверяется по кешу состава, без join'а с участниками.
+            if not str(pk).isdigit() or not is_chat_member(int(pk), user.id):
+                return self.queryset.none()
+            return self.queryset.all()
+        return self.queryset.filter(participants__user_id=user.id)
+
+    def perform_destroy(self, instance: Chat) -> None:
+        chat_id = instance.id
+        instance.delete()
+        invalidate_chat_members([chat_id])
 
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         serializer = self.get_serializer(data=request.data)
@@ -52,21 +114,109 @@ class ChatViewSet(viewsets.ModelViewSet):
         is_group = serializer.validated_data.get('is_group', False)
 
         chat = ChatService.create_chat(name=name, is_group=is_group, user_ids=user_ids)
-        return Response(ChatSerializer(chat).data, status=201)
+        return Response(ChatDetailSerializer(chat).data, status=201)
 
     def update(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         instance = self.get_object()
-        serializer = self.get_serializer(data=request.data)
+        serializer = self.get_serializer(data=request.data, partial=kwargs.pop('partial', False))
         serializer.is_valid(raise_exception=True)
 
-        user_ids = serializer.validated_data.pop('user_ids', [])
+        user_ids = serializer.validated_data.pop('user_ids', None)
         name = serializer.validated_data.get('name', instance.name)
         is_group = serializer.validated_data.get('is_group', instance.is_group)
 
         chat = ChatService.update_chat(instance, name, is_group, user_ids)
-        return Response(ChatSerializer(chat).data)
+        return Response(ChatDetailSerializer(chat).data)
+
+    @action(detail=False, methods=['get'])
+    def inbox(self, request: Request) -> Response:
+        participations = (
+            ChatParticipant.objects.filter(user_id=request.user.id)
+            .select_related('chat__last_message__sender')
+            .annotate(unread_count=F('chat__message_count') - F('read_count'))
+            .order_by(F('chat__last_message_id').desc(nulls_last=True), '-chat_id')
+        )
+        serializer = self.get_serializer(participations, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[MessageSearchQuerySerializer], responses={200: MessageSearchSerializer(many=True)})
+    @action(detail=False, methods=['get'], pagination_class=DefaultPageNumberPagination)
+    def search(self, request: Request) -> Response:
+        """Полнотекстовый поиск по сообщениям в чатах пользователя, по убыванию релевантности."""
+        params = MessageSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        terms = parse_terms(params.validated_data['q'])
+        if not terms:
+            raise ValidationError({'q': 'В запросе нет слов для поиска'})
+
+        chat_ids = ChatParticipant.objects.filter(user_id=request.user.id).values('chat_id')
+        if 'chat_id' in params.validated_data:
+            chat_ids = chat_ids.filter(chat_id=params.validated_data['chat_id'])
+
+        hits = self.paginate_queryset(search_messages(terms, chat_ids))
+        messages = Message.objects.select_related('sender').in_bulk([hit.pk for hit in hits])
+        results = []
+        for hit in hits:
+            # Сообщение могли удалить между запросом к индексу и выборкой.
+            if message := messages.get(hit.pk):
+                message.rank, message.highlight = hit.rank, hit.highlight
+                results.append(message)
+        serializer = MessageSearchSerializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request: Request, pk: int) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        participant = get_object_or_404(
+            ChatParticipant.objects.select_related('chat'), chat_id=pk, user_id=request.user.id
+        )
+        participant = ChatService.mark_read(participant, serializer.validated_data.get('message_id'))
+
+        return Response(
+            {
+                'last_read_message_id': participant.last_read_message_id,
+                'unread_count': participant.chat.message_count - participant.read_count,
+            }
+        )
 
     @extend_schema(
+        responses={
+            200: OpenApiResponse(
+                description='Сколько участников добавлено и удалено',
+                examples=[OpenApiExample('Результат', value={'added': 2, 'removed': 1}, response_only=True)],
+            )
+        },
+        examples=[OpenApiExample('Пример запроса', value={'add': [4, 5], 'remove': [2]}, request_only=True)],
+    )
+    @action(detail=True, methods=['patch'])
+    def participants(self, request: Request, pk: int) -> Response:
+        """Добавляет и удаляет участников пачкой в одной транзакции."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        chat = get_object_or_404(Chat, pk=pk)
+
+        with transaction.atomic():
+            removed = ChatService.remove_participants(chat.id, serializer.validated_data['remove'])
+            added = ChatService.add_participants(chat.id, serializer.validated_data['add'])
+
+        return Response({'added': added, 'removed': removed})
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER, EXPORT_CHAT_PARAMETER], responses={200: None})
+    @action(detail=False, methods=['get'], url_path='export/participants')
+    def export_participants(self, request: Request) -> StreamingHttpResponse:
+        """Участники чатов потоком в NDJSON или CSV."""
+        return export_response(request, 'participants', 'chat_id')
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER, EXPORT_CHAT_PARAMETER], responses={200: None})
+    @action(detail=False, methods=['get'], url_path='export/messages')
+    def export_messages(self, request: Request) -> StreamingHttpResponse:
+        """История сообщений потоком в NDJSON или CSV, по чатам и id."""
+        return export_response(request, 'messages', 'chat_id')
+
+    @extend_schema(
+        deprecated=True,
         parameters=[
             OpenApiParameter(
                 name='user_id',
@@ -75,7 +225,7 @@ class ChatViewSet(viewsets.ModelViewSet):
                 location=OpenApiParameter.QUERY,
                 description='ID пользователя для добавления в чат',
             )
-        ]
+        ],
     )
     @action(detail=True, methods=['post'], url_path='add-participant')
     def add_participant(self, request: Request, pk: int) -> Response:
@@ -92,11 +242,13 @@ class ChatViewSet(viewsets.ModelViewSet):
             raise ValidationError({'user_id': 'Пользователь уже участвует в чате'})
 
         participant = ChatParticipant.objects.create(chat=chat, user_id=user_id)
+        invalidate_chat_members([chat.id])
         participant = ChatParticipant.objects.select_related('user').get(id=participant.id)
         serializer = ChatParticipantSerializer(participant)
         return Response(serializer.data, status=201)
 
     @extend_schema(
+        deprecated=True,
         parameters=[
             OpenApiParameter(
                 name='user_id',
@@ -105,7 +257,7 @@ class ChatViewSet(viewsets.ModelViewSet):
                 location=OpenApiParameter.QUERY,
                 description='ID пользователя для удаления',
             )
-        ]
+        ],
     )
     @action(detail=True, methods=['post'], url_path='remove-participant')
     def remove_participant(self, request: Request, pk: int) -> Response:
@@ -119,14 +271,168 @@ class ChatViewSet(viewsets.ModelViewSet):
             raise NotFound('Участник не найден')
 
         participant.delete()
+        invalidate_chat_members([participant.chat_id])
         return Response({'status': 'Участник удалён'})
 
 
-class MessageCreateView(generics.CreateAPIView):
-    serializer_class = MessageSerializer
+class ChatMemberMixin:
+    """Доступ к вложенным в чат ресурсам только для участников; чужой чат неотличим от несуществующего."""
+
+    def initial(self, request: Request, *args: Any, **kwargs: Any) -> None:
+        super().initial(request, *args, **kwargs)
+        chat_id = self.kwargs['chat_id']
+        user = request.user
+        allowed = Chat.objects.filter(id=chat_id).exists() if user.is_staff else is_chat_member(chat_id, user.id)
+        if not allowed:
+            raise NotFound('Чат не найден')
+
+
+class MessageListCreateView(ChatMemberMixin, generics.ListCreateAPIView):
+    serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self) -> QuerySet:
+        return (
+            Message.objects.filter(chat_id=self.kwargs['chat_id'])
+            .select_related('sender')
+            .prefetch_related('attachments')
+        )
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if not settings.MESSAGE_WRITE_BEHIND:
+            return super().list(request, *args, **kwargs)
+
+        # Буфер читается до базы: сообщение, записанное между двумя чтениями, попадёт хотя бы в одно из них.
+        pending = pending_messages(self.kwargs['chat_id'])
+        page = self.paginate_queryset(self.get_queryset())
+        data = self.paginator.merge(self.get_serializer(page, many=True).data, pending)
+        return self.get_paginated_response(data)
+
+    def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if not settings.MESSAGE_WRITE_BEHIND:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        chat_id = self.kwargs['chat_id']
+        # Вложения создаются вместе с сообщением, поэтому такие сообщения в буфер не попадают.
+        payload = None
+        if not serializer.validated_data.get('uploads'):
+            payload = buffer_message(chat_id, request.user, serializer.validated_data.get('text', ''))
+        if payload is None:
+            self.perform_create(serializer)
+            skip_reserved_ids()
+            return Response(serializer.data, status=201)
+
+        ChatService.broadcast_message(chat_id, payload)
+        return Response(payload, status=201)
 
     def perform_create(self, serializer: BaseSerializer) -> None:
-        chat_id = self.kwargs.get('chat_id')
-        chat = get_object_or_404(Chat, id=chat_id)
-        serializer.save(sender=self.request.user, chat=chat)
+        chat_id = self.kwargs['chat_id']
+        upload_ids = serializer.validated_data.pop('uploads', [])
+        with transaction.atomic():
+            message = serializer.save(sender=get_user_instance(self.request.user), chat_id=chat_id)
+            if upload_ids:
+                attach_uploads(message, upload_ids)
+            ChatService.register_message(message)
+
+        payload = serializer.data
+        transaction.on_commit(lambda: ChatService.broadcast_message(chat_id, payload))
+
+
+UPLOAD_OFFSET_HEADER = OpenApiParameter(
+    name='Upload-Offset',
+    type=int,
+    location=OpenApiParameter.HEADER,
+    required=True,
+    description='Смещение части — текущий `offset` загрузки',
+)
+UPLOAD_CHECKSUM_HEADER = OpenApiParameter(
+    name='Upload-Checksum',
+    type=str,
+    location=OpenApiParameter.HEADER,
+    description='`sha256 <base64>` — контрольная сумма части',
+)
+
+
+class MessageUploadViewSet(ChatMemberMixin, viewsets.GenericViewSet):
+    """
+    Загрузка вложений по частям с докачкой. Создать загрузку (`filename`, `size`), затем слать части
+    PATCH-ем с телом `application/offset+octet-stream` и заголовком `Upload-Offset`. После обрыва
+    текущее смещение отдаёт GET (и 409 на часть с неверным смещением). Затем `complete/`,
+    и id загрузки передаётся в `uploads` при отправке сообщения. Если при создании передан `sha256`
+    и такой файл уже есть в этом чате или среди файлов отправителя, загрузка создаётся завершённой
+    и части слать не нужно.
+    """
+
+    serializer_class = MessageUploadSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_url_kwarg = 'upload_id'
+
+    def get_queryset(self) -> QuerySet:
+        return MessageUpload.objects.filter(chat_id=self.kwargs['chat_id'], user_id=self.request.user.id)
+
+    def create(self, request: Request, chat_id: int) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = create_upload(request.user.id, chat_id, **serializer.validated_data)
+        return self._with_offset(Response(self.get_serializer(upload).data, status=201), upload)
+
+    def retrieve(self, request: Request, chat_id: int, upload_id: str) -> Response:
+        upload = self.get_object()
+        return self._with_offset(Response(self.get_serializer(upload).data), upload)
+
+    @extend_schema(
+        request={'application/offset+octet-stream': OpenApiTypes.BINARY},
+        parameters=[UPLOAD_OFFSET_HEADER, UPLOAD_CHECKSUM_HEADER],
+    )
+    def partial_update(self, request: Request, chat_id: int, upload_id: str) -> Response:
+        upload = self.get_object()
+        offset = self._int_header(request, 'Upload-Offset')
+        length = self._int_header(request, 'Content-Length')
+        if length > settings.CHAT_UPLOAD_CHUNK_SIZE:
+            raise ValidationError({'detail': f'Часть больше {settings.CHAT_UPLOAD_CHUNK_SIZE} байт'})
+
+        try:
+            write_chunk(upload, offset, request.stream, length, self._checksum(request))
+        except UploadOffsetConflict as exc:
+            response = Response(exc.detail, status=exc.status_code)
+            response['Upload-Offset'] = exc.offset
+            return response
+        return self._with_offset(Response(self.get_serializer(upload).data), upload)
+
+    def destroy(self, request: Request, chat_id: int, upload_id: str) -> Response:
+        delete_upload(self.get_object())
+        return Response(status=204)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request: Request, chat_id: int, upload_id: str) -> Response:
+        upload = complete_upload(self.get_object())
+        return Response(self.get_serializer(upload).data)
+
+    @staticmethod
+    def _with_offset(response: Response, upload: MessageUpload) -> Response:
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.size
+        return response
+
+    @staticmethod
+    def _int_header(request: Request, name: str) -> int:
+        value = request.headers.get(name, '')
+        if not value.isdigit():
+            raise ValidationError({'detail': f'Заголовок {name} обязателен и должен быть целым числом'})
+        return int(value)
+
+    @staticmethod
+    def _checksum(request: Request) -> bytes | None:
+        value = request.headers.get('Upload-Checksum')
+        if value is None:
+            return None
+        algorithm, _, digest = value.partition(' ')
+        try:
+            if algorithm.lower() != 'sha256':
+                raise ValueError(algorithm)
+            return base64.b64decode(digest, validate=True)
+        except ValueError:
+            raise ValidationError({'detail': 'Upload-Checksum: ожидается `sha256 <base64>`'})
@@ -1,15 +1,25 @@
 from django.contrib.auth.decorators import user_passes_test
-from django.http import HttpRequest, JsonResponse
+from django.db.models import QuerySet
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
 from django.http import JsonResponse as JsonResponseType
 from django.shortcuts import get_object_or_404
-from drf_spectacular.utils import OpenApiExample, OpenApiResponse, extend_schema
+from drf_spectacular.utils import OpenApiExample, OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from base.http_cache import ConditionalRetrieveMixin
+from base.pagination import DefaultPageNumberPagination
+from base.prefetch import PrefetchPlanMixin
+from base.values_serializer import ValuesListMixin
+from education_app.filters.course import CourseCatalogFilter
 from education_app.models.course import Course, Module, Lesson, Question, Answer, Tag
 from education_app.serializers.course import (
+    AnswerSerializer,
+    BulkEnrollSerializer,
+    CourseCatalogSerializer,
     CourseSerializer,
     ModuleSerializer,
     ModuleShortSerializer,
@@ -17,15 +27,141 @@ from education_app.serializers.course import (
     LessonShortSerializer,
     QuestionSerializer,
     QuestionShortSerializer,
+    TagFacetSerializer,
     TagSerializer
 )
+from education_app.services.cleanup import clean_expired_courses
+from education_app.services.content_version import get_content_version, get_owner_course_id
+from education_app.services.catalog_search import tag_facets
 from education_app.services.course import CourseService
+from education_app.services.export import export_response
+from education_app.services.users import enroll
 from education_app.tasks import clean_expired_enrollments
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseContentETagMixin(ConditionalRetrieveMixin):
+    """ETag содержимого: тип и id объекта плюс версия курса, которому он принадлежит."""
+
+    cache_rendered = True
+
+    def get_etag(self) -> str | None:
+        model = self.queryset.model
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if not str(pk).isdigit():
+            return None
+
+        course_id = get_owner_course_id(model, int(pk))
+        version = course_id and get_content_version(course_id)
+        if not version:
+            return None
+        return f'"{model._meta.model_name}-{pk}-{version}"'
+
+
+class CourseViewSet(CourseContentETagMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    # Фильтры каталога задаются только его действиям: list, retrieve, update и destroy они не сужают.
+    filterset_class = None
+    prefetch_plan_actions = (*PrefetchPlanMixin.prefetch_plan_actions, 'catalog', 'catalog_search')
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action in ('catalog', 'catalog_search'):
+            queryset = CourseService.annotate_catalog_counts(queryset)
+        return queryset
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='fields',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description='Список полей через запятую, например `id,title,tags`',
+            )
+        ]
+    )
+    @action(
+        detail=False,
+        methods=['get'],
+        serializer_class=CourseCatalogSerializer,
+        pagination_class=DefaultPageNumberPagination,
+        filterset_class=CourseCatalogFilter,
+    )
+    def catalog(self, request: Request) -> Response:
+        """Каталог курсов: краткие карточки со счётчиками, с фильтрами и постраничной выдачей."""
+        return self.list(request)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='catalog/search',
+        serializer_class=CourseCatalogSerializer,
+        pagination_class=DefaultPageNumberPagination,
+        filterset_class=CourseCatalogFilter,
+    )
+    def catalog_search(self, request: Request) -> Response:
+        """
+        Поиск по каталогу (`q`, `tags` + `tags_mode` и остальные фильтры каталога) с фасетами по тегам.
+        При `tags_mode=any` фасеты считаются без учёта выбранных тегов — видно, сколько курсов даст каждый тег.
+        """
+        response = self.list(request)
+
+        params = request.query_params.copy()
+        if params.get('tags_mode', 'any') == 'any':
+            params.pop('tags', None)
+        facet_courses = self.filterset_class(params, queryset=Course.objects.all(), request=request).qs
+        response.data['facets'] = TagFacetSerializer(tag_facets(facet_courses), many=True).data
+        return response
+
+    @extend_schema(
+        request=BulkEnrollSerializer,
+        responses={
+            200: OpenApiResponse(
+                description='Итог записи',
+                examples=[
+                    OpenApiExample(
+                        'Результат',
+                        value={'enrolled': 40, 'already_enrolled': 2, 'skipped': 0},
+                        response_only=True,
+                    )
+                ],
+            )
+        },
+    )
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], serializer_class=BulkEnrollSerializer)
+    def enroll(self, request: Request) -> Response:
+        """Записывает всех user_ids на все course_ids и добавляет их в чаты курсов."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user_ids = serializer.validated_data['user_ids']
+        course_ids = serializer.validated_data['course_ids']
+        result = enroll((user_id, course_id) for user_id in user_ids for course_id in course_ids)
+
+        return Response(result)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='output',
+                type=str,
+                enum=['ndjson', 'csv'],
+                location=OpenApiParameter.QUERY,
+                description='Формат выгрузки',
+            ),
+            OpenApiParameter(
+                name='course_id',
+                type=int,
+                location=OpenApiParameter.QUERY,
+                description='Только этот курс',
+            ),
+        ],
+        responses={200: None},
+    )
+    @action(detail=False, methods=['get'], url_path='export/enrollments', permission_classes=[IsAdminUser])
+    def export_enrollments(self, request: Request) -> StreamingHttpResponse:
+        """Записи на курсы потоком в NDJSON или CSV."""
+        return export_response(request, 'enrollments', 'course_id')
 
     @extend_schema(
         request={
@@ -77,7 +213,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         return Response({'status': 'users updated successfully'})
 
 
-class ModuleViewSet(viewsets.ModelViewSet):
+class ModuleViewSet(CourseContentETagMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Module.objects.all()
 
     def get_serializer_class(self):
@@ -86,7 +222,7 @@ class ModuleViewSet(viewsets.ModelViewSet):
         return ModuleSerializer
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(CourseContentETagMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
 
     def get_serializer_class(self):
@@ -95,7 +231,7 @@ class LessonViewSet(viewsets.ModelViewSet):
         return LessonSerializer
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Question.objects.all()
 
     def get_serializer_class(self):
@@ -104,6 +240,11 @@ class QuestionViewSet(viewsets.ModelViewSet):
         return QuestionSerializer
 
 
+class AnswerViewSet(viewsets.ModelViewSet):
+    queryset = Answer.objects.all()
+    serializer_class = AnswerSerializer
+
+
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -112,5 +253,9 @@ class TagViewSet(viewsets.ModelViewSet):
 @user_passes_test(lambda u: u.is_staff)
 def run_cleanup_view(request: HttpRequest, course_id: int) -> JsonResponseType:
     course = get_object_or_404(Course, id=course_id)
+    if request.GET.get('dry_run'):
+        report = clean_expired_courses(course_ids=[course.id], dry_run=True)
+        return JsonResponse({'status': 'Пробный запуск', 'course': course.title, 'report': report})
+
     clean_expired_enrollments.apply_async(args=[course.id])
     return JsonResponse({'status': 'Задача запущена', 'course': course.title})
@@ -1,17 +1,25 @@
-from drf_spectacular.utils import OpenApiExample, extend_schema
+import io
+
+from drf_spectacular.utils import OpenApiExample, OpenApiResponse, extend_schema
 from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from education_app.authentication import get_user_instance
 from education_app.models.users import User
 from education_app.serializers.users import (
     CustomTokenObtainPairSerializer,
+    CustomTokenRefreshSerializer,
+    UserImportFileSerializer,
     UserSerializer,
 )
+from education_app.services.profile_cache import get_me_payload
+from education_app.services.user_import import import_users, read_rows
 
 
 @extend_schema(
@@ -46,22 +54,63 @@ class UserViewSet(viewsets.ModelViewSet):
 
     def update(self, request: Request, *args: object, **kwargs: object) -> Response:
         instance = self.get_object()
-        if not request.user.is_staff and instance != request.user:
+        if not request.user.is_staff and instance.id != request.user.id:
             raise PermissionDenied('Вы можете обновлять только свой профиль.')
         return super().update(request, *args, **kwargs)
 
     def partial_update(self, request: Request, *args: object, **kwargs: object) -> Response:
         instance = self.get_object()
-        if not request.user.is_staff and instance != request.user:
+        if not request.user.is_staff and instance.id != request.user.id:
             raise PermissionDenied('Вы можете обновлять только свой профиль.')
         return super().partial_update(request, *args, **kwargs)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request: Request) -> Response:
         user = request.user
-        serializer = self.get_serializer(user)
-        return Response(serializer.data)
+        return Response(get_me_payload(user, lambda: self.get_serializer(get_user_instance(user)).data))
+
+    @extend_schema(
+        request={'multipart/form-data': UserImportFileSerializer},
+        responses={
+            200: OpenApiResponse(
+                description='Итог импорта с ошибками по номерам строк',
+                examples=[
+                    OpenApiExample(
+                        'Результат',
+                        value={
+                            'created': 998,
+                            'enrolled': 1500,
+                            'errors': [{'row': 17, 'errors': {'email': ['Введите корректный email.']}}],
+                        },
+                        response_only=True,
+                    )
+                ],
+            )
+        },
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        url_name='import',
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+        serializer_class=UserImportFileSerializer,
+    )
+    def import_users(self, request: Request) -> Response:
+        """Массовое создание пользователей из CSV или JSONL; ошибочные строки пропускаются."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format') or ('jsonl' if upload.name.endswith('.jsonl') else 'csv')
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        return Response(import_users(read_rows(stream, fmt)))
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
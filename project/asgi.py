@@ -1,7 +1,18 @@
 import os
 
+from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+from base.websocket import JWTAuthMiddleware  # noqa: E402
+from education_app.urls.websocket import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter(
+    {
+        'http': django_asgi_app,
+        'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+    }
+)
@@ -10,6 +10,7 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
     'drf_spectacular',
     'rest_framework',
     'django_filters',
+    'channels',
     'corsheaders',
     'silk',
     'base',
@@ -59,6 +61,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'project.wsgi.application'
+ASGI_APPLICATION = 'project.asgi.application'
 
 DATABASES = {
     'default': {
@@ -99,16 +102,44 @@ AUTH_USER_MODEL = 'education_app.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Вложения и аватарки лежат в хранилище по содержимому (base.storage): одинаковые файлы хранятся один раз.
+# Блобы без ссылок удаляет `python manage.py collect_blobs` не раньше, чем через BLOB_GC_GRACE_HOURS.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'blobs': {'BACKEND': 'base.storage.ContentAddressedStorage'},
+}
+BLOB_GC_GRACE_HOURS = int(os.getenv('BLOB_GC_GRACE_HOURS', '24'))
+
+# Ширины миниатюр аватарок (больше исходной не делаются) и качество JPEG/WebP.
+# После изменения миниатюры пересобирает `python manage.py generate_thumbnails`.
+AVATAR_THUMBNAIL_WIDTHS = [160, 320, 640]
+AVATAR_THUMBNAIL_QUALITY = int(os.getenv('AVATAR_THUMBNAIL_QUALITY', '82'))
+
+# FAST_JSON=1 включает рендерер и парсер на orjson (pip install orjson).
+FAST_JSON = os.getenv('FAST_JSON', '') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.permissions.IsAdminUser',
+        'base.renderers.FastJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'base.renderers.FastJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'education_app.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ],
+}
+
+SIMPLE_JWT = {
+    'TOKEN_USER_CLASS': 'education_app.authentication.ClaimsUser',
 }
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
@@ -123,6 +154,66 @@ CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+    },
+    # Локальный уровень перед Redis для самых горячих готовых ответов (LRU в памяти процесса).
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'render',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('RENDER_CACHE_LOCAL_ENTRIES', '256'))},
+    },
+    # LRU процесса перед множествами участников чатов в Redis.
+    'membership': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'membership',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('MEMBERSHIP_LOCAL_ENTRIES', '10000'))},
+    },
+}
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', '3600'))
+TOKEN_VERSION_CACHE_TIMEOUT = int(os.getenv('TOKEN_VERSION_CACHE_TIMEOUT', '86400'))
+CONTENT_OWNER_CACHE_TIMEOUT = int(os.getenv('CONTENT_OWNER_CACHE_TIMEOUT', '86400'))
+CONTENT_CACHE_MAX_AGE = int(os.getenv('CONTENT_CACHE_MAX_AGE', '0'))
+MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv('MEMBERSHIP_CACHE_TIMEOUT', '86400'))
+MEMBERSHIP_LOCAL_TIMEOUT = int(os.getenv('MEMBERSHIP_LOCAL_TIMEOUT', '5'))
+RENDER_CACHE_TIMEOUT = int(os.getenv('RENDER_CACHE_TIMEOUT', '3600'))
+RENDER_CACHE_LOCAL_TIMEOUT = int(os.getenv('RENDER_CACHE_LOCAL_TIMEOUT', '60'))
+RENDER_CACHE_LOCK_TIMEOUT = int(os.getenv('RENDER_CACHE_LOCK_TIMEOUT', '10'))
+RENDER_CACHE_WAIT = float(os.getenv('RENDER_CACHE_WAIT', '2'))
+
+CLEANUP_BATCH_SIZE = int(os.getenv('CLEANUP_BATCH_SIZE', '1000'))
+CLEANUP_ARCHIVE_MESSAGES = os.getenv('CLEANUP_ARCHIVE_MESSAGES', '') == '1'
+CHAT_ARCHIVE_ROOT = Path(os.getenv('CHAT_ARCHIVE_ROOT', BASE_DIR / 'archive'))
+USER_IMPORT_WORKERS = int(os.getenv('USER_IMPORT_WORKERS', os.cpu_count() or 1))
+USER_IMPORT_BATCH_SIZE = int(os.getenv('USER_IMPORT_BATCH_SIZE', '500'))
+# Путь к классу полнотекстового бэкенда (base.full_text); пусто — выбор по типу базы.
+FULL_TEXT_BACKEND = os.getenv('FULL_TEXT_BACKEND', '')
+FULL_TEXT_SNIPPET_WORDS = int(os.getenv('FULL_TEXT_SNIPPET_WORDS', '16'))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+EXPORT_FLUSH_BYTES = int(os.getenv('EXPORT_FLUSH_BYTES', '65536'))
+# MESSAGE_WRITE_BEHIND=1: сообщения из API сначала попадают в поток Redis, в базу их пачками пишет `ingest_messages`.
+MESSAGE_WRITE_BEHIND = os.getenv('MESSAGE_WRITE_BEHIND', '') == '1'
+MESSAGE_BUFFER_URL = os.getenv('MESSAGE_BUFFER_URL', CELERY_BROKER_URL)
+MESSAGE_BUFFER_BATCH_SIZE = int(os.getenv('MESSAGE_BUFFER_BATCH_SIZE', '500'))
+MESSAGE_BUFFER_FLUSH_INTERVAL = float(os.getenv('MESSAGE_BUFFER_FLUSH_INTERVAL', '0.2'))
+MESSAGE_BUFFER_ID_BLOCK = int(os.getenv('MESSAGE_BUFFER_ID_BLOCK', '1000'))
+MESSAGE_BUFFER_CLAIM_IDLE = float(os.getenv('MESSAGE_BUFFER_CLAIM_IDLE', '30'))
+CHAT_UPLOAD_MAX_SIZE = int(os.getenv('CHAT_UPLOAD_MAX_SIZE', str(2 * 1024**3)))
+CHAT_UPLOAD_CHUNK_SIZE = int(os.getenv('CHAT_UPLOAD_CHUNK_SIZE', str(8 * 1024**2)))
+CHAT_UPLOAD_BLOCK_SIZE = int(os.getenv('CHAT_UPLOAD_BLOCK_SIZE', str(64 * 1024)))
+CHAT_UPLOAD_EXPIRE_HOURS = int(os.getenv('CHAT_UPLOAD_EXPIRE_HOURS', '24'))
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+        'CONFIG': {
+            'hosts': [os.getenv('CHANNEL_LAYER_URL', CELERY_BROKER_URL)],
+        },
+    },
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
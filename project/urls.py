@@ -8,9 +8,8 @@ from drf_spectacular.views import (
     SpectacularRedocView,
     SpectacularSwaggerView,
 )
-from rest_framework_simplejwt.views import TokenRefreshView
 
-from education_app.views.users import CustomTokenObtainPairView
+from education_app.views.users import CustomTokenObtainPairView, CustomTokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,7 +29,7 @@ urlpatterns = [
         CustomTokenObtainPairView.as_view(),
         name='custom_token_obtain_pair',
     ),
-    path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/auth/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,52 @@
+import time
+from typing import Any
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+
+from education_app.models.chat import Chat, ChatParticipant
+from education_app.services.chat import ChatService
+from project.asgi import application
+
+User = get_user_model()
+
+MESSAGES = 50
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('clients', [10, 100])
+def test_websocket_delivery_throughput(benchmark: Any, clients: int) -> None:
+    chat = Chat.objects.create(name='Benchmark', is_group=True)
+    users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(clients)])
+    ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in users])
+    tokens = [str(AccessToken.for_user(user)) for user in users]
+    delivery_times: list[float] = []
+
+    async def deliver() -> None:
+        communicators = [WebsocketCommunicator(application, f'/ws/chat/{chat.id}/?token={token}') for token in tokens]
+        for communicator in communicators:
+            connected, _ = await communicator.connect()
+            assert connected
+
+        channel_layer = get_channel_layer()
+        started = time.perf_counter()
+        for i in range(MESSAGES):
+            await channel_layer.group_send(
+                ChatService.group_name(chat.id),
+                {'type': 'chat.message', 'message': {'id': i, 'text': 'benchmark'}},
+            )
+            for communicator in communicators:
+                await communicator.receive_json_from()
+        delivery_times.append(time.perf_counter() - started)
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    benchmark.pedantic(async_to_sync(deliver), rounds=3)
+
+    benchmark.extra_info['clients'] = clients
+    benchmark.extra_info['messages_per_second'] = round(MESSAGES * clients / min(delivery_times))
@@ -0,0 +1,59 @@
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from education_app.services.chat import ChatService
+from education_app.services.uploads import complete_upload, create_upload, write_chunk
+
+User = get_user_model()
+
+FILE_SIZE = 64 * 1024**2
+
+
+class Body:
+    """Тело запроса, которое отдаёт байты по мере чтения и не держит часть целиком, как сокет."""
+
+    def __init__(self, size: int) -> None:
+        self.remaining = size
+        self.block = b'\x5a' * settings.CHAT_UPLOAD_BLOCK_SIZE
+
+    def read(self, size: int) -> bytes:
+        size = min(size, self.remaining, len(self.block))
+        self.remaining -= size
+        return self.block[:size]
+
+
+def upload_file(user_id: int, chat_id: int) -> int:
+    chunk_size = settings.CHAT_UPLOAD_CHUNK_SIZE
+    upload = create_upload(user_id, chat_id, 'lecture.mp4', FILE_SIZE)
+    for offset in range(0, FILE_SIZE, chunk_size):
+        length = min(chunk_size, FILE_SIZE - offset)
+        write_chunk(upload, offset, Body(length), length)
+    return complete_upload(upload).size
+
+
+@pytest.mark.django_db
+def test_chunked_upload_throughput(benchmark: Any, settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Лекции', is_group=True, user_ids=[user.id])
+
+    benchmark.pedantic(upload_file, args=(user.id, chat.id), rounds=3)
+
+    tracemalloc.start()
+    try:
+        upload_file(user.id, chat.id)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # Пик памяти — порядка блока чтения, а не части и не файла.
+    assert peak < settings.CHAT_UPLOAD_CHUNK_SIZE // 4
+    benchmark.extra_info['file_bytes'] = FILE_SIZE
+    benchmark.extra_info['chunk_bytes'] = settings.CHAT_UPLOAD_CHUNK_SIZE
+    benchmark.extra_info['peak_memory'] = peak
+    benchmark.extra_info['megabytes_per_second'] = round(FILE_SIZE / 1024**2 / benchmark.stats.stats.mean)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from education_app.models.course import Course
+from education_app.services.cleanup import clean_expired_courses
+
+User = get_user_model()
+
+COURSES = 100
+USERS = 1000
+
+
+@pytest.mark.django_db
+def test_enrollment_cleanup_throughput(benchmark: Any) -> None:
+    ended = timezone.now() - timedelta(days=30)
+    courses = Course.objects.bulk_create(
+        [Course(title=f'Course {i}', duration_days=7, end_datetime=ended) for i in range(COURSES)]
+    )
+    users = User.objects.bulk_create([User(username=f'student{i}') for i in range(USERS)])
+    enrollment = User.courses.through
+
+    def seed() -> None:
+        enrollment.objects.bulk_create(
+            [enrollment(user_id=user.id, course_id=course.id) for course in courses for user in users],
+            batch_size=5000,
+        )
+
+    report = benchmark.pedantic(clean_expired_courses, setup=seed, rounds=3)
+
+    assert report['enrollments']['rows'] == COURSES * USERS
+    assert not enrollment.objects.exists()
+    benchmark.extra_info['enrollments'] = COURSES * USERS
+    benchmark.extra_info['rows_per_second'] = round(COURSES * USERS / report['enrollments']['seconds'])
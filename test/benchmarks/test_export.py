@@ -0,0 +1,46 @@
+import tracemalloc
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from education_app.models.chat import Chat, Message
+from education_app.services.export import iter_export
+
+User = get_user_model()
+
+ROWS = 50_000
+
+
+def drain(fmt: str) -> int:
+    return sum(len(chunk) for chunk in iter_export('messages', fmt))
+
+
+def peak_memory(fmt: str) -> int:
+    tracemalloc.start()
+    try:
+        drain(fmt)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_message_export_throughput(benchmark: Any, fmt: str) -> None:
+    users = User.objects.bulk_create([User(username=f'user{i}') for i in range(20)])
+    chat = Chat.objects.create(name='Поток', is_group=True)
+    Message.objects.bulk_create(
+        [Message(chat=chat, sender=users[i % len(users)], text=f'Сообщение номер {i}') for i in range(ROWS)],
+        batch_size=5000,
+    )
+
+    size = benchmark.pedantic(drain, args=(fmt,), rounds=3)
+    peak = peak_memory(fmt)
+
+    # Пик памяти ограничен пачкой курсора и буфером отправки, а не объёмом выгрузки.
+    assert peak < 4 * 1024 * 1024 < size
+    benchmark.extra_info['rows'] = ROWS
+    benchmark.extra_info['bytes'] = size
+    benchmark.extra_info['peak_memory'] = peak
+    benchmark.extra_info['rows_per_second'] = round(ROWS / benchmark.stats.stats.mean)
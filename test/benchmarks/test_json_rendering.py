@@ -0,0 +1,53 @@
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+
+from base.renderers import FastJSONRenderer
+from education_app.models.chat import Chat, ChatParticipant, Message
+from education_app.models.course import Course, Tag
+from education_app.serializers.chat import ChatSerializer
+from education_app.serializers.course import CourseSerializer
+
+# orjson — необязательная зависимость (extra `fast-json`).
+pytest.importorskip('orjson')
+
+User = get_user_model()
+
+ROWS = 2_000
+
+
+def chat_payload() -> list[dict[str, Any]]:
+    users = User.objects.bulk_create([User(username=f'user{i}') for i in range(50)])
+    chat = Chat.objects.create(name='Поток', is_group=True)
+    ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in users])
+    Message.objects.bulk_create(
+        [Message(chat=chat, sender=users[i % len(users)], text=f'Сообщение {i}') for i in range(ROWS)]
+    )
+    chats = Chat.objects.prefetch_related('participants', 'messages')
+    return ChatSerializer(chats, many=True).data
+
+
+def course_payload() -> list[dict[str, Any]]:
+    tags = Tag.objects.bulk_create([Tag(title=f'tag{i}') for i in range(10)])
+    courses = Course.objects.bulk_create(
+        [Course(title=f'Курс {i}', description='Описание курса', duration_days=30) for i in range(ROWS)]
+    )
+    Course.tags.through.objects.bulk_create(
+        [Course.tags.through(course=course, tag=tags[i % len(tags)]) for i, course in enumerate(courses)]
+    )
+    return CourseSerializer(Course.objects.prefetch_related('tags', 'users'), many=True).data
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('payload', [chat_payload, course_payload], ids=['chat', 'course'])
+@pytest.mark.parametrize('renderer_class', [JSONRenderer, FastJSONRenderer], ids=['drf', 'orjson'])
+def test_json_rendering_throughput(benchmark: Any, payload: Any, renderer_class: type[JSONRenderer]) -> None:
+    data = payload()
+
+    content = benchmark.pedantic(renderer_class().render, args=(data,), rounds=10)
+
+    assert content == JSONRenderer().render(data)
+    benchmark.extra_info['rows'] = ROWS
+    benchmark.extra_info['rows_per_second'] = round(ROWS / benchmark.stats.stats.mean)
@@ -0,0 +1,53 @@
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from base.values_serializer import ValuesSerializer
+from education_app.models.course import Course, Lesson, Module, Question
+from education_app.serializers.course import LessonShortSerializer, ModuleShortSerializer, QuestionShortSerializer
+
+ROWS = 10_000
+SERIALIZERS = {
+    'modules': (Module, ModuleShortSerializer),
+    'lessons': (Lesson, LessonShortSerializer),
+    'questions': (Question, QuestionShortSerializer),
+}
+
+
+def seed() -> None:
+    course = Course.objects.create(title='Course', duration_days=10)
+    modules = Module.objects.bulk_create(
+        [
+            Module(course=course, title=f'Module {i}', content='...', order=i, avatar='module_avatars/a.png')
+            for i in range(ROWS)
+        ]
+    )
+    Lesson.objects.bulk_create([Lesson(module=modules[i], title=f'Lesson {i}', content='...') for i in range(ROWS)])
+    Question.objects.bulk_create([Question(title=f'Question {i}', content='...') for i in range(ROWS)])
+
+
+def drf_path(model: type, serializer_class: type) -> bytes:
+    queryset = model.objects.all()
+    if model is Module:
+        queryset = queryset.prefetch_related('lessons')
+    return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+
+def values_path(model: type, serializer_class: type) -> bytes:
+    return JSONRenderer().render(ValuesSerializer(serializer_class, {}).serialize(model.objects.all()))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', list(SERIALIZERS))
+@pytest.mark.parametrize('path', [drf_path, values_path], ids=['drf', 'values'])
+def test_list_serialization_throughput(benchmark: Any, name: str, path: Callable[[type, type], bytes]) -> None:
+    seed()
+    model, serializer_class = SERIALIZERS[name]
+
+    content = benchmark.pedantic(path, args=(model, serializer_class), rounds=3)
+
+    assert content == drf_path(model, serializer_class)
+    benchmark.extra_info['rows'] = ROWS
+    benchmark.extra_info['rows_per_second'] = round(ROWS / benchmark.stats.stats.mean)
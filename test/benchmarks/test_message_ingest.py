@@ -0,0 +1,105 @@
+from typing import Any
+
+import pytest
+import redis
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from education_app.models.chat import Chat, Message
+from education_app.services.chat import ChatService
+from education_app.services.message_buffer import (
+    drain_message_buffer,
+    get_message_buffer,
+    reserve_message_ids,
+    write_messages,
+)
+
+User = get_user_model()
+
+MESSAGES = 1000
+BATCH_SIZE = 500
+
+
+def live_chat() -> tuple[Chat, list[Any]]:
+    users = User.objects.bulk_create([User(username=f'user{i}') for i in range(20)])
+    chat = ChatService.create_chat(name='Эфир', is_group=True, user_ids=[user.id for user in users])
+    return chat, users
+
+
+def post_messages(chat: Chat, users: list[Any]) -> None:
+    clients = []
+    for user in users:
+        client = APIClient()
+        client.force_authenticate(user)
+        clients.append(client)
+    url = reverse('chat-messages', args=[chat.id])
+    for i in range(MESSAGES):
+        response = clients[i % len(clients)].post(url, {'text': f'Сообщение {i}'}, format='json')
+        assert response.status_code == 201
+
+
+@pytest.mark.django_db(transaction=True)
+def test_direct_ingest_rate(benchmark: Any) -> None:
+    chat, users = live_chat()
+
+    benchmark.pedantic(post_messages, args=(chat, users), rounds=3)
+
+    assert Message.objects.count() == 3 * MESSAGES
+    benchmark.extra_info['mode'] = 'direct'
+    benchmark.extra_info['messages_per_second'] = round(MESSAGES / benchmark.stats.stats.mean)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_flush_rate(benchmark: Any) -> None:
+    """Сторона базы в режиме MESSAGE_WRITE_BEHIND: пачки `write_messages` вместо транзакции на сообщение."""
+    chat, users = live_chat()
+
+    def flush() -> None:
+        first, _ = reserve_message_ids(MESSAGES)
+        now = timezone.now()
+        entries = [
+            {
+                'id': first + i,
+                'chat_id': chat.id,
+                'sender_id': users[i % len(users)].id,
+                'text': f'{i}',
+                'created_at': now,
+            }
+            for i in range(MESSAGES)
+        ]
+        for start in range(0, MESSAGES, BATCH_SIZE):
+            write_messages(entries[start : start + BATCH_SIZE])
+
+    benchmark.pedantic(flush, rounds=3)
+
+    chat.refresh_from_db()
+    assert chat.message_count == Message.objects.count() == 3 * MESSAGES
+    benchmark.extra_info['mode'] = 'write-behind flush'
+    benchmark.extra_info['messages_per_second'] = round(MESSAGES / benchmark.stats.stats.mean)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_end_to_end_rate(benchmark: Any, settings: Any) -> None:
+    """Приём через API в поток и запись пачками; нужен Redis по MESSAGE_BUFFER_URL."""
+    try:
+        get_message_buffer().client.ping()
+    except redis.RedisError:
+        pytest.skip('Нет Redis для буфера сообщений (MESSAGE_BUFFER_URL)')
+    settings.MESSAGE_WRITE_BEHIND = True
+    chat, users = live_chat()
+    accept_times: list[float] = []
+
+    def ingest() -> None:
+        started = timezone.now()
+        post_messages(chat, users)
+        accept_times.append((timezone.now() - started).total_seconds())
+        drain_message_buffer()
+
+    benchmark.pedantic(ingest, rounds=3)
+
+    assert Message.objects.count() == 3 * MESSAGES
+    benchmark.extra_info['mode'] = 'write-behind'
+    benchmark.extra_info['accepted_per_second'] = round(MESSAGES / min(accept_times))
+    benchmark.extra_info['messages_per_second'] = round(MESSAGES / benchmark.stats.stats.mean)
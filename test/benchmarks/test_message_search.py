@@ -0,0 +1,51 @@
+import random
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from base.full_text import parse_terms
+from education_app.models.chat import Chat, ChatParticipant, Message
+from education_app.services.message_search import search_messages
+
+User = get_user_model()
+
+ROWS = 200_000
+WORDS = [f'слово{i}' for i in range(50_000)]
+
+
+def seed() -> User:
+    user = User.objects.create(username='reader')
+    chat = Chat.objects.create(name='Поток', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    rng = random.Random(1)
+    Message.objects.bulk_create(
+        [Message(chat=chat, sender=user, text=' '.join(rng.choices(WORDS, k=12))) for _ in range(ROWS)],
+        batch_size=5000,
+    )
+    return user
+
+
+def like_scan(user: User, query: str) -> list[int]:
+    return list(
+        Message.objects.filter(chat__participants__user=user, text__icontains=query)
+        .order_by('-id')
+        .values_list('id', flat=True)[:20]
+    )
+
+
+def index_search(user: User, query: str) -> list[int]:
+    chat_ids = ChatParticipant.objects.filter(user_id=user.id).values('chat_id')
+    return [hit.pk for hit in search_messages(parse_terms(query), chat_ids)[0:20]]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('search', [like_scan, index_search], ids=['like', 'fts'])
+def test_message_search_latency(benchmark: Any, search: Any) -> None:
+    user = seed()
+
+    # Редкое слово (~50 совпадений): LIKE приходится дочитывать таблицу до конца.
+    found = benchmark.pedantic(search, args=(user, 'слово42424'), rounds=10)
+
+    assert len(found) == 20
+    benchmark.extra_info['rows'] = ROWS
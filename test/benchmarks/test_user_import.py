@@ -0,0 +1,57 @@
+from typing import Any
+
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from education_app.services.user_import import import_users
+from education_app.services.users import create_user
+
+User = get_user_model()
+
+ROWS = 40
+
+
+def make_rows(prefix: str) -> list[dict[str, Any]]:
+    return [
+        {
+            'username': f'{prefix}{i}',
+            'email': f'{prefix}{i}@mail.ru',
+            'first_name': 'Name',
+            'last_name': 'Lastname',
+            'password': f'secret-{i}',
+        }
+        for i in range(ROWS)
+    ]
+
+
+@pytest.mark.django_db
+def test_create_user_loop_throughput(benchmark: Any) -> None:
+    """Базовая линия: по запросу `create_user` на строку, как при регистрации через API."""
+    rounds = iter(range(100))
+
+    def run() -> None:
+        for row in make_rows(f'loop{next(rounds)}-'):
+            create_user(row)
+
+    benchmark.pedantic(run, rounds=2)
+
+    assert User.objects.count() == ROWS * 2
+    benchmark.extra_info['rows'] = ROWS
+    benchmark.extra_info['rows_per_second'] = round(ROWS / benchmark.stats.stats.mean)
+
+
+@pytest.mark.django_db
+def test_bulk_import_throughput(benchmark: Any) -> None:
+    rounds = iter(range(100))
+
+    def run() -> dict[str, Any]:
+        return import_users(make_rows(f'bulk{next(rounds)}-'))
+
+    result = benchmark.pedantic(run, rounds=2)
+
+    assert result['created'] == ROWS
+    assert not result['errors']
+    benchmark.extra_info['rows'] = ROWS
+    benchmark.extra_info['workers'] = settings.USER_IMPORT_WORKERS
+    benchmark.extra_info['rows_per_second'] = round(ROWS / benchmark.stats.stats.mean)
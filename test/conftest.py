@@ -0,0 +1,20 @@
+from typing import Any
+
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def in_memory_channel_layer(settings: Any) -> None:
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@pytest.fixture(autouse=True)
+def local_memory_cache(settings: Any) -> None:
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'local'},
+        'membership': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'membership'},
+    }
+    for alias in settings.CACHES:
+        caches[alias].clear()
@@ -0,0 +1,861 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import unquote
+
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from base.models import Blob
+from base.pagination import KeysetPagination
+from education_app.consts import Role
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageUpload
+from education_app.services import membership, uploads
+from education_app.services.chat import ChatService
+from education_app.services.membership import RedisSets, is_chat_member
+from education_app.services.message_buffer import (
+    GROUP,
+    STREAM_KEY,
+    MessageBuffer,
+    buffer_message,
+    reserve_message_ids,
+    skip_reserved_ids,
+    write_messages,
+)
+from education_app.services.uploads import complete_upload, create_upload, delete_upload, write_chunk
+from project.asgi import application
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_list_messages_keyset_pagination() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    messages = Message.objects.bulk_create([Message(chat=chat, sender=user, text=str(i)) for i in range(5)])
+    ids = sorted(message.id for message in messages)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-messages', args=[chat.id])
+
+    response = client.get(url, {'limit': 2})
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['results']] == [ids[4], ids[3]]
+    assert response.data['previous'] is None
+
+    response = client.get(response.data['next'])
+    assert [item['id'] for item in response.data['results']] == [ids[2], ids[1]]
+
+    response = client.get(url, {'after': ids[1], 'limit': 2})
+    assert [item['id'] for item in response.data['results']] == [ids[3], ids[2]]
+    assert response.data['previous'] is not None
+
+
+@pytest.mark.django_db
+def test_list_messages_requires_participation() -> None:
+    user = User.objects.create_user(username='outsider', password='123')
+    chat = Chat.objects.create(name='Private')
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse('chat-messages', args=[chat.id]))
+    assert response.status_code == 404
+
+    response = client.post(reverse('chat-messages', args=[chat.id]), {'text': 'hi'}, format='json')
+    assert response.status_code == 404
+    assert not Message.objects.exists()
+
+
+@pytest.mark.django_db
+def test_membership_cache_authorizes_without_join_and_follows_changes() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-messages', args=[chat.id])
+
+    assert client.post(url, {'text': 'cold'}, format='json').status_code == 201
+    with CaptureQueriesContext(connection) as queries:
+        assert client.post(url, {'text': 'warm'}, format='json').status_code == 201
+        assert client.get(reverse('chat-detail', args=[chat.id])).status_code == 200
+    # Участники читаются только для ответа detail (prefetch), проверка доступа в БД не ходит.
+    participant_queries = [query['sql'] for query in queries if 'chatparticipant' in query['sql']]
+    assert len(participant_queries) == 2
+    assert not any('JOIN' in sql and 'education_app_chat"' in sql for sql in participant_queries)
+
+    admin_client = APIClient()
+    admin_client.force_authenticate(admin)
+    admin_client.patch(reverse('chat-participants', args=[chat.id]), {'remove': [user.id]}, format='json')
+    assert client.post(url, {'text': 'removed'}, format='json').status_code == 404
+    assert client.get(reverse('chat-detail', args=[chat.id])).status_code == 404
+
+    admin_client.patch(reverse('chat-participants', args=[chat.id]), {'add': [user.id]}, format='json')
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_membership_cache_follows_django_admin_changes(client: Any) -> None:
+    admin = User.objects.create_superuser(username='admin', password='123')
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    other = ChatService.create_chat(name='Other', is_group=True, user_ids=[])
+    participant = ChatParticipant.objects.get(chat=chat, user=user)
+    assert is_chat_member(chat.id, user.id)
+    assert not is_chat_member(other.id, user.id)
+    client.force_login(admin)
+
+    change_url = reverse('admin:education_app_chatparticipant_change', args=[participant.id])
+    response = client.post(change_url, {'chat': other.id, 'user': user.id, 'read_count': 0})
+    assert response.status_code == 302
+    assert not is_chat_member(chat.id, user.id)
+    assert is_chat_member(other.id, user.id)
+
+    delete_url = reverse('admin:education_app_chatparticipant_delete', args=[participant.id])
+    assert client.post(delete_url, {'post': 'yes'}).status_code == 302
+    assert not is_chat_member(other.id, user.id)
+
+
+def test_redis_membership_sets() -> None:
+    sets = RedisSets(fakeredis.FakeRedis())
+    assert sets.contains(1, 5) is None
+
+    assert sets.fill(1, [5, 6], sets.generation(1))
+    assert sets.contains(1, 5) is True
+    assert sets.contains(1, 7) is False
+    # Пустой чат — загруженный состав, а не промах.
+    assert sets.fill(2, [], sets.generation(2))
+    assert sets.contains(2, 5) is False
+    # Большой состав пишется скриптом частями.
+    assert sets.fill(3, range(2500), sets.generation(3))
+    assert sets.contains(3, 2499) is True
+
+    # Состав сбросили, пока читатель грузил его из базы: устаревший список не записывается.
+    generation = sets.generation(1)
+    sets.invalidate({1})
+    assert sets.contains(1, 5) is None
+    assert not sets.fill(1, [5, 6], generation)
+    assert sets.contains(1, 5) is None
+    assert sets.fill(1, [6], sets.generation(1))
+    assert sets.contains(1, 5) is False
+
+
+@pytest.mark.django_db
+def test_membership_removed_while_loading_is_not_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    sets = RedisSets(fakeredis.FakeRedis())
+    monkeypatch.setattr(membership, '_store', lambda: sets)
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    load = membership._load
+
+    def load_then_remove(chat_id: int) -> set[int]:
+        # Участника удаляют (и сбрасывают кеш) между чтением состава из базы и записью его в кеш.
+        members = load(chat_id)
+        ChatParticipant.objects.filter(chat=chat, user=user).delete()
+        return members
+
+    monkeypatch.setattr(membership, '_load', load_then_remove)
+    assert is_chat_member(chat.id, user.id)
+    monkeypatch.setattr(membership, '_load', load)
+    assert sets.contains(chat.id, user.id) is None
+    assert not is_chat_member(chat.id, user.id)
+
+
+@pytest.mark.django_db
+def test_rebuild_membership_cache_command() -> None:
+    users = User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+    chats = [Chat.objects.create(name=str(i)) for i in range(2)]
+    ChatParticipant.objects.bulk_create([ChatParticipant(chat=chats[0], user=user) for user in users])
+    ChatParticipant.objects.create(chat=chats[1], user=users[0])
+
+    call_command('rebuild_membership_cache')
+
+    with CaptureQueriesContext(connection) as queries:
+        assert is_chat_member(chats[0].id, users[2].id)
+        assert is_chat_member(chats[1].id, users[0].id)
+        assert not is_chat_member(chats[1].id, users[1].id)
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_batch_keeps_reserved_ids_and_is_idempotent() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+    first, last = reserve_message_ids(10)
+    created_at = timezone.now() - timedelta(minutes=1)
+    entries = [
+        {'id': first + i, 'chat_id': chat.id, 'sender_id': user.id, 'text': str(i), 'created_at': created_at}
+        for i in range(3)
+    ]
+    # Чат удалили, пока сообщение ждало в буфере.
+    entries.append(
+        {'id': first + 3, 'chat_id': chat.id + 1, 'sender_id': user.id, 'text': '', 'created_at': created_at}
+    )
+
+    assert write_messages(entries) == 3
+    assert write_messages(entries) == 0
+
+    assert list(Message.objects.values_list('id', flat=True)) == [first + 2, first + 1, first]
+    assert Message.objects.get(id=first).created_at == created_at
+    chat.refresh_from_db()
+    assert (chat.message_count, chat.last_message_id) == (3, first + 2)
+    participant = ChatParticipant.objects.get(chat=chat, user=user)
+    assert (participant.read_count, participant.last_read_message_id) == (3, first + 2)
+    # Обычный INSERT не выдаёт зарезервированные для буфера id.
+    assert Message.objects.create(chat=chat, sender=user, text='direct').id > last
+
+
+@pytest.mark.django_db
+def test_write_behind_falls_back_to_direct_insert_without_redis(settings: Any) -> None:
+    settings.MESSAGE_WRITE_BEHIND = True
+    settings.MESSAGE_BUFFER_URL = 'redis://127.0.0.1:1/0'
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-messages', args=[chat.id])
+
+    response = client.post(url, {'text': 'hello'}, format='json')
+    assert response.status_code == 201
+    assert Message.objects.get().id == response.data['id']
+
+    response = client.get(url)
+    assert [item['text'] for item in response.data['results']] == ['hello']
+
+
+def use_fake_message_buffer(monkeypatch: pytest.MonkeyPatch, settings: Any) -> tuple[MessageBuffer, Any]:
+    """Буфер сообщений на fakeredis (Lua-скрипты выполняет lupa) вместо Redis по MESSAGE_BUFFER_URL."""
+    server = fakeredis.FakeServer()
+    buffer = MessageBuffer(fakeredis.FakeRedis(server=server, decode_responses=True))
+    buffer.ensure_group()
+    monkeypatch.setattr('education_app.services.message_buffer.get_message_buffer', lambda: buffer)
+    monkeypatch.setattr('education_app.services.message_buffer._stale_ids', threading.Event())
+    settings.MESSAGE_WRITE_BEHIND = True
+    settings.MESSAGE_BUFFER_ID_BLOCK = 10
+    return buffer, server
+
+
+@pytest.mark.django_db
+def test_message_buffer_append_flush_ack(monkeypatch: pytest.MonkeyPatch, settings: Any) -> None:
+    buffer, _ = use_fake_message_buffer(monkeypatch, settings)
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+
+    payloads = [buffer.append(chat.id, user, str(i)) for i in range(12)]
+    ids = [payload['id'] for payload in payloads]
+    # Диапазон по 10 id кончился на середине и был зарезервирован заново — id всё равно возрастают.
+    assert ids == sorted(ids) and len(set(ids)) == 12
+    assert [message['id'] for message in buffer.pending(chat.id)] == ids[::-1]
+    assert not Message.objects.exists()
+
+    assert buffer.flush('worker', batch_size=5, interval=0) == 5
+    assert buffer.flush('worker', batch_size=100, interval=0) == 7
+    assert buffer.flush('worker', interval=0) == 0
+
+    assert sorted(Message.objects.values_list('id', flat=True)) == ids
+    assert Message.objects.get(id=ids[0]).created_at.isoformat().replace('+00:00', 'Z') == payloads[0]['created_at']
+    assert buffer.pending(chat.id) == []
+    assert buffer.client.xlen(STREAM_KEY) == 0
+    assert buffer.client.xpending(STREAM_KEY, GROUP)['pending'] == 0
+    chat.refresh_from_db()
+    assert (chat.message_count, chat.last_message_id) == (12, ids[-1])
+
+
+@pytest.mark.django_db
+def test_message_buffer_reclaims_batch_of_crashed_worker(monkeypatch: pytest.MonkeyPatch, settings: Any) -> None:
+    buffer, _ = use_fake_message_buffer(monkeypatch, settings)
+    settings.MESSAGE_BUFFER_CLAIM_IDLE = 0
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+    ids = [buffer.append(chat.id, user, str(i))['id'] for i in range(3)]
+
+    # Воркер забрал пачку и упал, не записав и не подтвердив её.
+    assert len(buffer._collect('crashed', 10, 0)) == 3
+    assert buffer.client.xpending(STREAM_KEY, GROUP)['pending'] == 3
+
+    assert buffer.flush('alive', interval=0) == 3
+    assert sorted(Message.objects.values_list('id', flat=True)) == ids
+    assert buffer.client.xpending(STREAM_KEY, GROUP)['pending'] == 0
+    assert buffer.flush('alive', interval=0) == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_reads_own_writes_before_flush(monkeypatch: pytest.MonkeyPatch, settings: Any) -> None:
+    buffer, _ = use_fake_message_buffer(monkeypatch, settings)
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+    Message.objects.create(chat=chat, sender=user, text='old')
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-messages', args=[chat.id])
+    old = client.get(url).data['results'][0]['id']
+
+    posted = [client.post(url, {'text': text}, format='json').data for text in ('first', 'second')]
+    assert Message.objects.count() == 1
+
+    response = client.get(url)
+    assert [item['text'] for item in response.data['results']] == ['second', 'first', 'old']
+    assert response.data['results'][0] == posted[1]
+    response = client.get(url, {'after': old})
+    assert [item['id'] for item in response.data['results']] == [posted[1]['id'], posted[0]['id']]
+
+    buffer.flush('worker', interval=0)
+    response = client.get(url)
+    assert [item['text'] for item in response.data['results']] == ['second', 'first', 'old']
+    assert [item['id'] for item in response.data['results']] == [posted[1]['id'], posted[0]['id'], old]
+
+
+@pytest.mark.django_db
+def test_direct_insert_moves_buffer_past_its_id(monkeypatch: pytest.MonkeyPatch, settings: Any) -> None:
+    buffer, server = use_fake_message_buffer(monkeypatch, settings)
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Live', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-messages', args=[chat.id])
+
+    buffered = client.post(url, {'text': 'buffered'}, format='json').data['id']
+    # Прямая вставка получает id выше остатка диапазона; следующие сообщения из буфера должны быть новее её.
+    direct = Message.objects.create(chat=chat, sender=user, text='direct').id
+    assert direct > buffered
+    skip_reserved_ids()
+    assert buffer_message(chat.id, user, 'after direct')['id'] > direct
+
+    # Redis недоступен: сообщение пишется напрямую, диапазон меняется при первом приёме после восстановления.
+    server.connected = False
+    fallback = client.post(url, {'text': 'fallback'}, format='json').data['id']
+    assert Message.objects.filter(id=fallback).exists()
+    server.connected = True
+    assert client.post(url, {'text': 'recovered'}, format='json').data['id'] > fallback
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_merges_pending_rows() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Live')
+    Message.objects.bulk_create([Message(chat=chat, sender=user, text=str(i)) for i in range(3)])
+    a, b, c = sorted(Message.objects.values_list('id', flat=True))
+    pending = [{'id': c + 2}, {'id': c + 1}]
+    factory = APIRequestFactory()
+
+    def page(**params: Any) -> tuple[list[int], KeysetPagination]:
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(Message.objects.all(), Request(factory.get('/', params)))
+        merged = paginator.merge([{'id': row.id} for row in rows], pending)
+        return [row['id'] for row in merged], paginator
+
+    ids, paginator = page(limit=3)
+    assert ids == [c + 2, c + 1, c]
+    assert 'before=' in paginator.get_next_link()
+
+    ids, paginator = page(limit=2, after=b)
+    assert ids == [c + 1, c]
+    assert f'after={c + 1}' in paginator.get_previous_link()
+
+    ids, _ = page(limit=5, before=c + 2)
+    assert ids == [c + 1, c, b, a]
+
+
+@pytest.mark.django_db
+def test_chat_detail_has_no_messages() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    Message.objects.create(chat=chat, sender=user, text='hello')
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse('chat-detail', args=[chat.id]))
+
+    assert response.status_code == 200
+    assert 'messages' not in response.data
+    assert response.data['participants'][0]['user']['id'] == user.id
+
+
+@pytest.mark.django_db
+def test_websocket_receives_created_message(django_capture_on_commit_callbacks: Callable) -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def post_message() -> None:
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse('chat-messages', args=[chat.id]), {'text': 'hello'}, format='json')
+
+    async def scenario() -> dict:
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{chat.id}/?token={AccessToken.for_user(user)}')
+        connected, _ = await communicator.connect()
+        assert connected
+
+        await database_sync_to_async(post_message)()
+        event = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return event
+
+    event = async_to_sync(scenario)()
+
+    assert event['text'] == 'hello'
+    assert event['sender']['id'] == user.id
+
+
+@pytest.mark.django_db
+def test_websocket_rejects_revoked_token() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    token = AccessToken.for_user(user)
+    user.role = Role.MENTOR
+    user.save()
+
+    async def scenario() -> bool:
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{chat.id}/?token={token}')
+        connected, _ = await communicator.connect()
+        return connected
+
+    assert async_to_sync(scenario)() is False
+
+
+@pytest.mark.django_db
+def test_websocket_rejects_non_participant() -> None:
+    user = User.objects.create_user(username='outsider', password='123')
+    chat = Chat.objects.create(name='Private')
+
+    async def scenario() -> bool:
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{chat.id}/?token={AccessToken.for_user(user)}')
+        connected, _ = await communicator.connect()
+        return connected
+
+    assert async_to_sync(scenario)() is False
+
+
+@pytest.mark.django_db
+def test_inbox_unread_counters(django_assert_num_queries: Callable) -> None:
+    author = User.objects.create_user(username='mentor', password='123')
+    reader = User.objects.create_user(username='student', password='123')
+    chats = [Chat.objects.create(name=f'Group {i}', is_group=True) for i in range(3)]
+    for chat in chats:
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in (author, reader)])
+
+    author_client = APIClient()
+    author_client.force_authenticate(author)
+    for text in ('first', 'second'):
+        author_client.post(reverse('chat-messages', args=[chats[0].id]), {'text': text}, format='json')
+
+    reader_client = APIClient()
+    reader_client.force_authenticate(reader)
+    with django_assert_num_queries(1):
+        response = reader_client.get(reverse('chat-inbox'))
+
+    assert response.status_code == 200
+    inbox = {item['id']: item for item in response.data}
+    assert inbox[chats[0].id]['unread_count'] == 2
+    assert inbox[chats[0].id]['last_message']['text'] == 'second'
+    assert inbox[chats[1].id]['unread_count'] == 0
+    assert response.data[0]['id'] == chats[0].id
+
+    response = author_client.get(reverse('chat-inbox'))
+    assert {item['id']: item for item in response.data}[chats[0].id]['unread_count'] == 0
+
+
+@pytest.mark.django_db
+def test_mark_read_moves_cursor_forward() -> None:
+    author = User.objects.create_user(username='mentor', password='123')
+    reader = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in (author, reader)])
+
+    author_client = APIClient()
+    author_client.force_authenticate(author)
+    ids = [
+        author_client.post(reverse('chat-messages', args=[chat.id]), {'text': str(i)}, format='json').data['id']
+        for i in range(3)
+    ]
+
+    client = APIClient()
+    client.force_authenticate(reader)
+    url = reverse('chat-read', args=[chat.id])
+
+    response = client.post(url, {'message_id': ids[1]}, format='json')
+    assert response.data == {'last_read_message_id': ids[1], 'unread_count': 1}
+
+    response = client.post(url, {'message_id': ids[0]}, format='json')
+    assert response.data == {'last_read_message_id': ids[1], 'unread_count': 1}
+
+    response = client.post(url, format='json')
+    assert response.data == {'last_read_message_id': ids[2], 'unread_count': 0}
+
+
+@pytest.mark.django_db
+def test_mark_read_rejects_message_outside_chat() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    other = ChatService.create_chat(name='Other', is_group=True, user_ids=[user.id])
+    foreign = Message.objects.create(chat=other, sender=user, text='elsewhere')
+    empty = ChatService.create_chat(name='Empty', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(reverse('chat-read', args=[empty.id]), {'message_id': 999999}, format='json')
+    assert response.status_code == 400
+    assert 'message_id' in response.data
+
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    Message.objects.create(chat=chat, sender=user, text='own')
+    response = client.post(reverse('chat-read', args=[chat.id]), {'message_id': foreign.id}, format='json')
+    assert response.status_code == 400
+    assert ChatParticipant.objects.get(chat=chat, user=user).last_read_message_id is None
+
+
+@pytest.mark.django_db
+def test_update_chat_keeps_unchanged_participants() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    stay, leave, join = (User.objects.create(username=name) for name in ('stay', 'leave', 'join'))
+    chat = Chat.objects.create(name='Group', is_group=True)
+    kept = ChatParticipant.objects.create(chat=chat, user=stay)
+    ChatParticipant.objects.create(chat=chat, user=leave)
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    payload = {'name': 'Renamed', 'is_group': True, 'user_ids': [stay.id, join.id]}
+    response = client.put(reverse('chat-detail', args=[chat.id]), payload, format='json')
+
+    assert response.status_code == 200
+    assert set(chat.participants.values_list('user_id', flat=True)) == {stay.id, join.id}
+    assert ChatParticipant.objects.get(chat=chat, user=stay).id == kept.id
+
+    response = client.patch(reverse('chat-detail', args=[chat.id]), {'name': 'Again'}, format='json')
+    assert response.data['name'] == 'Again'
+    assert chat.participants.count() == 2
+
+
+@pytest.mark.django_db
+def test_member_cannot_update_chat() -> None:
+    member, outsider = (User.objects.create_user(username=name, password='123') for name in ('member', 'outsider'))
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[member.id])
+
+    client = APIClient()
+    client.force_authenticate(member)
+    url = reverse('chat-detail', args=[chat.id])
+    assert client.patch(url, {'user_ids': [member.id, outsider.id]}, format='json').status_code == 403
+    payload = {'name': 'Mine', 'is_group': True, 'user_ids': [member.id]}
+    assert client.put(url, payload, format='json').status_code == 403
+    assert set(chat.participants.values_list('user_id', flat=True)) == {member.id}
+
+
+@pytest.mark.django_db
+def test_patch_participants_adds_and_removes_in_bulk() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    users = User.objects.bulk_create([User(username=f'user{i}') for i in range(4)])
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=user) for user in users[:2]])
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    url = reverse('chat-participants', args=[chat.id])
+    payload = {'add': [users[1].id, users[2].id, users[3].id], 'remove': [users[0].id]}
+
+    response = client.patch(url, payload, format='json')
+
+    assert response.data == {'added': 2, 'removed': 1}
+    assert set(chat.participants.values_list('user_id', flat=True)) == {user.id for user in users[1:]}
+
+    response = client.patch(url, {'add': [users[0].id], 'remove': [users[0].id]}, format='json')
+    assert response.status_code == 400
+
+
+def send_chunk(client: APIClient, url: str, offset: int, data: bytes, **headers: str) -> Any:
+    return client.patch(
+        url, data, content_type='application/offset+octet-stream', headers={'Upload-Offset': str(offset), **headers}
+    )
+
+
+@pytest.mark.django_db
+def test_chunked_upload_resumes_and_attaches_to_message(settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    settings.CHAT_UPLOAD_BLOCK_SIZE = 1000
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    content = bytes(range(256)) * 40
+
+    response = client.post(
+        reverse('chat-uploads', args=[chat.id]), {'filename': '../лекция 1.pdf', 'size': len(content)}
+    )
+    assert response.status_code == 201
+    assert response.data['filename'] == 'лекция_1.pdf'
+    url = reverse('chat-upload-detail', args=[chat.id, response.data['id']])
+
+    assert send_chunk(client, url, 0, content[:4000]).data['offset'] == 4000
+    # Ответ на вторую часть потерян, клиент повторяет её — сервер сообщает, откуда продолжать.
+    assert send_chunk(client, url, 4000, content[4000:7000]).status_code == 200
+    response = send_chunk(client, url, 4000, content[4000:7000])
+    assert response.status_code == 409
+    assert response['Upload-Offset'] == '7000'
+    assert client.head(url)['Upload-Offset'] == '7000'
+
+    checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(b'broken').digest()).decode()
+    assert send_chunk(client, url, 7000, content[7000:], **{'Upload-Checksum': checksum}).status_code == 400
+    checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(content[7000:]).digest()).decode()
+    assert send_chunk(client, url, 7000, content[7000:], **{'Upload-Checksum': checksum}).status_code == 200
+
+    response = client.post(f'{url}complete/')
+    assert response.data['sha256'] == hashlib.sha256(content).hexdigest()
+    assert not any((tmp_path / 'chat_files' / 'partial').iterdir())
+
+    messages_url = reverse('chat-messages', args=[chat.id])
+    response = client.post(messages_url, {'text': 'Слайды', 'uploads': [response.data['id']]}, format='json')
+    assert response.status_code == 201
+    [attachment] = response.data['attachments']
+    digest = hashlib.sha256(content).hexdigest()
+    assert unquote(attachment['file']).endswith(f'/media/blobs/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+    assert (tmp_path / 'blobs' / digest[:2] / digest[2:4] / f'{digest}.pdf').read_bytes() == content
+    assert Blob.objects.get().ref_count == 1
+    assert not MessageUpload.objects.exists()
+
+    # Загрузку нельзя прикрепить второй раз.
+    response = client.post(messages_url, {'uploads': [response.data['id']]}, format='json')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_upload_hash_is_recomputed_when_chunks_hit_other_processes(settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    user = User.objects.create_user(username='student', password='123')
+    outsider = User.objects.create_user(username='outsider', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    content = b'x' * 5000 + b'y' * 5000
+
+    upload = create_upload(user.id, chat.id, 'notes.txt', len(content))
+    write_chunk(upload, 0, io.BytesIO(content[:5000]), 5000)
+    uploads._hashers.clear()
+    write_chunk(upload, 5000, io.BytesIO(content[5000:]), 5000)
+    with pytest.raises(ValidationError):
+        write_chunk(upload, 10000, io.BytesIO(b'z'), 1)
+
+    assert complete_upload(upload).sha256 == hashlib.sha256(content).hexdigest()
+
+    client = APIClient()
+    client.force_authenticate(outsider)
+    assert client.get(reverse('chat-upload-detail', args=[chat.id, upload.id])).status_code == 404
+    response = client.post(reverse('chat-uploads', args=[chat.id]), {'filename': 'a.txt', 'size': 1})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_identical_uploads_share_one_blob_until_collected(settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    user = User.objects.create_user(username='student', password='123')
+    chat = ChatService.create_chat(name='Group', is_group=True, user_ids=[user.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    content = b'slides' * 1000
+    digest = hashlib.sha256(content).hexdigest()
+
+    first = create_upload(user.id, chat.id, 'slides.pdf', len(content))
+    write_chunk(first, 0, io.BytesIO(content), len(content))
+    complete_upload(first)
+
+    # Клиент знает хеш заранее: тот же файл уже хранится, и части слать не нужно.
+    response = client.post(
+        reverse('chat-uploads', args=[chat.id]), {'filename': 'копия.pdf', 'size': len(content), 'sha256': digest}
+    )
+    assert response.status_code == 201
+    assert response.data['offset'] == len(content)
+    response = client.post(
+        reverse('chat-messages', args=[chat.id]), {'uploads': [str(first.id), response.data['id']]}, format='json'
+    )
+    assert response.status_code == 201
+    assert len({attachment['file'] for attachment in response.data['attachments']}) == 1
+    [path] = (tmp_path / 'blobs').rglob('*.pdf')
+    assert Blob.objects.get().ref_count == 2
+
+    # Объявленный хеш сверяется с загруженным.
+    upload = create_upload(user.id, chat.id, 'other.pdf', 3, sha256='0' * 64)
+    assert upload.offset == 0
+    write_chunk(upload, 0, io.BytesIO(b'abc'), 3)
+    with pytest.raises(ValidationError):
+        complete_upload(upload)
+    delete_upload(upload)
+
+    Message.objects.get().delete()
+    assert Blob.objects.get().ref_count == 0
+    call_command('collect_blobs', grace_hours=1)
+    assert path.exists()
+    call_command('collect_blobs', grace_hours=0)
+    assert not path.exists()
+    assert not Blob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_known_hash_does_not_grant_access_to_foreign_file(settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    owner = User.objects.create_user(username='owner', password='123')
+    stranger = User.objects.create_user(username='stranger', password='123')
+    private = ChatService.create_chat(name='Private', is_group=True, user_ids=[owner.id])
+    public = ChatService.create_chat(name='Public', is_group=True, user_ids=[owner.id, stranger.id])
+    content = b'secret' * 1000
+    digest = hashlib.sha256(content).hexdigest()
+
+    upload = create_upload(owner.id, private.id, 'secret.pdf', len(content))
+    write_chunk(upload, 0, io.BytesIO(content), len(content))
+    complete_upload(upload)
+    client = APIClient()
+    client.force_authenticate(owner)
+    response = client.post(reverse('chat-messages', args=[private.id]), {'uploads': [str(upload.id)]}, format='json')
+    assert response.status_code == 201
+
+    client.force_authenticate(stranger)
+    payload = {'filename': 'x.pdf', 'size': len(content), 'sha256': digest}
+    response = client.post(reverse('chat-uploads', args=[public.id]), payload)
+    assert response.status_code == 201
+    assert response.data['offset'] == 0
+    url = reverse('chat-upload-detail', args=[public.id, response.data['id']])
+    assert client.post(f'{url}complete/').status_code == 400
+
+    # Тот же файл, уже прикреплённый в общем чате, его участникам доступен и без загрузки.
+    client.force_authenticate(owner)
+    upload = create_upload(owner.id, public.id, 'secret.pdf', len(content), sha256=digest)
+    assert upload.offset == len(content)
+    client.post(reverse('chat-messages', args=[public.id]), {'uploads': [str(upload.id)]}, format='json')
+    client.force_authenticate(stranger)
+    response = client.post(reverse('chat-uploads', args=[public.id]), payload)
+    assert response.data['offset'] == len(content)
+
+
+@pytest.mark.django_db
+def test_export_messages_streams_rows_in_chunks(settings: Any) -> None:
+    settings.EXPORT_CHUNK_SIZE = 2
+    settings.EXPORT_FLUSH_BYTES = 1
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    messages = Message.objects.bulk_create([Message(chat=chat, sender=user, text=f'строка\n{i}') for i in range(5)])
+    Message.objects.create(chat=Chat.objects.create(), sender=user, text='other chat')
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    response = client.get(reverse('chat-export-messages'), {'chat_id': chat.id})
+
+    chunks = list(response.streaming_content)
+    assert len(chunks) == 5
+    rows = [json.loads(chunk) for chunk in chunks]
+    assert [row['id'] for row in rows] == sorted(message.id for message in messages)
+    assert rows[0]['text'] == 'строка\n0'
+    assert rows[0]['sender_username'] == 'student'
+
+    response = client.get(reverse('chat-export-participants'), {'output': 'csv'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0] == 'chat_id,user_id,username,joined_at,last_read_message_id'
+    assert lines[1].startswith(f'{chat.id},{user.id},student,')
+
+
+@pytest.mark.django_db
+def test_export_csv_escapes_formulas() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    user = User.objects.create_user(username='@evil', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    for text in ('=HYPERLINK("http://x")', '+1', '-2', 'plain'):
+        Message.objects.create(chat=chat, sender=user, text=text)
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    response = client.get(reverse('chat-export-messages'), {'chat_id': chat.id, 'output': 'csv'})
+    rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    assert [row['text'] for row in rows] == ['\'=HYPERLINK("http://x")', "'+1", "'-2", 'plain']
+    assert {row['sender_username'] for row in rows} == {"'@evil"}
+    assert rows[0]['chat_id'] == str(chat.id)
+
+
+@pytest.mark.django_db
+def test_export_data_command_writes_file(tmp_path: Path) -> None:
+    user = User.objects.create_user(username='student', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+
+    path = tmp_path / 'participants.ndjson'
+    call_command('export_data', 'participants', '--owner-id', str(chat.id), '--output', str(path))
+
+    assert [json.loads(line)['username'] for line in path.read_text().splitlines()] == ['student']
+
+
+@pytest.mark.django_db
+def test_message_search_is_ranked_highlighted_and_scoped() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    author = User.objects.create_user(username='author', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    foreign = Chat.objects.create(name='Foreign', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    ChatParticipant.objects.create(chat=foreign, user=author)
+    weak = Message.objects.create(chat=chat, sender=author, text='Домашнее задание по Python выложено, <см> ниже')
+    strong = Message.objects.create(chat=chat, sender=author, text='Python, python и ещё раз Python: задание')
+    Message.objects.bulk_create([Message(chat=chat, sender=author, text='Про другое')])
+    Message.objects.create(chat=foreign, sender=author, text='Чужое задание по python')
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('chat-search')
+
+    response = client.get(url, {'q': 'PYTH зада'})
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+    assert [item['id'] for item in response.data['results']] == [strong.id, weak.id]
+    assert response.data['results'][1]['highlight'] == (
+        'Домашнее <mark>задание</mark> по <mark>Python</mark> выложено, &lt;см&gt; ниже'
+    )
+    assert response.data['results'][1]['sender']['username'] == 'author'
+
+    response = client.get(url, {'q': 'зада', 'page_size': 1, 'page': 2})
+    assert [item['id'] for item in response.data['results']] == [weak.id]
+
+    # Индекс следит за правками и удалениями сообщений.
+    strong.text = 'Совсем другой текст'
+    strong.save()
+    weak.delete()
+    Message.objects.bulk_create([Message(chat=chat, sender=author, text='Новое задание')])
+    response = client.get(url, {'q': 'задание'})
+    assert [item['text'] for item in response.data['results']] == ['Новое задание']
+
+    assert client.get(url, {'q': '"*'}).status_code == 400
+    assert client.get(url, {'q': 'задание', 'chat_id': foreign.id}).data['count'] == 0
+
+
+@pytest.mark.django_db
+def test_message_admin_search_uses_index(client: Any) -> None:
+    admin = User.objects.create_superuser(username='admin', password='123')
+    chat = Chat.objects.create(name='Group', is_group=True)
+    found = Message.objects.create(chat=chat, sender=admin, text='Ссылка на вебинар')
+    Message.objects.create(chat=chat, sender=admin, text='Вебинары отменены')
+    client.force_login(admin)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('admin:education_app_message_changelist'), {'q': 'вебинар ссыл'})
+
+    assert list(response.context['cl'].result_list) == [found]
+    assert not any('LIKE' in query['sql'] for query in queries)
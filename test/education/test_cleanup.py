@@ -0,0 +1,100 @@
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from education_app.models.chat import Chat, ChatParticipant, Message, MessageAttachment
+from education_app.models.course import Course
+from education_app.services.cleanup import expired_courses
+from education_app.tasks import clean_all_expired_courses
+
+User = get_user_model()
+
+
+def create_course_with_chat(title: str, ended_days_ago: int, duration_days: int, user: User) -> Course:
+    chat = Chat.objects.create(name=title, is_group=True)
+    course = Course.objects.create(
+        title=title,
+        duration_days=duration_days,
+        end_datetime=timezone.now() - timedelta(days=ended_days_ago),
+        chat=chat,
+    )
+    ChatParticipant.objects.create(chat=chat, user=user)
+    course.users.add(user)
+    messages = Message.objects.bulk_create([Message(chat=chat, sender=user, text=str(i)) for i in range(5)])
+    MessageAttachment.objects.create(message=messages[0])
+    Chat.objects.filter(id=chat.id).update(last_message=messages[-1], message_count=5)
+    return course
+
+
+@pytest.mark.django_db
+def test_expired_courses_respects_per_course_duration() -> None:
+    user = User.objects.create(username='student')
+    expired = create_course_with_chat('Expired', ended_days_ago=10, duration_days=7, user=user)
+    create_course_with_chat('Grace period', ended_days_ago=10, duration_days=30, user=user)
+    create_course_with_chat('Running', ended_days_ago=-5, duration_days=1, user=user)
+
+    assert list(expired_courses().values_list('id', flat=True)) == [expired.id]
+
+
+@pytest.mark.django_db
+def test_clean_all_expired_courses_reports_phases() -> None:
+    user = User.objects.create(username='student')
+    expired = create_course_with_chat('Expired', ended_days_ago=10, duration_days=7, user=user)
+    active = create_course_with_chat('Active', ended_days_ago=1, duration_days=7, user=user)
+
+    report = clean_all_expired_courses(batch_size=2)
+
+    assert report['courses']['rows'] == 1
+    assert report['enrollments']['rows'] == 1
+    assert report['chat_participants']['rows'] == 1
+    assert report['messages']['rows'] == 5
+    assert report['messages']['attachments'] == 1
+    assert 'seconds' in report['messages']
+    assert not Message.objects.filter(chat=expired.chat).exists()
+    assert Message.objects.filter(chat=active.chat).count() == 5
+    assert Chat.objects.get(id=expired.chat_id).message_count == 0
+    assert list(user.courses.all()) == [active]
+
+    assert clean_all_expired_courses().total_rows == 0
+
+
+@pytest.mark.django_db
+def test_clean_all_expired_courses_dry_run_keeps_rows() -> None:
+    user = User.objects.create(username='student')
+    expired = create_course_with_chat('Expired', ended_days_ago=10, duration_days=7, user=user)
+
+    report = clean_all_expired_courses(dry_run=True)
+
+    assert report['enrollments']['rows'] == 1
+    assert report['messages']['rows'] == 5
+    assert expired.users.count() == 1
+    assert Message.objects.filter(chat=expired.chat).count() == 5
+
+
+@pytest.mark.django_db
+def test_archive_purge_and_restore(settings: Any, tmp_path: Path) -> None:
+    settings.CHAT_ARCHIVE_ROOT = tmp_path
+    user = User.objects.create(username='student')
+    expired = create_course_with_chat('Expired', ended_days_ago=10, duration_days=7, user=user)
+    original = list(Message.objects.filter(chat=expired.chat).order_by('id').values('id', 'text', 'created_at'))
+
+    report = clean_all_expired_courses(batch_size=2, archive=True)
+
+    assert report['messages']['rows'] == 5
+    assert report['messages']['attachments'] == 1
+    [archive] = report['messages']['archives']
+    assert not Message.objects.filter(chat=expired.chat).exists()
+
+    call_command('restore_chat_archive', archive)
+    call_command('restore_chat_archive', archive)
+
+    restored = list(Message.objects.filter(chat=expired.chat).order_by('id').values('id', 'text', 'created_at'))
+    assert restored == original
+    assert MessageAttachment.objects.filter(message__chat=expired.chat).count() == 1
+    chat = Chat.objects.get(id=expired.chat_id)
+    assert (chat.message_count, chat.last_message_id) == (5, original[-1]['id'])
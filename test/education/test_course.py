@@ -1,9 +1,31 @@
+import csv
+import io
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
-from education_app.models.course import Course
+from base.models import Blob
+from base.render_cache import render_cache
+from base.storage import recount_blob_references
+from education_app.models.course import Answer, Course, Lesson, Module, Question, Tag
+from education_app.serializers.course import LessonShortSerializer, ModuleShortSerializer, QuestionShortSerializer
+from education_app.services.catalog_search import tag_facets
+from education_app.services.thumbnails import regenerate_thumbnails
+from project.celery import app as celery_app
 
 User = get_user_model()
 
@@ -62,4 +84,349 @@ def test_get_course_detail() -> None:
     response = client.get(url)
 
     assert response.status_code == 200
-    assert response.data['title'] == course.title
\ No newline at end of file
+    assert response.data['title'] == course.title
+
+
+@pytest.mark.django_db
+def test_identical_avatars_are_stored_once(settings: Any, tmp_path: Path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    course = Course.objects.create(title='Course', duration_days=10)
+    module = Module.objects.create(course=course, title='Module', content='...', order=1)
+    course.avatar.save('logo.png', ContentFile(b'png'))
+    module.avatar.save('logo-copy.PNG', ContentFile(b'png'))
+
+    assert course.avatar.name == module.avatar.name
+    assert Blob.objects.get().ref_count == 2
+
+    course.avatar.save('new.png', ContentFile(b'other png'))
+    module.delete()
+    assert dict(Blob.objects.values_list('name', 'ref_count')) == {course.avatar.name: 1, module.avatar.name: 0}
+    assert recount_blob_references() == 1
+    assert len(list((tmp_path / 'blobs').rglob('*.png'))) == 2
+
+
+def image_file(mode: str, size: tuple[int, int], image_format: str) -> ContentFile:
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'teal').save(buffer, image_format)
+    return ContentFile(buffer.getvalue())
+
+
+@pytest.mark.django_db
+def test_avatar_thumbnails_are_built_after_upload(
+    settings: Any, tmp_path: Path, monkeypatch: Any, django_capture_on_commit_callbacks: Any
+) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    monkeypatch.setattr(celery_app.conf, 'task_always_eager', True)
+    course = Course.objects.create(title='Course', duration_days=10)
+    module = Module.objects.create(course=course, title='Module', content='...', order=1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        module.avatar.save('photo.jpg', image_file('RGB', (1000, 500), 'JPEG'))
+
+    module.refresh_from_db()
+    thumbnails = module.avatar_thumbnails
+    assert set(thumbnails) == {'source', 'widths', 'image/webp', 'image/jpeg'}
+    assert list(thumbnails['image/webp']) == ['160', '320', '640']
+    with Image.open(tmp_path / thumbnails['image/webp']['320']) as image:
+        assert (image.format, image.size) == ('WEBP', (320, 160))
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+    avatar = client.get(reverse('modules-detail', args=[module.id])).data['avatar']
+    assert avatar['url'] == f'http://testserver/media/{module.avatar.name}'
+    assert avatar['srcset']['image/jpeg'].startswith('http://testserver/media/derived/')
+    assert avatar['srcset']['image/webp'].endswith('/640.webp 640w')
+    assert client.get(reverse('modules-list')).data[0]['avatar'] == avatar
+
+    # Маленькая картинка с прозрачностью: не увеличивается, запасной формат — PNG.
+    # Без коммита задача не ставится, миниатюры достраивает регенерация.
+    lesson = Lesson.objects.create(module=module, title='Lesson', content='...')
+    lesson.avatar.save('icon.png', image_file('RGBA', (200, 100), 'PNG'))
+    assert client.get(reverse('lessons-detail', args=[lesson.id])).data['avatar']['srcset'] == {}
+    call_command('generate_thumbnails', workers=1)
+    lesson.refresh_from_db()
+    assert list(lesson.avatar_thumbnails['image/png']) == ['160', '200']
+    assert regenerate_thumbnails() == 0
+
+
+@pytest.mark.django_db
+def test_course_catalog_counts_and_pagination() -> None:
+    user = User.objects.create_user(username='testuser', password='testpass')
+    client = APIClient()
+    client.force_authenticate(user)
+
+    course = Course.objects.create(title='Python', duration_days=10)
+    module = Module.objects.create(course=course, title='Basics', content='...')
+    Lesson.objects.bulk_create([Lesson(module=module, title=f'Lesson {i}', content='...') for i in range(3)])
+    course.users.add(user)
+    Course.objects.bulk_create([Course(title=f'Course {i}', end_datetime=timezone.now()) for i in range(25)])
+
+    response = client.get(reverse('courses-catalog'), {'page_size': 10})
+
+    assert response.status_code == 200
+    assert response.data['count'] == 26
+    assert len(response.data['results']) == 10
+
+    response = client.get(reverse('courses-catalog'), {'enrolled': 'true'})
+    row = response.data['results'][0]
+    assert response.data['count'] == 1
+    assert (row['modules_count'], row['lessons_count'], row['users_count']) == (1, 3, 1)
+
+
+@pytest.mark.django_db
+def test_course_catalog_filters_by_tag_and_sparse_fields() -> None:
+    user = User.objects.create_user(username='testuser', password='testpass')
+    client = APIClient()
+    client.force_authenticate(user)
+
+    tagged = Course.objects.create(title='Django', duration_days=10)
+    tagged.tags.add(Tag.objects.create(title='web'))
+    Course.objects.create(title='Pandas', duration_days=10)
+
+    response = client.get(reverse('courses-catalog'), {'tag': 'web', 'fields': 'id,title'})
+
+    assert response.status_code == 200
+    assert response.data['results'] == [{'id': tagged.id, 'title': 'Django'}]
+
+
+@pytest.mark.django_db
+def test_course_catalog_enrolled_filter_with_jwt() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    mine = Course.objects.create(title='Mine', duration_days=10)
+    other = Course.objects.create(title='Other', duration_days=10)
+    mine.users.add(user)
+
+    client = APIClient()
+    response = client.post(reverse('custom_token_obtain_pair'), {'username': 'student', 'password': '123'})
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    response = client.get(reverse('courses-catalog'), {'enrolled': 'true'})
+    assert response.status_code == 200
+    assert [course['id'] for course in response.data['results']] == [mine.id]
+    response = client.get(reverse('courses-catalog'), {'enrolled': 'false'})
+    assert [course['id'] for course in response.data['results']] == [other.id]
+
+
+@pytest.mark.django_db
+def test_catalog_filters_do_not_apply_to_detail_actions() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    course = Course.objects.create(title='Course', duration_days=10)
+    client = APIClient()
+    client.force_authenticate(admin)
+    url = reverse('courses-detail', args=[course.id])
+
+    assert client.get(url, {'tag': 'missing'}).status_code == 200
+    assert client.patch(f'{url}?enrolled=true', {'title': 'Renamed'}, format='json').status_code == 200
+    assert [item['id'] for item in client.get(reverse('courses-list'), {'tag': 'missing'}).data] == [course.id]
+    assert client.get(reverse('courses-catalog'), {'tag': 'missing'}).data['results'] == []
+
+
+@pytest.mark.django_db
+def test_content_etag_returns_304_without_content_queries() -> None:
+    course = Course.objects.create(title='Course', duration_days=10)
+    module = Module.objects.create(course=course, title='Module', content='...')
+    lesson = Lesson.objects.create(module=module, title='Lesson', content='...')
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+
+    urls = [
+        reverse('courses-detail', args=[course.id]),
+        reverse('modules-detail', args=[module.id]),
+        reverse('lessons-detail', args=[lesson.id]),
+    ]
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'must-revalidate' in response['Cache-Control']
+
+        with CaptureQueriesContext(connection) as context:
+            cached = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == 304
+        assert cached['ETag'] == response['ETag']
+        assert len(context.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_content_etag_changes_when_nested_content_changes() -> None:
+    course = Course.objects.create(title='Course', duration_days=10)
+    module = Module.objects.create(course=course, title='Module', content='...')
+    lesson = Lesson.objects.create(module=module, title='Lesson', content='...')
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+    url = reverse('courses-detail', args=[course.id])
+
+    def etag() -> str:
+        return client.get(url)['ETag']
+
+    first = etag()
+    assert etag() == first
+
+    question = Question.objects.create(title='Question', content='...')
+    lesson.questions.add(question)
+    second = etag()
+    assert second != first
+
+    Answer.objects.create(question=question, content='Yes', is_correct=True)
+    third = etag()
+    assert third != second
+
+    late = User.objects.create_user(username='late', password='123')
+    late.courses.add(course)
+    fourth = etag()
+    assert fourth != third
+
+    # Переименование в обход API (админка, shell): логин виден в списке слушателей курса.
+    late.username = 'renamed'
+    late.save()
+    assert etag() != fourth
+    assert 'renamed' in client.get(url).data['users']
+
+
+@pytest.mark.django_db
+def test_course_detail_json_is_served_from_render_cache() -> None:
+    course = Course.objects.create(title='Course', duration_days=10)
+    Module.objects.create(course=course, title='Module', content='...')
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+    url = reverse('courses-detail', args=[course.id])
+
+    first = client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        second = client.get(url)
+
+    assert second.content == first.content
+    assert second['Content-Type'] == first['Content-Type']
+    assert len(context.captured_queries) == 0
+
+    Module.objects.create(course=course, title='Another', content='...')
+    assert len(client.get(url).data['modules']) == 2
+
+
+def test_render_cache_waits_for_lock_owner() -> None:
+    caches['default'].add('render:key:lock', 1)
+    threading.Timer(0.1, caches['default'].set, args=('render:key', b'{"cached": true}')).start()
+
+    def render() -> bytes:
+        raise AssertionError('Пересчёт должен выполнить владелец блокировки')
+
+    assert render_cache.get_or_render('render:key', render) == b'{"cached": true}'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('url_name', 'serializer_class', 'model'),
+    [
+        ('modules-list', ModuleShortSerializer, Module),
+        ('lessons-list', LessonShortSerializer, Lesson),
+        ('questions-list', QuestionShortSerializer, Question),
+    ],
+)
+def test_values_list_matches_drf_serializer(url_name: str, serializer_class: type, model: type) -> None:
+    course = Course.objects.create(title='Course', duration_days=10)
+    for i in range(3):
+        module = Module.objects.create(
+            course=course, title=f'Module {i}', content='...', order=3 - i, avatar='module_avatars/a.png' if i else ''
+        )
+        for j in range(i):
+            lesson = Lesson.objects.create(module=module, title=f'Lesson {j}', content='...', avatar=None)
+            lesson.questions.add(Question.objects.create(title=f'Question {i}{j}', content='Текст'))
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+    response = client.get(reverse(url_name))
+
+    request = response.wsgi_request
+    expected = serializer_class(model.objects.all(), many=True, context={'request': request}).data
+    assert response.content == JSONRenderer().render(expected)
+
+
+@pytest.mark.django_db
+def test_export_enrollments_streams_ndjson_and_csv() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    course = Course.objects.create(title='Курс, "первый"', duration_days=10)
+    other = Course.objects.create(title='Other', duration_days=10)
+    students = [User.objects.create_user(username=f'student{i}', password='123') for i in range(3)]
+    course.users.add(*students)
+    other.users.add(students[0])
+
+    client = APIClient()
+    client.force_authenticate(students[0])
+    url = reverse('courses-export-enrollments')
+    assert client.get(url).status_code == 403
+
+    client.force_authenticate(admin)
+    response = client.get(url, {'course_id': course.id})
+    assert response.streaming
+    assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+    assert [row['username'] for row in rows] == ['student0', 'student1', 'student2']
+    assert rows[0] == {
+        'course_id': course.id,
+        'course_title': course.title,
+        'user_id': students[0].id,
+        'username': 'student0',
+        'email': '',
+        'role': students[0].role,
+    }
+
+    response = client.get(url, {'output': 'csv'})
+    rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+    assert rows[0] == ['course_id', 'course_title', 'user_id', 'username', 'email', 'role']
+    assert [row[1] for row in rows[1:]] == [course.title] * 3 + ['Other']
+
+    assert client.get(url, {'output': 'xml'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_catalog_search_text_tags_and_facets() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    python, web, data = (Tag.objects.create(title=title) for title in ('python', 'web', 'data'))
+    django = Course.objects.create(title='Django', description='Веб-разработка на Python', duration_days=10)
+    django.tags.add(python, web)
+    pandas = Course.objects.create(title='Анализ данных', description='', duration_days=10)
+    pandas.tags.add(python, data)
+    Lesson.objects.create(module=Module.objects.create(course=pandas, title='Pandas', content='...'), title='Python')
+    frontend = Course.objects.create(title='Frontend', description='HTML и CSS', duration_days=10)
+    frontend.tags.add(web)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('courses-catalog-search')
+
+    # Название урока попадает в индекс курса.
+    response = client.get(url, {'q': 'pyth'})
+    assert {item['title'] for item in response.data['results']} == {'Django', 'Анализ данных'}
+    assert response.data['facets'] == [
+        {'id': python.id, 'title': 'python', 'count': 2},
+        {'id': data.id, 'title': 'data', 'count': 1},
+        {'id': web.id, 'title': 'web', 'count': 1},
+    ]
+
+    response = client.get(url, {'tags': f'{data.id},{web.id}'})
+    assert {item['title'] for item in response.data['results']} == {'Django', 'Анализ данных', 'Frontend'}
+    assert response.data['count'] == 3
+    # any: фасеты без учёта выбранных тегов.
+    assert {facet['title']: facet['count'] for facet in response.data['facets']} == {'python': 2, 'web': 2, 'data': 1}
+
+    response = client.get(url, {'tags': f'{python.id},{web.id}', 'tags_mode': 'all'})
+    assert [item['title'] for item in response.data['results']] == ['Django']
+    assert {facet['title']: facet['count'] for facet in response.data['facets']} == {'python': 1, 'web': 1}
+
+    # Изменения модулей сразу попадают в поиск.
+    Module.objects.filter(course=pandas).get().delete()
+    assert client.get(url, {'q': 'pandas'}).data['count'] == 0
+    Module.objects.create(course=frontend, title='Вёрстка')
+    assert [item['title'] for item in client.get(url, {'q': 'вёрст'}).data['results']] == ['Frontend']
+
+
+@pytest.mark.django_db
+def test_tag_facets_is_one_query() -> None:
+    tags = [Tag.objects.create(title=f'tag{i}') for i in range(3)]
+    for i in range(5):
+        Course.objects.create(title=f'Course {i}', duration_days=10).tags.add(*tags[: i % 3 + 1])
+
+    with CaptureQueriesContext(connection) as queries:
+        facets = tag_facets(Course.objects.all())
+
+    assert len(queries) == 1
+    assert [(facet['tag__title'], facet['count']) for facet in facets] == [('tag0', 5), ('tag1', 3), ('tag2', 1)]
@@ -0,0 +1,76 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from education_app.models.course import Answer, Course, Lesson, Module, Question, Tag
+
+User = get_user_model()
+
+
+def create_courses(count: int) -> None:
+    for i in range(count):
+        course = Course.objects.create(title=f'Course {i}', duration_days=10)
+        course.tags.add(Tag.objects.create(title=f'tag-{Tag.objects.count()}'))
+        course.users.add(User.objects.create(username=f'student-{User.objects.count()}'))
+
+        for j in range(2):
+            module = Module.objects.create(course=course, title=f'Module {j}', content='...', order=j)
+            for k in range(2):
+                lesson = Lesson.objects.create(module=module, title=f'Lesson {k}', content='...')
+                question = Question.objects.create(title='Question', content='...')
+                Answer.objects.create(question=question, content='Yes', is_correct=True)
+                lesson.questions.add(question)
+
+
+def count_queries(client: APIClient, url: str) -> int:
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name', ['courses-list', 'modules-list', 'lessons-list', 'questions-list'])
+def test_list_query_count_does_not_grow_with_rows(url_name: str) -> None:
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='admin', password='123', is_staff=True))
+    url = reverse(url_name)
+
+    create_courses(2)
+    few_rows = count_queries(client, url)
+
+    create_courses(5)
+    many_rows = count_queries(client, url)
+
+    assert few_rows == many_rows
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('url_name', 'model'),
+    [('courses-detail', Course), ('modules-detail', Module), ('lessons-detail', Lesson)],
+)
+def test_detail_query_count_does_not_grow_with_children(url_name: str, model: type) -> None:
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='admin', password='123', is_staff=True))
+
+    create_courses(1)
+    few_children = count_queries(client, reverse(url_name, args=[model.objects.first().id]))
+
+    Course.objects.all().delete()
+    create_courses(1)
+    instance = model.objects.first()
+    if model is Course:
+        Module.objects.create(course=instance, title='Extra', content='...', order=5)
+    elif model is Module:
+        Lesson.objects.create(module=instance, title='Extra', content='...')
+    else:
+        question = Question.objects.create(title='Extra', content='...')
+        Answer.objects.create(question=question, content='No')
+        instance.questions.add(question)
+    many_children = count_queries(client, reverse(url_name, args=[instance.id]))
+
+    assert few_children == many_children
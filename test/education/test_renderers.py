@@ -0,0 +1,71 @@
+import io
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from base.renderers import FastJSONParser, FastJSONRenderer
+from education_app.models.chat import Chat, ChatParticipant, Message
+from education_app.models.course import Course, Lesson, Module, Tag
+from education_app.serializers.chat import ChatSerializer
+from education_app.serializers.course import CourseSerializer
+
+# orjson — необязательная зависимость (extra `fast-json`).
+pytest.importorskip('orjson')
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_fast_renderer_matches_drf_on_serializer_payloads() -> None:
+    user = User.objects.create_user(username='студент', password='123')
+    course = Course.objects.create(title='Курс', description='Строка с разделителем', duration_days=10)
+    course.tags.add(Tag.objects.create(title='python'))
+    course.users.add(user)
+    Lesson.objects.create(module=Module.objects.create(course=course, title='Модуль', content='...'), title='Урок')
+    chat = Chat.objects.create(name='Группа', is_group=True)
+    ChatParticipant.objects.create(chat=chat, user=user)
+    Message.objects.create(chat=chat, sender=user, text='Привет')
+
+    for data in [CourseSerializer(course).data, ChatSerializer(chat).data]:
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data, 'application/json; indent=2') == JSONRenderer().render(
+            data, 'application/json; indent=2'
+        )
+
+
+def test_fast_renderer_handles_python_types_like_drf() -> None:
+    data = {
+        'at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=UTC),
+        'naive': datetime(2025, 1, 2, 3, 4, 5),
+        'id': UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Курс'),
+        'delta': timedelta(minutes=1),
+        'price': Decimal('1.50'),
+        1: 'int key',
+    }
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_fast_renderer_streams_json_array() -> None:
+    items = [{'id': i, 'title': f'Item {i}'} for i in range(7)]
+
+    chunks = list(FastJSONRenderer().iter_render(iter(items), chunk_size=3))
+
+    assert chunks[0] == b'['
+    assert b''.join(chunks) == JSONRenderer().render(items)
+    assert b''.join(FastJSONRenderer().iter_render([])) == b'[]'
+
+
+def test_fast_parser() -> None:
+    assert FastJSONParser().parse(io.BytesIO('{"name": "Чат", "ids": [1, 2]}'.encode())) == {
+        'name': 'Чат',
+        'ids': [1, 2],
+    }
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(io.BytesIO(b'{broken'))
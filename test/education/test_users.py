@@ -0,0 +1,297 @@
+import io
+from pathlib import Path
+from typing import Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from education_app.consts import Role
+from education_app.models.chat import Chat, ChatParticipant
+from education_app.models.course import Course
+from education_app.services.course import CourseService, UserService
+from education_app.services.profile_cache import profile_cache_stats
+from education_app.services.user_import import import_users
+from education_app.services.users import enroll, set_courses_and_chats, update_user
+
+User = get_user_model()
+
+
+def create_courses_with_chats(count: int) -> list[Course]:
+    return [
+        Course.objects.create(title=f'Course {i}', duration_days=10, chat=Chat.objects.create(is_group=True))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_enroll_query_count_is_constant() -> None:
+    courses = create_courses_with_chats(5)
+    users = User.objects.bulk_create([User(username=f'student{i}') for i in range(40)])
+
+    def run(some_users: list) -> int:
+        with CaptureQueriesContext(connection) as context:
+            enroll((user.id, course.id) for user in some_users for course in courses)
+        return len(context.captured_queries)
+
+    assert run(users[:2]) == run(users[2:])
+    assert ChatParticipant.objects.count() == 5 * 40
+
+
+@pytest.mark.django_db
+def test_bulk_enroll_endpoint_is_idempotent() -> None:
+    admin = User.objects.create_user(username='admin', password='123', is_staff=True)
+    courses = create_courses_with_chats(2)
+    students = User.objects.bulk_create([User(username=f'student{i}') for i in range(3)])
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    payload = {'user_ids': [user.id for user in students] + [999999], 'course_ids': [course.id for course in courses]}
+
+    response = client.post(reverse('courses-enroll'), payload, format='json')
+    assert response.data == {'enrolled': 6, 'already_enrolled': 0, 'skipped': 2}
+
+    response = client.post(reverse('courses-enroll'), payload, format='json')
+    assert response.data == {'enrolled': 0, 'already_enrolled': 6, 'skipped': 2}
+    assert courses[0].users.count() == 3
+    assert ChatParticipant.objects.filter(chat=courses[0].chat).count() == 3
+
+
+@pytest.mark.django_db
+def test_enroll_users_command_reads_csv(tmp_path: Path) -> None:
+    [course] = create_courses_with_chats(1)
+    student = User.objects.create(username='student')
+    path = tmp_path / 'enroll.csv'
+    path.write_text(f'username,course_id\nstudent,{course.id}\nunknown,{course.id}\n')
+
+    out = io.StringIO()
+    call_command('enroll_users', str(path), stdout=out)
+
+    assert list(course.users.all()) == [student]
+    assert 'Записано: 1' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_enroll_users_command_leaves_stdin_open(monkeypatch: pytest.MonkeyPatch) -> None:
+    [course] = create_courses_with_chats(1)
+    student = User.objects.create(username='student')
+    stdin = io.StringIO(f'user_id,course_id\n{student.id},{course.id}\n')
+    monkeypatch.setattr('sys.stdin', stdin)
+
+    call_command('enroll_users', '-', stdout=io.StringIO())
+
+    assert list(course.users.all()) == [student]
+    assert not stdin.closed
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('workers', [1, 2])
+def test_import_users_reports_row_errors(workers: int) -> None:
+    [course] = create_courses_with_chats(1)
+    User.objects.create(username='taken')
+    rows = [
+        {
+            'username': 'anna',
+            'email': 'anna@mail.ru',
+            'first_name': 'Anna',
+            'last_name': 'A',
+            'password': 'pw-1',
+            'course_ids': [course.id],
+        },
+        {'username': 'taken', 'email': 't@mail.ru', 'first_name': 'T', 'last_name': 'T', 'password': 'pw'},
+        {'username': 'bob', 'email': 'not-an-email', 'first_name': 'Bob', 'last_name': 'B', 'password': 'pw'},
+        {'username': 'anna', 'email': 'a2@mail.ru', 'first_name': 'Anna', 'last_name': 'A', 'password': 'pw'},
+        'not a row',
+    ]
+
+    result = import_users(rows, batch_size=2, workers=workers)
+
+    assert result['created'] == 1
+    assert result['enrolled'] == 1
+    assert [error['row'] for error in result['errors']] == [2, 3, 4, 5]
+    assert 'email' in result['errors'][1]['errors']
+    anna = User.objects.get(username='anna')
+    assert anna.check_password('pw-1')
+    assert list(anna.courses.all()) == [course]
+    assert ChatParticipant.objects.filter(user=anna, chat=course.chat).exists()
+
+
+@pytest.mark.django_db
+def test_import_users_endpoint_accepts_csv() -> None:
+    [course] = create_courses_with_chats(1)
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='admin', password='123', is_staff=True))
+    upload = io.BytesIO(
+        'username,email,first_name,last_name,password,course_ids\n'
+        f'anna,anna@mail.ru,Anna,A,secret,{course.id}\n'
+        'bob,bob-at-mail,Bob,B,secret,\n'.encode()
+    )
+    upload.name = 'users.csv'
+
+    response = client.post(reverse('user-import'), {'file': upload}, format='multipart')
+
+    assert response.status_code == 200
+    assert response.data['created'] == 1
+    assert response.data['errors'][0]['row'] == 2
+    assert course.users.get().username == 'anna'
+
+
+@pytest.mark.django_db
+def test_import_users_endpoint_is_admin_only() -> None:
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='student', password='123'))
+    upload = io.BytesIO(b'username\n')
+    upload.name = 'users.csv'
+
+    response = client.post(reverse('user-import'), {'file': upload}, format='multipart')
+
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_login_profile_summary_is_cached_until_courses_change() -> None:
+    first, second = create_courses_with_chats(2)
+    user = User.objects.create_user(username='student', password='123')
+    set_courses_and_chats(user, [first])
+    client = APIClient()
+
+    def login() -> dict:
+        response = client.post(reverse('custom_token_obtain_pair'), {'username': 'student', 'password': '123'})
+        assert response.status_code == 200
+        return response.data['user']
+
+    assert login() == {'id': user.id, 'username': 'student', 'role': user.role, 'courses': [first.id]}
+    with CaptureQueriesContext(connection) as context:
+        login()
+    assert not any('education_app_user_courses' in query['sql'] for query in context.captured_queries)
+
+    enroll([(user.id, second.id)])
+    assert sorted(login()['courses']) == [first.id, second.id]
+
+    CourseService.update_course_users(second, [])
+    assert login()['courses'] == [first.id]
+    # Каждый логин читает профиль дважды: для claims токена и для блока `user` в ответе.
+    assert profile_cache_stats() == {'hits': 5, 'misses': 3}
+
+
+@pytest.mark.django_db
+def test_me_is_cached_and_invalidated_on_update() -> None:
+    [course] = create_courses_with_chats(1)
+    user = User.objects.create_user(username='student', password='123', email='s@mail.ru')
+    client = APIClient()
+    client.force_authenticate(user)
+
+    assert client.get(reverse('user-me')).data['courses'] == []
+    UserService.update_user_courses(user, [course.id])
+    assert client.get(reverse('user-me')).data['courses'] == [course.title]
+
+    with CaptureQueriesContext(connection) as context:
+        client.get(reverse('user-me'))
+    assert len(context.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_me_cache_follows_course_changes_outside_services() -> None:
+    first, second = create_courses_with_chats(2)
+    user = User.objects.create_user(username='student', password='123')
+    user.courses.add(first)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def courses() -> list[str]:
+        return sorted(client.get(reverse('user-me')).data['courses'])
+
+    assert courses() == ['Course 0']
+    # Правка связей из админки идёт через m2m_changed с обеих сторон.
+    second.users.add(user)
+    assert courses() == ['Course 0', 'Course 1']
+    first.title = 'Renamed'
+    first.save()
+    assert courses() == ['Course 1', 'Renamed']
+    second.delete()
+    assert courses() == ['Renamed']
+    user.courses.clear()
+    assert courses() == []
+
+
+def login(client: APIClient, username: str) -> dict:
+    response = client.post(reverse('custom_token_obtain_pair'), {'username': username, 'password': '123'})
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.django_db
+def test_jwt_requests_do_not_select_user() -> None:
+    User.objects.create_user(username='student', password='123')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {login(client, "student")["access"]}')
+
+    client.get(reverse('chat-inbox'))
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('chat-inbox'))
+
+    assert response.status_code == 200
+    assert not any('FROM "education_app_user"' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_role_change_revokes_access_tokens() -> None:
+    user = User.objects.create_user(username='student', password='123')
+    client = APIClient()
+    tokens = login(client, 'student')
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+    assert client.get(reverse('user-me')).status_code == 200
+
+    update_user(user, {'role': Role.MENTOR})
+
+    assert client.get(reverse('user-me')).status_code == 401
+    response = client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+    assert response.status_code == 200
+    assert AccessToken(response.data['access'])['role'] == Role.MENTOR
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+    assert client.get(reverse('user-me')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_django_admin_changes_revoke_access_tokens(client: Any) -> None:
+    admin = User.objects.create_superuser(username='admin', password='123')
+    User.objects.create_user(username='student', password='123')
+    api = APIClient()
+    tokens = login(api, 'student')
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+    assert api.get(reverse('user-me')).status_code == 200
+
+    client.force_login(admin)
+    user = User.objects.get(username='student')
+    form = {
+        'username': 'student',
+        'first_name': '',
+        'last_name': '',
+        'email': '',
+        'phone': '',
+        'is_active': 'on',
+        'is_staff': 'on',
+        'date_joined_0': user.date_joined.strftime('%Y-%m-%d'),
+        'date_joined_1': user.date_joined.strftime('%H:%M:%S'),
+    }
+    change_url = reverse('admin:education_app_user_change', args=[user.id])
+    assert client.post(change_url, form).status_code == 302
+    assert api.get(reverse('user-me')).status_code == 401
+
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {login(api, "student")["access"]}')
+    assert api.get(reverse('user-me')).status_code == 200
+    # Снятый флажок is_active: деактивированный пользователь больше не проходит со старым токеном.
+    del form['is_active']
+    assert client.post(change_url, form).status_code == 302
+    assert api.get(reverse('user-me')).status_code == 401
+    # Сохранение без изменений в полях из claims токены не отзывает.
+    version = User.objects.get(id=user.id).token_version
+    user.refresh_from_db()
+    user.first_name = 'Иван'
+    user.save()
+    assert User.objects.get(id=user.id).token_version == version